@@ -0,0 +1,59 @@
+from fractions import Fraction
+from random import randint
+from timeit import timeit
+from src.interpreter import linalg
+from src.interpreter.variables import MatrixVariable
+
+SIZES = [8, 16, 32, 64, 128, 256]
+# elimination on fractions takes minutes above this size
+NAIVE_LIMIT = 64
+
+
+def naive_inverse(a):
+    size = len(a)
+    rows = [[Fraction(value) for value in row] + [Fraction(int(i == j)) for j in range(size)]
+            for i, row in enumerate(a)]
+    for k in range(size):
+        pivot = next(i for i in range(k, size) if rows[i][k] != 0)
+        rows[k], rows[pivot] = rows[pivot], rows[k]
+        rows[k] = [value / rows[k][k] for value in rows[k]]
+        for i in range(size):
+            if i != k and rows[i][k] != 0:
+                factor = rows[i][k]
+                rows[i] = [value - factor * pivot_value for value, pivot_value in zip(rows[i], rows[k])]
+    return [row[size:] for row in rows]
+
+
+def random_rows(size, limit):
+    return [[randint(-limit, limit) for _ in range(size)] for _ in range(size)]
+
+
+def measure(function, repeat):
+    return timeit(function, number=repeat) / repeat
+
+
+def benchmark(limit, label):
+    print('\n{} (values up to {})'.format(label, limit))
+    print('{:>6} {:>14} {:>14} {:>14} {:>14} {:>10}'.format('size', 'naive [s]', 'inverse [s]', 'solve [s]',
+                                                          'rank [s]', 'speedup'))
+    for size in SIZES:
+        rows = random_rows(size, limit)
+        values = MatrixVariable('a', rows).values
+        right = MatrixVariable('b', random_rows(size, limit)[:4]).values.T.copy()
+        repeat = max(1, 64 // size)
+        inverse_time = measure(lambda: linalg.inverse(values), repeat)
+        solve_time = measure(lambda: linalg.solve(values, right), repeat)
+        rank_time = measure(lambda: linalg.rank(values), repeat)
+        if size <= NAIVE_LIMIT:
+            naive_time = measure(lambda: naive_inverse(rows), 1)
+            print('{:>6} {:>14.6f} {:>14.6f} {:>14.6f} {:>14.6f} {:>9.1f}x'.format(
+                size, naive_time, inverse_time, solve_time, rank_time, naive_time / inverse_time))
+        else:
+            print('{:>6} {:>14} {:>14.6f} {:>14.6f} {:>14.6f} {:>10}'.format(size, '-', inverse_time, solve_time,
+                                                                          rank_time, '-'))
+
+
+if __name__ == '__main__':
+    benchmark(1, 'signs, int64 elimination up to the lifting size')
+    benchmark(255, 'pixel values')
+    benchmark(2 ** 40, 'wide values, lifting products split into limbs')
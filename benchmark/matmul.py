@@ -0,0 +1,50 @@
+from random import randint
+from timeit import timeit
+from src.interpreter.variables import MatrixVariable
+
+SIZES = [8, 16, 32, 64, 128, 256, 512, 1024, 2048]
+# the triple loop takes minutes above this size
+NAIVE_LIMIT = 256
+
+
+def naive_multiply(a, b):
+    rows = []
+    for i in range(len(a)):
+        rows.append([0] * len(b[0]))
+    for i in range(len(a)):
+        for j in range(len(b[0])):
+            for k in range(len(b)):
+                rows[i][j] += a[i][k] * b[k][j]
+    return rows
+
+
+def random_rows(size, limit):
+    return [[randint(-limit, limit) for _ in range(size)] for _ in range(size)]
+
+
+def measure(function, repeat):
+    return timeit(function, number=repeat) / repeat
+
+
+def benchmark(limit, label):
+    print('\n{} (values up to {})'.format(label, limit))
+    print('{:>6} {:>14} {:>14} {:>10}'.format('size', 'naive [s]', 'engine [s]', 'speedup'))
+    for size in SIZES:
+        a_rows = random_rows(size, limit)
+        b_rows = random_rows(size, limit)
+        a = MatrixVariable('a', a_rows)
+        b = MatrixVariable('b', b_rows)
+        repeat = max(1, 256 // size)
+        engine_time = measure(lambda: a * b, repeat)
+        if size <= NAIVE_LIMIT:
+            naive_time = measure(lambda: naive_multiply(a_rows, b_rows), 1)
+            print('{:>6} {:>14.6f} {:>14.6f} {:>9.1f}x'.format(size, naive_time, engine_time,
+                                                             naive_time / engine_time))
+        else:
+            print('{:>6} {:>14} {:>14.6f} {:>10}'.format(size, '-', engine_time, '-'))
+
+
+if __name__ == '__main__':
+    benchmark(255, 'pixel values, direct BLAS path')
+    benchmark(2 ** 30, 'int64 values, split into limbs')
+    benchmark(2 ** 100, 'big integers, split into limbs')
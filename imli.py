@@ -6,17 +6,24 @@ import sys
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
+    arguments = sys.argv[1:]
+    tile_threshold = None
+    if len(arguments) == 3 and arguments[0] == '--out-of-core' and arguments[1].isdigit():
+        # values of at least that many megabytes are kept in memory mapped files
+        tile_threshold = int(arguments[1]) << 20
+        arguments = arguments[2:]
+
+    if len(arguments) != 1:
         print('\nUsage:')
-        print('python3 imli.py <source_file>\n')
+        print('python3 imli.py [--out-of-core <megabytes>] <source_file>\n')
         exit(0)
 
-    source_file_path = sys.argv[1]
+    source_file_path = arguments[0]
     source_file = open(source_file_path)
 
     lexer = Lexer(FileSource(source_file))
     parser = Parser(lexer)
-    interpreter = Interpreter(parser)
+    interpreter = Interpreter(parser, tile_threshold=tile_threshold)
     returned = interpreter.interpret()
 
     print('\n\nFinished with return code: {}.'.format(returned))
@@ -27,6 +27,17 @@ class CommentTooLongException(Exception):
         super().__init__(self.__message)
 
 
+class StringTooLongException(Exception):
+    def __init__(self, position, start_position):
+        self.__position = position
+        self.__start_position = start_position
+        self.__message = "String starting at: {}, {}; too long at: {}, {}.".format(self.__start_position.line,
+                                                                                   self.__start_position.column,
+                                                                                   self.__position.line,
+                                                                                   self.__position.column)
+        super().__init__(self.__message)
+
+
 class SyntaxException(Exception):
     def __init__(self, position, byte, message="Exception"):
         self.__position = position
@@ -165,3 +176,27 @@ class ZeroDivisionException(Exception):
         self.__message = "Division by 0 is illegal!"
 
         super().__init__(self.__message)
+
+
+class ImageFormatException(Exception):
+    def __init__(self, path: str, message: str):
+        self.__path = path
+        self.__message = "Image Format Exception. {} - {}.".format(path, message)
+
+        super().__init__(self.__message)
+
+
+class BorderModeException(Exception):
+    def __init__(self, mode: str, modes):
+        self.__mode = mode
+        self.__message = "Semantic Exception. Unknown border mode \"{}\", one of {} was expected." \
+            .format(mode, ', '.join(modes))
+
+        super().__init__(self.__message)
+
+
+class SingularMatrixException(Exception):
+    def __init__(self):
+        self.__message = "Singular Matrix Exception. The matrix has no inverse."
+
+        super().__init__(self.__message)
@@ -0,0 +1,145 @@
+import numpy as np
+from .pool import buffers
+from . import tiles
+from ..exceptions.exceptions import MatrixDimensionsException, ZeroDivisionException
+
+# int64 minimum is left out on purpose, so that negation and division by -1 can never overflow
+INT64_MAX = int(np.iinfo(np.int64).max)
+
+
+def to_array(rows) -> np.ndarray:
+    if isinstance(rows, np.ndarray):
+        return rows
+    if len(rows) == 0:
+        return np.zeros((0, 0), dtype=np.int64)
+    for row in rows:
+        if len(row) != len(rows[0]):
+            raise MatrixDimensionsException(str(len(rows[0])) + ' columns', str(len(row)) + ' columns')
+    try:
+        values = np.array(rows, dtype=np.int64)
+    except OverflowError:
+        return np.array(rows, dtype=object)
+    if not fits(magnitude(values)):
+        return values.astype(object)
+    return values
+
+
+def is_exact(operand):
+    return isinstance(operand, np.ndarray) and operand.dtype == object
+
+
+def magnitude(operand) -> int:
+    if not isinstance(operand, np.ndarray):
+        return abs(operand)
+    if operand.size == 0:
+        return 0
+    return max(int(operand.max()), -int(operand.min()))
+
+
+def fits(bound: int) -> bool:
+    return bound <= INT64_MAX
+
+
+def exact(operand):
+    if isinstance(operand, np.ndarray) and operand.dtype != object:
+        return operand.astype(object)
+    return operand
+
+
+def narrow(values: np.ndarray):
+    # results computed on python ints go back to int64 as soon as they fit
+    values_magnitude = magnitude(values)
+    if is_exact(values) and fits(values_magnitude):
+        return values.astype(np.int64), values_magnitude
+    return values, values_magnitude
+
+
+def add(a, b, a_magnitude=None, b_magnitude=None, out=None):
+    return _checked(np.add, a, b, a_magnitude, b_magnitude,
+                    lambda a_bound, b_bound: a_bound + b_bound, out)
+
+
+def subtract(a, b, a_magnitude=None, b_magnitude=None, out=None):
+    return _checked(np.subtract, a, b, a_magnitude, b_magnitude,
+                    lambda a_bound, b_bound: a_bound + b_bound, out)
+
+
+def multiply(a, b, a_magnitude=None, b_magnitude=None, out=None):
+    return _checked(np.multiply, a, b, a_magnitude, b_magnitude,
+                    lambda a_bound, b_bound: a_bound * b_bound, out)
+
+
+def floor_divide(a, b, a_magnitude=None, b_magnitude=None, out=None):
+    if np.ndim(b) == 0 and b == 0:
+        raise ZeroDivisionException()
+    return _checked(checked_floor_divide, a, b, a_magnitude, b_magnitude,
+                    lambda a_bound, b_bound: a_bound, out)
+
+
+def modulo(a, b, a_magnitude=None, b_magnitude=None, out=None):
+    if np.ndim(b) == 0 and b == 0:
+        raise ZeroDivisionException()
+    return _checked(checked_remainder, a, b, a_magnitude, b_magnitude,
+                    lambda a_bound, b_bound: b_bound, out)
+
+
+def _raising_on_zero(operation):
+    # integer division by zero only sets a floating point flag, so zero divisors are found
+    # by the pass that divides rather than by a scan of their own
+    def checked(a, b, out=None, **kwargs):
+        with np.errstate(divide='raise'):
+            try:
+                return operation(a, b, out=out, **kwargs)
+            except (FloatingPointError, ZeroDivisionError):
+                raise ZeroDivisionException()
+    return checked
+
+
+checked_floor_divide = _raising_on_zero(np.floor_divide)
+checked_remainder = _raising_on_zero(np.remainder)
+
+
+def store(values: np.ndarray, index, value: int, values_magnitude=None):
+    if not is_exact(values) and not fits(abs(value)):
+        values = values.astype(object)
+    values[index] = value
+    if values_magnitude is None:
+        return values, None
+    return values, max(values_magnitude, abs(value))
+
+
+def assign(values: np.ndarray, index, region, values_magnitude=None, region_magnitude=None):
+    # region counterpart of store, the region is a number or an array broadcast to the indexed part
+    region_magnitude = magnitude(region) if region_magnitude is None else region_magnitude
+    if not is_exact(values) and not fits(region_magnitude):
+        values = values.astype(object)
+    values[index] = region
+    if values_magnitude is None:
+        return values, None
+    return values, max(values_magnitude, region_magnitude)
+
+
+def _checked(operation, a, b, a_magnitude, b_magnitude, result_bound, out=None):
+    if is_exact(a) or is_exact(b):
+        return narrow(operation(exact(a), exact(b)))
+
+    a_bound = magnitude(a) if a_magnitude is None else a_magnitude
+    b_bound = magnitude(b) if b_magnitude is None else b_magnitude
+    if not _fit_all(a_bound, b_bound, result_bound(a_bound, b_bound)):
+        # known magnitudes may be loose upper bounds, so check the actual values before promoting
+        a_bound = magnitude(a) if a_magnitude is not None else a_bound
+        b_bound = magnitude(b) if b_magnitude is not None else b_bound
+    bound = result_bound(a_bound, b_bound)
+    if _fit_all(a_bound, b_bound, bound):
+        # with out given, results that stay int64 are written into an existing buffer
+        if out is None:
+            out = buffers.acquire(np.broadcast_shapes(np.shape(a), np.shape(b)))
+        if tiles.store.backs(out.shape, out.dtype):
+            # values kept on disk are streamed, so only a few tiles are resident at a time
+            return tiles.store.apply(operation, a, b, out), bound
+        return operation(a, b, out=out), bound
+    return narrow(operation(exact(a), exact(b)))
+
+
+def _fit_all(a_bound, b_bound, bound):
+    return fits(a_bound) and fits(b_bound) and fits(bound)
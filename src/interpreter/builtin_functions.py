@@ -1,7 +1,11 @@
 from copy import deepcopy
 from random import random
+import numpy as np
 from ..parser.syntax import Callable
-from .variables import NumberVariable, PixelVariable, MatrixVariable
+from .variables import NumberVariable, StringVariable, PixelVariable, ArrayVariable, MatrixVariable, Matrix3dVariable, \
+    ImageVariable
+from . import arrays, filters, linalg, masks, morphology, netpbm, png, reductions
+from ..exceptions.exceptions import IndexOutOfRangeError
 
 
 class PrintFunction(Callable):
@@ -41,7 +45,7 @@ class DeterminantFunction(Callable):
     def __init__(self):
         self.id = 'det'
         self.parameter_list = ['m']
-        self.rows = None
+        self.values = None
 
     def verify_arguments(self, arguments):
         if not (len(arguments) == 1 and
@@ -49,39 +53,450 @@ class DeterminantFunction(Callable):
                 arguments[0].xdim == arguments[0].ydim):
             return False
 
-        self.rows = arguments[0].rows
+        self.values = arguments[0].values
         return True
 
     def accept(self, visitor):
-        determinant = self.determinant_recursive(self.rows)
+        determinant = linalg.determinant(self.values)
         visitor.scope_manager.return_result = NumberVariable('', determinant)
+        self.values = None
 
-    def determinant_recursive(self, m, total=0):
-        # Section 1: store indices in list for row referencing
-        indices = list(range(len(m)))
-
-        # Section 2: when at 2x2 submatrices recursive calls end
-        if len(m) == 2 and len(m[0]) == 2:
-            val = m[0][0] * m[1][1] - m[1][0] * m[0][1]
-            return val
-
-        # Section 3: define submatrix for focus column and
-        #      call this function
-        for fc in indices:  # m) for each focus column, ...
-            # find the submatrix ...
-            ms = deepcopy(m)  # B) make a copy, and ...
-            ms = ms[1:]  # ... C) remove the first row
-            height = len(ms)  # D)
-
-            for i in range(height):
-                # E) for each remaining row of submatrix ...
-                #     remove the focus column elements
-                ms[i] = ms[i][0:fc] + ms[i][fc + 1:]
-
-            sign = (-1) ** (fc % 2)  # F)
-            # G) pass submatrix recursively
-            sub_det = self.determinant_recursive(ms)
-            # H) total all returns from recursion
-            total += sign * m[0][fc] * sub_det
-
-        return total
+
+class InverseFunction(Callable):
+    def __init__(self):
+        self.id = 'inverse'
+        self.parameter_list = ['m', 'scale']
+        self.values = None
+        self.scale = None
+
+    def verify_arguments(self, arguments):
+        # values are integers, the optional scale keeps digits of the inverse: floor(scale * m^-1)
+        if not (1 <= len(arguments) <= 2 and
+                isinstance(arguments[0], MatrixVariable) and
+                arguments[0].xdim == arguments[0].ydim):
+            return False
+        if len(arguments) == 2 and not isinstance(arguments[1], NumberVariable):
+            return False
+
+        self.values = arguments[0].values
+        self.scale = arguments[1].value if len(arguments) == 2 else 1
+        return True
+
+    def accept(self, visitor):
+        values, magnitude = linalg.inverse(self.values, self.scale)
+        visitor.scope_manager.return_result = MatrixVariable('', values, magnitude)
+        self.values = None
+
+
+class SolveFunction(Callable):
+    def __init__(self):
+        self.id = 'solve'
+        self.parameter_list = ['a', 'b', 'scale']
+        self.a = None
+        self.b = None
+        self.scale = None
+
+    def verify_arguments(self, arguments):
+        # x with a * x = b, rounded down like the inverse: floor(scale * a^-1 * b)
+        if not (2 <= len(arguments) <= 3 and
+                isinstance(arguments[0], MatrixVariable) and isinstance(arguments[1], MatrixVariable) and
+                arguments[0].xdim == arguments[0].ydim and arguments[1].ydim == arguments[0].ydim):
+            return False
+        if len(arguments) == 3 and not isinstance(arguments[2], NumberVariable):
+            return False
+
+        self.a = arguments[0].values
+        self.b = arguments[1].values
+        self.scale = arguments[2].value if len(arguments) == 3 else 1
+        return True
+
+    def accept(self, visitor):
+        values, magnitude = linalg.solve(self.a, self.b, self.scale)
+        visitor.scope_manager.return_result = MatrixVariable('', values, magnitude)
+        self.a = None
+        self.b = None
+
+
+class RankFunction(Callable):
+    def __init__(self):
+        self.id = 'rank'
+        self.parameter_list = ['m']
+        self.values = None
+
+    def verify_arguments(self, arguments):
+        if not (len(arguments) == 1 and isinstance(arguments[0], MatrixVariable)):
+            return False
+
+        self.values = arguments[0].values
+        return True
+
+    def accept(self, visitor):
+        visitor.scope_manager.return_result = NumberVariable('', linalg.rank(self.values))
+        self.values = None
+
+
+class PowerFunction(Callable):
+    def __init__(self):
+        self.id = 'pow'
+        self.parameter_list = ['m', 'k']
+        self.matrix = None
+        self.exponent = None
+
+    def verify_arguments(self, arguments):
+        # square matrices, or 3d matrices of square slices, to a power that is not negative
+        if not (len(arguments) == 2 and
+                (isinstance(arguments[0], MatrixVariable) or isinstance(arguments[0], Matrix3dVariable)) and
+                arguments[0].xdim == arguments[0].ydim and
+                isinstance(arguments[1], NumberVariable) and arguments[1].value >= 0):
+            return False
+
+        self.matrix = arguments[0]
+        self.exponent = arguments[1].value
+        return True
+
+    def accept(self, visitor):
+        visitor.scope_manager.return_result = self.matrix.power(self.exponent)
+        self.matrix = None
+
+
+class TransposeFunction(Callable):
+    def __init__(self):
+        self.id = 'transpose'
+        self.parameter_list = ['m']
+        self.matrix = None
+
+    def verify_arguments(self, arguments):
+        if not (len(arguments) == 1 and
+                (isinstance(arguments[0], MatrixVariable) or isinstance(arguments[0], Matrix3dVariable))):
+            return False
+
+        self.matrix = arguments[0]
+        return True
+
+    def accept(self, visitor):
+        # the argument dies with the call scope, which leaves the view as the only holder of its buffer
+        visitor.scope_manager.return_result = self.matrix.transpose()
+        self.matrix = None
+
+
+class ConvolveFunction(Callable):
+    def __init__(self):
+        self.id = 'convolve'
+        self.parameter_list = ['matrix', 'kernel', 'mode']
+        self.matrix = None
+        self.kernel = None
+        self.mode = None
+
+    def verify_arguments(self, arguments):
+        # the border mode is optional, values outside the matrix are zeros by default
+        if not (2 <= len(arguments) <= 3 and
+                (isinstance(arguments[0], MatrixVariable) or isinstance(arguments[0], Matrix3dVariable)) and
+                isinstance(arguments[1], MatrixVariable) and arguments[1].xdim > 0 and arguments[1].ydim > 0):
+            return False
+        if len(arguments) == 3 and not isinstance(arguments[2], StringVariable):
+            return False
+
+        self.matrix = arguments[0]
+        self.kernel = arguments[1].values
+        self.mode = arguments[2].value if len(arguments) == 3 else 'zero'
+        return True
+
+    def accept(self, visitor):
+        values, magnitude = filters.convolve(self.matrix.values, self.kernel, self.mode, self.matrix.magnitude)
+        visitor.scope_manager.return_result = type(self.matrix)('', values, magnitude)
+        self.matrix = None
+
+
+class IntegralFunction(Callable):
+    def __init__(self):
+        self.id = 'integral'
+        self.parameter_list = ['m']
+        self.matrix = None
+
+    def verify_arguments(self, arguments):
+        if not (len(arguments) == 1 and
+                (isinstance(arguments[0], MatrixVariable) or isinstance(arguments[0], Matrix3dVariable))):
+            return False
+
+        self.matrix = arguments[0]
+        return True
+
+    def accept(self, visitor):
+        values, magnitude = filters.integral(self.matrix.values, self.matrix.magnitude)
+        visitor.scope_manager.return_result = type(self.matrix)('', values, magnitude)
+        self.matrix = None
+
+
+class BoxSumFunction(Callable):
+    def __init__(self):
+        self.id = 'box_sum'
+        self.parameter_list = ['table', 'top', 'left', 'bottom', 'right']
+        self.table = None
+        self.corners = None
+
+    def verify_arguments(self, arguments):
+        # the table comes from integral, bottom and right are past the box like the ends of slices
+        if not (len(arguments) == 5 and
+                (isinstance(arguments[0], MatrixVariable) or isinstance(arguments[0], Matrix3dVariable)) and
+                all(isinstance(argument, NumberVariable) for argument in arguments[1:])):
+            return False
+
+        self.table = arguments[0].values
+        self.corners = [argument.value for argument in arguments[1:]]
+        return True
+
+    def accept(self, visitor):
+        # a 3d table gives a row with the sum of every slice
+        total = filters.box_sum(self.table, *self.corners)
+        if np.ndim(total) == 0:
+            visitor.scope_manager.return_result = NumberVariable('', int(total))
+        else:
+            visitor.scope_manager.return_result = MatrixVariable('', arrays.narrow(total.reshape(1, -1))[0])
+        self.table = None
+
+
+class BoxFilterFunction(Callable):
+    def __init__(self):
+        self.id = 'box_filter'
+        self.parameter_list = ['m', 'radius', 'mode']
+        self.matrix = None
+        self.radius = None
+        self.mode = None
+
+    def verify_arguments(self, arguments):
+        # the border mode is optional like for convolve
+        if not (2 <= len(arguments) <= 3 and
+                (isinstance(arguments[0], MatrixVariable) or isinstance(arguments[0], Matrix3dVariable)) and
+                isinstance(arguments[1], NumberVariable) and arguments[1].value >= 0):
+            return False
+        if len(arguments) == 3 and not isinstance(arguments[2], StringVariable):
+            return False
+
+        self.matrix = arguments[0]
+        self.radius = arguments[1].value
+        self.mode = arguments[2].value if len(arguments) == 3 else 'zero'
+        return True
+
+    def accept(self, visitor):
+        values, magnitude = filters.box_filter(self.matrix.values, self.radius, self.mode, self.matrix.magnitude)
+        visitor.scope_manager.return_result = type(self.matrix)('', values, magnitude)
+        self.matrix = None
+
+
+class MedianFilterFunction(Callable):
+    def __init__(self):
+        self.id = 'median_filter'
+        self.parameter_list = ['m', 'radius', 'mode']
+        self.matrix = None
+        self.radius = None
+        self.mode = None
+
+    def verify_arguments(self, arguments):
+        # the border mode is optional like for box_filter, 3d matrices are filtered slice by slice
+        if not (2 <= len(arguments) <= 3 and
+                (isinstance(arguments[0], MatrixVariable) or isinstance(arguments[0], Matrix3dVariable)) and
+                isinstance(arguments[1], NumberVariable) and arguments[1].value >= 0):
+            return False
+        if len(arguments) == 3 and not isinstance(arguments[2], StringVariable):
+            return False
+
+        self.matrix = arguments[0]
+        self.radius = arguments[1].value
+        self.mode = arguments[2].value if len(arguments) == 3 else 'zero'
+        return True
+
+    def accept(self, visitor):
+        values, magnitude = filters.median_filter(self.matrix.values, self.radius, self.mode, self.matrix.magnitude)
+        visitor.scope_manager.return_result = type(self.matrix)('', values, magnitude)
+        self.matrix = None
+
+
+class MorphologyFunction(Callable):
+    def __init__(self, operator: str):
+        self.id = operator
+        self.parameter_list = ['m', 'height', 'width']
+        self.matrix = None
+        self.height = None
+        self.width = None
+
+    def verify_arguments(self, arguments):
+        # the structuring element is a height x width rectangle, a square when the width is left out
+        if not (2 <= len(arguments) <= 3 and
+                (isinstance(arguments[0], MatrixVariable) or isinstance(arguments[0], Matrix3dVariable)) and
+                all(isinstance(argument, NumberVariable) and argument.value > 0 for argument in arguments[1:])):
+            return False
+
+        self.matrix = arguments[0]
+        self.height = arguments[1].value
+        self.width = arguments[2].value if len(arguments) == 3 else self.height
+        return True
+
+    def accept(self, visitor):
+        values = morphology.apply(self.id, self.matrix.values, self.height, self.width)
+        visitor.scope_manager.return_result = type(self.matrix)('', values, self.matrix.magnitude)
+        self.matrix = None
+
+
+class ReductionFunction(Callable):
+    def __init__(self, reduction: str):
+        self.id = reduction
+        self.parameter_list = ['matrix', 'axis']
+        self.matrix = None
+        self.axes = None
+
+    def verify_arguments(self, arguments):
+        # without an axis every element is reduced, "channels" reduces each slice of a 3d matrix
+        # or each channel of an image on its own
+        if not (1 <= len(arguments) <= 2 and (isinstance(arguments[0], MatrixVariable) or
+                                              isinstance(arguments[0], Matrix3dVariable) or
+                                              isinstance(arguments[0], ImageVariable))):
+            return False
+
+        self.matrix = arguments[0]
+        self.axes = None
+        if len(arguments) == 1:
+            return True
+        axis = arguments[1]
+        if isinstance(axis, StringVariable) and axis.value == 'channels':
+            if isinstance(self.matrix, MatrixVariable):
+                return False
+            self.axes = (0, 1) if isinstance(self.matrix, ImageVariable) else (1, 2)
+        elif isinstance(axis, NumberVariable) and not isinstance(self.matrix, ImageVariable):
+            if not 0 <= axis.value < len(self.matrix.storage.shape):
+                raise IndexOutOfRangeError()
+            self.axes = (axis.value,)
+        else:
+            return False
+        return True
+
+    def accept(self, visitor):
+        if isinstance(self.matrix, ImageVariable):
+            storage, magnitude = self.matrix.values, None
+        else:
+            storage, magnitude = self.matrix.storage, self.matrix.magnitude
+        result = reductions.reduce(self.id, storage, self.axes, magnitude)
+        if isinstance(result, int):
+            result = NumberVariable('', result)
+        elif result.ndim == 1 and isinstance(self.matrix, MatrixVariable) and self.axes is not None:
+            # reductions along one axis of a matrix keep it as a row or a column
+            result = MatrixVariable('', result.reshape((1, -1) if self.axes == (0,) else (-1, 1)))
+        else:
+            result = MatrixVariable('', result.reshape((1, -1)) if result.ndim == 1 else result)
+        visitor.scope_manager.return_result = result
+        self.matrix = None
+
+
+class CompareFunction(Callable):
+    def __init__(self, comparison: str):
+        self.id = comparison
+        self.parameter_list = ['a', 'b']
+        self.operands = None
+
+    def verify_arguments(self, arguments):
+        if not (len(arguments) == 2 and all(is_operand(argument) for argument in arguments)):
+            return False
+
+        self.operands = arguments
+        return True
+
+    def accept(self, visitor):
+        a, b = (operand_values(operand) for operand in self.operands)
+        visitor.scope_manager.return_result = array_result(*masks.compare(self.id, a, b))
+        self.operands = None
+
+
+class WhereFunction(Callable):
+    def __init__(self):
+        self.id = 'where'
+        self.parameter_list = ['mask', 'a', 'b']
+        self.operands = None
+
+    def verify_arguments(self, arguments):
+        if not (len(arguments) == 3 and all(is_operand(argument) for argument in arguments)):
+            return False
+
+        self.operands = arguments
+        return True
+
+    def accept(self, visitor):
+        mask, a, b = (operand_values(operand) for operand in self.operands)
+        magnitudes = [operand.magnitude if isinstance(operand, ArrayVariable) else None
+                      for operand in self.operands[1:]]
+        visitor.scope_manager.return_result = array_result(*masks.where(mask, a, b, *magnitudes))
+        self.operands = None
+
+
+class LoadImageFunction(Callable):
+    def __init__(self):
+        self.id = 'load_image'
+        self.parameter_list = ['path']
+        self.path = None
+
+    def verify_arguments(self, arguments):
+        if not (len(arguments) == 1 and isinstance(arguments[0], StringVariable)):
+            return False
+
+        self.path = arguments[0].value
+        return True
+
+    def accept(self, visitor):
+        # the format is told by the file signature, anything but png is read as netpbm
+        values, maxval = png.read(self.path) if png.is_png(self.path) else netpbm.read(self.path)
+        if values.dtype == np.uint8:
+            image = ImageVariable('', values)
+        elif values.ndim == 2:
+            image = MatrixVariable('', values, maxval)
+        else:
+            image = Matrix3dVariable('', values, maxval)
+        visitor.scope_manager.return_result = image
+
+
+class SaveImageFunction(Callable):
+    def __init__(self):
+        self.id = 'save_image'
+        self.parameter_list = ['path', 'image']
+        self.path = None
+        self.values = None
+
+    def verify_arguments(self, arguments):
+        if not (len(arguments) == 2 and isinstance(arguments[0], StringVariable)):
+            return False
+
+        self.path = arguments[0].value
+        if isinstance(arguments[1], ImageVariable) or isinstance(arguments[1], MatrixVariable):
+            self.values = arguments[1].values
+        elif isinstance(arguments[1], Matrix3dVariable) and arguments[1].zdim == 3:
+            # slices of a 3d matrix are the r, g and b channels
+            self.values = np.moveaxis(arguments[1].values, 0, -1)
+        else:
+            return False
+        return True
+
+    def accept(self, visitor):
+        if self.path.lower().endswith('.png'):
+            png.write(self.path, self.values)
+        else:
+            netpbm.write(self.path, self.values)
+        self.values = None
+
+
+def is_operand(variable):
+    return isinstance(variable, NumberVariable) or isinstance(variable, ArrayVariable) or \
+        isinstance(variable, ImageVariable)
+
+
+def operand_values(variable):
+    # numbers stay python ints, images are read as 3d matrices with the r, g and b channels as slices
+    if isinstance(variable, NumberVariable):
+        return variable.value
+    if isinstance(variable, ImageVariable):
+        return np.moveaxis(variable.values, -1, 0)
+    return variable.values
+
+
+def array_result(values, magnitude):
+    if np.ndim(values) == 0:
+        return NumberVariable('', int(values))
+    if values.ndim == 2:
+        return MatrixVariable('', values, magnitude)
+    return Matrix3dVariable('', values, magnitude)
@@ -0,0 +1,299 @@
+import math
+import numpy as np
+from . import arrays
+from .pool import buffers
+from .tiles import store
+from .variables import PixelVariable
+from ..exceptions.exceptions import BorderModeException, IndexOutOfRangeError
+
+# border modes by name, as understood by np.pad
+MODES = {'zero': 'constant', 'edge': 'edge', 'reflect': 'reflect', 'wrap': 'wrap'}
+# kernels with at least this many taps, counting both passes of separable ones, are convolved through the fft
+FFT_TAPS = 49
+# largest rounding error of an fft result that still rounds to the exact integer
+FFT_TOLERANCE = 0.25
+# values spanning at most as many levels as a pixel channel have their medians counted in histograms,
+# as many coarse bins as there are levels in each
+MEDIAN_LEVELS = PixelVariable.MAX_VALUE - PixelVariable.MIN_VALUE + 1
+MEDIAN_BINS = math.isqrt(MEDIAN_LEVELS)
+# windows up to this radius are cheaper to sort than to count
+MEDIAN_DIRECT_RADIUS = 3
+# window sums along rows are added from doubling spans up to this length, from running sums above
+MEDIAN_DOUBLING_LENGTH = 1024
+
+
+def check_mode(mode: str):
+    if mode not in MODES:
+        raise BorderModeException(mode, MODES)
+
+
+def convolve(values: np.ndarray, kernel: np.ndarray, mode: str = 'zero', magnitude: int = None):
+    # same sized convolution of every ydim x xdim slice, with the kernel centered on each element
+    check_mode(mode)
+    if values.size == 0:
+        # np.pad cannot extend an empty axis by its edge or reflection, and there is nothing to filter
+        return values.copy(), 0
+    magnitude = arrays.magnitude(values) if magnitude is None else magnitude
+    bound = magnitude * int(np.abs(arrays.exact(kernel)).sum())
+    if not arrays.fits(bound) or arrays.is_exact(values) or arrays.is_exact(kernel):
+        return arrays.narrow(_direct(arrays.exact(values), arrays.exact(kernel), mode))
+
+    if store.backs(values.shape, values.dtype) and mode != 'wrap':
+        # out of core values are filtered one band of rows at a time, wrapping needs the whole slice
+        result = store.allocate(values.shape, np.int64)
+        planes = values.reshape((-1,) + values.shape[-2:])
+        for z, plane in enumerate(result.reshape(planes.shape)):
+            store.neighbourhood(lambda block: _convolve(block, kernel, mode, magnitude), planes[z],
+                                kernel.shape[0] // 2, out=plane)
+        return result, bound
+    return _convolve(values, kernel, mode, magnitude), bound
+
+
+def integral(values: np.ndarray, magnitude: int = None):
+    # summed-area table of every ydim x xdim slice, each element is the sum of the ones above and left of it
+    # and itself, two running sums whatever the size
+    magnitude = arrays.magnitude(values) if magnitude is None else magnitude
+    bound = magnitude * values.shape[-2] * values.shape[-1]
+    if not arrays.fits(bound) or arrays.is_exact(values):
+        return arrays.narrow(np.cumsum(np.cumsum(arrays.exact(values), axis=-2), axis=-1))
+    table = buffers.acquire(values.shape)
+    np.cumsum(values, axis=-2, out=table)
+    np.cumsum(table, axis=-1, out=table)
+    return table, bound
+
+
+def box_sum(table: np.ndarray, top: int, left: int, bottom: int, right: int):
+    # sum of rows top to bottom - 1 and columns left to right - 1 of the values behind the table, one per slice,
+    # from at most four of its elements
+    if not (0 <= top <= bottom <= table.shape[-2] and 0 <= left <= right <= table.shape[-1]):
+        raise IndexOutOfRangeError()
+
+    def corner(y: int, x: int):
+        # corners on the leading edge are zeros, still one per slice so that 3d tables always give rows
+        if y > 0 and x > 0:
+            return arrays.exact(table[..., y - 1, x - 1])
+        return np.zeros(table.shape[:-2], dtype=table.dtype)
+    # each difference is the sum of a band of rows, so it stays within the bound of the table
+    return (corner(bottom, right) - corner(top, right)) - (corner(bottom, left) - corner(top, left))
+
+
+def box_filter(values: np.ndarray, radius: int, mode: str = 'zero', magnitude: int = None):
+    # floor of the mean of the 2 * radius + 1 wide square around every element, the cost per element does not
+    # depend on the radius; means are bounded by the values
+    check_mode(mode)
+    if values.size == 0:
+        return values.copy(), 0
+    magnitude = arrays.magnitude(values) if magnitude is None else magnitude
+    if store.backs(values.shape, values.dtype) and mode != 'wrap':
+        result = store.allocate(values.shape, np.int64)
+        planes = values.reshape((-1,) + values.shape[-2:])
+        for z, plane in enumerate(result.reshape(planes.shape)):
+            store.neighbourhood(lambda block: _box_filter(block, radius, mode, magnitude), planes[z], radius,
+                                out=plane)
+        return result, magnitude
+    return arrays.narrow(_box_filter(values, radius, mode, magnitude))[0], magnitude
+
+
+def _box_filter(values: np.ndarray, radius: int, mode: str, magnitude: int) -> np.ndarray:
+    side = 2 * radius + 1
+    padded = _pad(values, (side, side), mode)
+    # the table has a leading row and column of zeros, so that every window is four plain reads
+    shape = padded.shape[:-2] + (padded.shape[-2] + 1, padded.shape[-1] + 1)
+    exact = not arrays.fits(magnitude * shape[-2] * shape[-1]) or arrays.is_exact(values)
+    table = np.zeros(shape, dtype=object) if exact else buffers.zeros(shape)
+    np.cumsum(padded, axis=-2, out=table[..., 1:, 1:])
+    np.cumsum(table[..., 1:, 1:], axis=-1, out=table[..., 1:, 1:])
+    sums = (table[..., side:, side:] - table[..., :-side, side:]) - \
+        (table[..., side:, :-side] - table[..., :-side, :-side])
+    buffers.release(table)
+    return sums // (side * side)
+
+
+def median_filter(values: np.ndarray, radius: int, mode: str = 'zero', magnitude: int = None):
+    # median of the 2 * radius + 1 wide square around every element, medians are elements and keep the bound
+    check_mode(mode)
+    magnitude = arrays.magnitude(values) if magnitude is None else magnitude
+    if store.backs(values.shape, values.dtype) and mode != 'wrap':
+        result = store.allocate(values.shape, values.dtype)
+        planes = values.reshape((-1,) + values.shape[-2:])
+        for z, plane in enumerate(result.reshape(planes.shape)):
+            store.neighbourhood(lambda block: _median_filter(block, radius, mode), planes[z], radius, out=plane)
+        return result, magnitude
+    return _median_filter(values, radius, mode), magnitude
+
+
+def _median_filter(values: np.ndarray, radius: int, mode: str) -> np.ndarray:
+    if values.size == 0:
+        return values.copy()
+    side = 2 * radius + 1
+    padded = _pad(values, (side, side), mode)
+    planes = padded.reshape((-1,) + padded.shape[-2:])
+    if radius <= MEDIAN_DIRECT_RADIUS:
+        return _select_medians(planes, side).reshape(values.shape)
+    low = planes.min()
+    if planes.max() - low < MEDIAN_LEVELS:
+        levels = (planes - low).astype(np.uint8)
+        return (_histogram_medians(levels, side).astype(values.dtype) + low).reshape(values.shape)
+    # medians only depend on the order of the values, few distinct ones are counted by their ranks
+    distinct, ranks = np.unique(planes, return_inverse=True)
+    if distinct.size <= MEDIAN_LEVELS:
+        levels = ranks.reshape(planes.shape).astype(np.uint8)
+        return distinct[_histogram_medians(levels, side)].reshape(values.shape)
+    return _select_medians(planes, side).reshape(values.shape)
+
+
+def _select_medians(planes: np.ndarray, side: int) -> np.ndarray:
+    # partial sorts of the windows, one row of them at a time so that the copies stay small
+    windows = np.lib.stride_tricks.sliding_window_view(planes, (side, side), axis=(-2, -1))
+    middle = side * side // 2
+    result = np.empty(windows.shape[:3], dtype=planes.dtype)
+    for y in range(result.shape[1]):
+        row = windows[:, y].reshape(windows.shape[0], windows.shape[2], side * side)
+        result[:, y] = np.partition(row, middle, axis=-1)[..., middle]
+    return result
+
+
+def _histogram_medians(levels: np.ndarray, side: int) -> np.ndarray:
+    # perreault and hebert: every column keeps a histogram of the side levels above the current row of windows,
+    # moving down a row takes one level out of it and one in, and the histogram of a window sums side columns;
+    # all the windows of a row, in every plane, are handled at once
+    depth, height, width = levels.shape[0], levels.shape[1] - side + 1, levels.shape[2] - side + 1
+    rows = levels.transpose(1, 0, 2).reshape(levels.shape[1], -1).astype(np.intp)
+    offsets = np.arange(rows.shape[1])
+    # counts of a window fit 16 bits up to a radius of 127, running sums wrap around but their differences do not
+    count_type = np.uint16 if side * side <= np.iinfo(np.uint16).max else np.uint32
+    fine = np.zeros((depth, levels.shape[2], MEDIAN_LEVELS), dtype=count_type)
+    coarse = np.zeros((depth, levels.shape[2], MEDIAN_BINS), dtype=count_type)
+    result = np.empty((height, depth * width), dtype=np.uint8)
+    for y in range(levels.shape[1]):
+        fine.reshape(-1)[offsets * MEDIAN_LEVELS + rows[y]] += 1
+        coarse.reshape(-1)[offsets * MEDIAN_BINS + rows[y] // MEDIAN_BINS] += 1
+        if y >= side:
+            fine.reshape(-1)[offsets * MEDIAN_LEVELS + rows[y - side]] -= 1
+            coarse.reshape(-1)[offsets * MEDIAN_BINS + rows[y - side] // MEDIAN_BINS] -= 1
+        if y >= side - 1:
+            result[y - side + 1] = _median_levels(_window_sums(coarse, side), _window_sums(fine, side), side)
+    return result.reshape(height, depth, width).transpose(1, 0, 2)
+
+
+def _median_levels(coarse: np.ndarray, fine: np.ndarray, side: int) -> np.ndarray:
+    # the coarse bin holding the middle count first, then the level within it; running totals over the bins
+    # are products with a triangle of ones, far faster than accumulating and exact for any window
+    middle = side * side // 2
+    windows = np.arange(coarse.shape[0] * coarse.shape[1])
+    triangle = np.triu(np.ones((MEDIAN_BINS, MEDIAN_BINS), dtype=np.float64))
+    ones = np.ones(MEDIAN_BINS, dtype=np.float64)
+    totals = coarse.reshape(windows.size, MEDIAN_BINS).astype(np.float64) @ triangle
+    bins = ((totals <= middle).astype(np.float64) @ ones).astype(np.intp)
+    below = np.where(bins > 0, totals[windows, bins - 1], 0)
+    counts = fine.reshape(windows.size, MEDIAN_BINS, MEDIAN_BINS)[windows, bins]
+    totals = counts.astype(np.float64) @ triangle + below[:, None]
+    return bins * MEDIAN_BINS + ((totals <= middle).astype(np.float64) @ ones).astype(np.intp)
+
+
+def _window_sums(columns: np.ndarray, length: int) -> np.ndarray:
+    # sums of every length consecutive columns from spans of doubling widths, a few whole array additions for
+    # any practical length; running sums take a fixed number of passes but numpy accumulates them slowly
+    count = columns.shape[1] - length + 1
+    if length > MEDIAN_DOUBLING_LENGTH:
+        running = np.zeros((columns.shape[0], columns.shape[1] + 1) + columns.shape[2:], dtype=columns.dtype)
+        np.cumsum(columns, axis=1, out=running[:, 1:])
+        return running[:, length:] - running[:, :count]
+    result = None
+    start = 0
+    width = 1
+    while True:
+        if length & width:
+            span = columns[:, start:start + count]
+            result = span.copy() if result is None else np.add(result, span, out=result)
+            start += width
+        if 2 * width > length:
+            return result
+        columns = columns[:, :-width] + columns[:, width:]
+        width *= 2
+
+
+def separate(kernel: np.ndarray):
+    # integer column and row whose outer product is the kernel, None unless the kernel has rank one
+    nonzero_rows = np.flatnonzero(np.any(kernel != 0, axis=1))
+    if nonzero_rows.size == 0:
+        return None
+    row = kernel[nonzero_rows[0]]
+    row = row // np.gcd.reduce(np.abs(row))
+    pivot = np.flatnonzero(row)[0]
+    column = kernel[:, pivot] // row[pivot]
+    if not np.array_equal(np.outer(column, row), kernel):
+        return None
+    return column, row
+
+
+def _convolve(values: np.ndarray, kernel: np.ndarray, mode: str, magnitude: int) -> np.ndarray:
+    separated = separate(kernel) if kernel.shape[0] > 1 and kernel.shape[1] > 1 else None
+    taps = kernel.size if separated is None else kernel.shape[0] + kernel.shape[1]
+    if taps >= FFT_TAPS and _fft_is_exact(values, kernel, magnitude):
+        return _fft(values, kernel, mode)
+    if separated is not None:
+        # two one dimensional passes, the intermediate is bounded by the final result
+        column, row = separated
+        return _direct(_direct(values, column[:, None], mode), row[None, :], mode)
+    return _direct(values, kernel, mode)
+
+
+def _pad(values: np.ndarray, kernel_shape, mode: str) -> np.ndarray:
+    # a kernel element at (i, j) reads the element i rows above and j columns left of its mirror
+    ydim, xdim = kernel_shape
+    widths = [(0, 0)] * (values.ndim - 2) + [((ydim - 1) // 2, ydim // 2), ((xdim - 1) // 2, xdim // 2)]
+    if mode == 'zero':
+        # a zero of the values' own type, numpy zeros among python ints overflow in running sums
+        return np.pad(values, widths, constant_values=np.zeros((), dtype=values.dtype))
+    return np.pad(values, widths, mode=MODES[mode])
+
+
+def _direct(values: np.ndarray, kernel: np.ndarray, mode: str) -> np.ndarray:
+    padded = _pad(values, kernel.shape, mode)
+    ydim, xdim = values.shape[-2:]
+    if values.dtype == object:
+        result = np.zeros(values.shape, dtype=object)
+    else:
+        result = buffers.zeros(values.shape)
+    for (i, j), weight in np.ndenumerate(kernel):
+        if weight:
+            y = kernel.shape[0] - 1 - i
+            x = kernel.shape[1] - 1 - j
+            result += weight * padded[..., y:y + ydim, x:x + xdim]
+    return result
+
+
+def _fft(values: np.ndarray, kernel: np.ndarray, mode: str) -> np.ndarray:
+    # circular convolution of the padded slices, the wrapped around part is exactly the padding
+    padded = _pad(values, kernel.shape, mode)
+    # extra zeros only lengthen the part that is cut off, and smooth lengths transform faster
+    shape = tuple(_fast_length(length) for length in padded.shape[-2:])
+    spectrum = np.fft.rfft2(padded, shape, axes=(-2, -1)) * np.fft.rfft2(kernel, shape)
+    full = np.fft.irfft2(spectrum, shape, axes=(-2, -1))
+    result = buffers.acquire(values.shape)
+    np.rint(full[..., kernel.shape[0] - 1:padded.shape[-2], kernel.shape[1] - 1:padded.shape[-1]],
+            out=result, casting='unsafe')
+    return result
+
+
+def _fast_length(length: int) -> int:
+    # smallest product of powers of 2, 3 and 5 not below the length
+    best = 1 << max(0, (length - 1).bit_length())
+    power5 = 1
+    while power5 < best:
+        power35 = power5
+        while power35 < best:
+            candidate = power35 << max(0, (length - 1) // power35).bit_length()
+            best = min(best, candidate)
+            power35 *= 3
+        power5 *= 5
+    return best
+
+
+def _fft_is_exact(values: np.ndarray, kernel: np.ndarray, magnitude: int) -> bool:
+    # rounding errors of the fft grow with the norms of both operands and the log of the size
+    size = _fast_length(values.shape[-2] + kernel.shape[0]) * _fast_length(values.shape[-1] + kernel.shape[1])
+    error = np.finfo(np.float64).eps * math.log2(size) * magnitude * math.sqrt(size) * \
+        float(np.sqrt(np.square(kernel.astype(np.float64)).sum()))
+    return error < FFT_TOLERANCE
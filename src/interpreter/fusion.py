@@ -0,0 +1,156 @@
+import numpy as np
+from . import arrays
+from .pool import buffers
+from .variables import NumberVariable, ArrayVariable, MatrixVariable, Matrix3dVariable
+from ..lexer.token_type import TokenType
+
+# elements evaluated at once, so that intermediate chunks stay in cache
+CHUNK_SIZE = 1 << 15
+
+OPERATIONS = {
+    TokenType.ADD: (np.add, arrays.add, '+'),
+    TokenType.SUBTRACT: (np.subtract, arrays.subtract, '-'),
+    TokenType.MULTIPLY: (np.multiply, arrays.multiply, '*'),
+    TokenType.SPECIAL_MULTIPLY: (np.multiply, arrays.multiply, '@'),
+    TokenType.DIVIDE: (np.floor_divide, arrays.floor_divide, '/'),
+    TokenType.MODULO: (np.remainder, arrays.modulo, '%'),
+}
+
+
+class LazyExpression:
+    def __init__(self, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+        self.shape = max(_shape(left), _shape(right), key=len)
+        self.bound = _result_bound(operator, _bound(left), _bound(right))
+        # largest bound of any intermediate result
+        self.peak = max(self.bound, _peak(left), _peak(right))
+        self.name = _name(operator, left, right)
+
+    def leaves(self):
+        for operand in (self.left, self.right):
+            if isinstance(operand, LazyExpression):
+                yield from operand.leaves()
+            elif isinstance(operand, ArrayVariable):
+                yield operand
+
+    def evaluate(self):
+        if arrays.fits(self.peak) and not any(arrays.is_exact(leaf.values) for leaf in self.leaves()):
+            values, magnitude = self.evaluate_chunked(), self.bound
+        else:
+            values, magnitude = self.evaluate_exact()
+        if len(self.shape) == 3:
+            return Matrix3dVariable(self.name, values, magnitude)
+        return MatrixVariable(self.name, values, magnitude)
+
+    def evaluate_chunked(self) -> np.ndarray:
+        # one pass over the inputs, writing each chunk of the output once
+        result = buffers.acquire(self.shape)
+        planes = result.reshape((-1,) + self.shape[-2:])
+        rows = max(1, CHUNK_SIZE // max(1, self.shape[-1]))
+        for z in range(planes.shape[0]):
+            for y in range(0, self.shape[-2], rows):
+                planes[z, y:y + rows] = self.compute_chunk(z, slice(y, y + rows))
+        return result
+
+    def compute_chunk(self, z: int, rows: slice):
+        return OPERATIONS[self.operator][0](_chunk(self.left, z, rows), _chunk(self.right, z, rows))
+
+    def evaluate_exact(self):
+        left, left_magnitude = _exact(self.left)
+        right, right_magnitude = _exact(self.right)
+        return OPERATIONS[self.operator][1](left, right, left_magnitude, right_magnitude)
+
+
+def combine(operator, left, right):
+    # returns None when the operation has to be evaluated eagerly
+    if not (_is_operand(left) and _is_operand(right)):
+        return None
+
+    left_shape = _shape(left)
+    right_shape = _shape(right)
+    if left_shape and right_shape:
+        if left_shape[-2:] != right_shape[-2:] or \
+                (len(left_shape) == len(right_shape) and left_shape != right_shape):
+            return None
+
+    if operator == TokenType.ADD and (left_shape or right_shape):
+        return LazyExpression(operator, left, right)
+    if operator == TokenType.SUBTRACT and left_shape and len(left_shape) >= len(right_shape):
+        return LazyExpression(operator, left, right)
+    if operator == TokenType.MULTIPLY and bool(left_shape) != bool(right_shape):
+        return LazyExpression(operator, left, right)
+    if operator == TokenType.SPECIAL_MULTIPLY and len(left_shape) == 2 and right_shape:
+        return LazyExpression(operator, left, right)
+    if (operator == TokenType.DIVIDE or operator == TokenType.MODULO) and left_shape \
+            and not right_shape and right.value != 0:
+        return LazyExpression(operator, left, right)
+    return None
+
+
+def _name(operator, left, right):
+    # named as by the eager operators: numbers come after the matrix, and are added negated when subtracted
+    if operator == TokenType.SPECIAL_MULTIPLY:
+        return ''
+    if isinstance(left, NumberVariable):
+        left, right = right, left
+    if operator == TokenType.SUBTRACT and isinstance(right, NumberVariable):
+        return left.name + '+' + right.name
+    return left.name + OPERATIONS[operator][2] + right.name
+
+
+def _is_operand(value):
+    return isinstance(value, NumberVariable) or isinstance(value, LazyExpression) or \
+        (isinstance(value, ArrayVariable) and not value.is_sparse)
+
+
+def _shape(operand):
+    if isinstance(operand, NumberVariable):
+        return ()
+    if isinstance(operand, LazyExpression):
+        return operand.shape
+    return operand.storage.shape
+
+
+def _bound(operand):
+    if isinstance(operand, NumberVariable):
+        return abs(operand.value)
+    if isinstance(operand, LazyExpression):
+        return operand.bound
+    return operand.magnitude
+
+
+def _peak(operand):
+    if isinstance(operand, LazyExpression):
+        return operand.peak
+    return _bound(operand)
+
+
+def _result_bound(operator, left, right):
+    if operator == TokenType.ADD or operator == TokenType.SUBTRACT:
+        return left + right
+    if operator == TokenType.MULTIPLY or operator == TokenType.SPECIAL_MULTIPLY:
+        return left * right
+    if operator == TokenType.DIVIDE:
+        return left
+    return right
+
+
+def _chunk(operand, z: int, rows: slice):
+    if isinstance(operand, NumberVariable):
+        return operand.value
+    if isinstance(operand, LazyExpression):
+        return operand.compute_chunk(z, rows)
+    values = operand.values
+    if values.ndim == 3:
+        return values[z, rows]
+    return values[rows]
+
+
+def _exact(operand):
+    if isinstance(operand, LazyExpression):
+        return operand.evaluate_exact()
+    if isinstance(operand, NumberVariable):
+        return operand.value, abs(operand.value)
+    return operand.values, operand.magnitude
@@ -2,15 +2,22 @@ from .scope import ScopeManager
 from .visitor import Visitor
 from .variables import *
 from .builtin_functions import *
+from . import fusion, masks, morphology, pool, reductions, tiles
 from ..lexer.token_type import TokenType
 from ..parser.syntax import *
 from ..exceptions.exceptions import *
 
 
 class Interpreter(Visitor):
-    def __init__(self, parser):
+    def __init__(self, parser, pool_budget: int = pool.DEFAULT_BUDGET, tile_threshold: int = None,
+                 tile_bytes: int = tiles.DEFAULT_TILE_BYTES, tile_directory: str = None):
         self.parser = parser
         self.scope_manager = ScopeManager()
+        self.buffer_pool = pool.buffers
+        self.buffer_pool.reset(pool_budget)
+        # with a threshold given, values of that many bytes or more are processed out of core
+        self.tile_store = tiles.store
+        self.tile_store.reset(tile_threshold, tile_bytes, tile_directory)
 
     def interpret(self):
         self.__load_built_in_functions()
@@ -22,7 +29,10 @@ class Interpreter(Visitor):
             return -1
 
         return self.__return_result()
-        
+
+    def pool_statistics(self):
+        return self.buffer_pool.statistics()
+
     def visit_program(self, program: Program):
         main_function = None
         for function_definition in program.function_definitions:
@@ -109,6 +119,9 @@ class Interpreter(Visitor):
             matrices.append(self.scope_manager.last_result)
         self.scope_manager.last_result = Matrix3dVariable('', matrices)
 
+    def visit_string(self, string: String):
+        self.scope_manager.last_result = StringVariable('', string.value)
+
     def visit_expression_in_parenthesis(self, expression_in_parenthesis: ExpressionInParenthesis):
         expression_in_parenthesis.expression.accept(self)
 
@@ -124,51 +137,23 @@ class Interpreter(Visitor):
             self.scope_manager.last_result = deepcopy(variable)
         elif isinstance(base_expression.expression, Matrix) or\
                 isinstance(base_expression.expression, Matrix3d) or\
+                isinstance(base_expression.expression, String) or\
                 isinstance(base_expression.expression, InitStatement) or\
                 isinstance(base_expression.expression, Reference) or\
                 isinstance(base_expression.expression, MatrixLookup) or\
                 isinstance(base_expression.expression, FunctionCall) or\
                 isinstance(base_expression.expression, ExpressionInParenthesis):
             base_expression.expression.accept(self)
-            self.scope_manager.last_result *= NumberVariable('', sign)
+            if sign == -1:
+                self.scope_manager.last_result *= NumberVariable('', sign)
+            else:
+                self.scope_manager.last_result = self.__times_one(self.scope_manager.last_result)
 
     def visit_multiplicative_expression(self, multiplicative_expression: MultiplicativeExpression):
-        multiplicative_expression.base_expressions[0].accept(self)
-        result = self.scope_manager.last_result
-        for operator, expression in zip(multiplicative_expression.multiplicative_operators,
-                                        multiplicative_expression.base_expressions[1:]):
-            expression.accept(self)
-            if operator == TokenType.MULTIPLY:
-                result *= self.scope_manager.last_result
-            elif operator == TokenType.DIVIDE:
-                if self.scope_manager.last_result.has_zero():
-                    raise ZeroDivisionException()
-                result /= self.scope_manager.last_result
-            elif operator == TokenType.MODULO:
-                result %= self.scope_manager.last_result
-            elif operator == TokenType.SPECIAL_MULTIPLY:
-                if not isinstance(result, MatrixVariable) or isinstance(result, Matrix3dVariable):
-                    raise IllicitOperatorException(operator, type(result), type(self.scope_manager.last_result))
-                result = result.special_multiply(self.scope_manager.last_result)
-
-            if result is None:
-                raise IllicitOperatorException(operator, type(result), type(self.scope_manager.last_result))
-            self.scope_manager.last_result = result
+        self.scope_manager.last_result = self.__materialize(self.__arithmetic(multiplicative_expression))
 
     def visit_additive_expression(self, additive_expression: AdditiveExpression):
-        additive_expression.multiplicative_expressions[0].accept(self)
-        result = self.scope_manager.last_result
-        for operator, expression in zip(additive_expression.additive_operators,
-                                        additive_expression.multiplicative_expressions[1:]):
-            expression.accept(self)
-            if operator == TokenType.ADD:
-                result += self.scope_manager.last_result
-            elif operator == TokenType.SUBTRACT:
-                result -= self.scope_manager.last_result
-
-            if result is None:
-                raise IllicitOperatorException(operator, type(result), type(self.scope_manager.last_result))
-            self.scope_manager.last_result = result
+        self.scope_manager.last_result = self.__materialize(self.__arithmetic(additive_expression))
 
     def visit_expression(self, expression: Expression):
         expression.additive_expressions[0].accept(self)
@@ -287,32 +272,48 @@ class Interpreter(Visitor):
             if init_statement.argument_list.length == 1:
                 init_statement.argument_list.accept(self)
                 arguments = self.scope_manager.last_result
-                row = [0] * arguments[0].value
-                self.scope_manager.last_result = MatrixVariable('', [row])
+                self.scope_manager.last_result = MatrixVariable.zeros(1, arguments[0].value)
 
             elif init_statement.argument_list.length == 2:
                 init_statement.argument_list.accept(self)
                 arguments = self.scope_manager.last_result
-                rows = []
-                for i in range(arguments[0].value):
-                    rows.append([0] * arguments[1].value)
-                self.scope_manager.last_result = MatrixVariable('', rows)
+                self.scope_manager.last_result = MatrixVariable.zeros(arguments[0].value, arguments[1].value)
 
             elif init_statement.argument_list.length == 3:
                 init_statement.argument_list.accept(self)
                 arguments = self.scope_manager.last_result
-                matrices = []
-                for m in range(arguments[0].value):
-                    rows = []
-                    for r in range(arguments[1].value):
-                        rows.append([0] * arguments[2].value)
-
-                    matrices.append(MatrixVariable('', rows))
-                self.scope_manager.last_result = Matrix3dVariable('', matrices)
+                self.scope_manager.last_result = Matrix3dVariable.zeros(arguments[0].value,
+                                                                        arguments[1].value,
+                                                                        arguments[2].value)
 
             else:
                 raise InvalidArgumentsNumberException("To initialize a matrix variable input 0 or 2 or 3 variables.",
                                                       init_statement.argument_list.length)
+
+        elif init_statement.type == TokenType.IMAGE:
+            if init_statement.argument_list.length == 1:
+                init_statement.argument_list.accept(self)
+                matrix = self.scope_manager.last_result[0]
+                if not isinstance(matrix, Matrix3dVariable):
+                    raise ArgumentTypeException(matrix.name, 'matrix', type(matrix))
+                self.scope_manager.last_result = ImageVariable.from_matrix3d(matrix)
+
+            elif init_statement.argument_list.length == 2:
+                init_statement.argument_list.accept(self)
+                arguments = self.scope_manager.last_result
+                self.scope_manager.last_result = ImageVariable.zeros(arguments[0].value, arguments[1].value)
+
+            elif init_statement.argument_list.length == 3:
+                init_statement.argument_list.accept(self)
+                arguments = self.scope_manager.last_result
+                if not isinstance(arguments[2], PixelVariable):
+                    raise ArgumentTypeException(arguments[2].name, 'pixel', type(arguments[2]))
+                self.scope_manager.last_result = ImageVariable.filled(arguments[0].value, arguments[1].value,
+                                                                      arguments[2])
+
+            else:
+                raise InvalidArgumentsNumberException("To initialize an image variable input 1 or 2 or 3 variables.",
+                                                      init_statement.argument_list.length)
         else:
             raise InvalidVariableTypeException(init_statement.type)
 
@@ -327,16 +328,20 @@ class Interpreter(Visitor):
         operator_definition.block.accept(self)
 
     def visit_assignment(self, assignment: Assignment):
+        if assignment.id is not None and assignment.reference is None and assignment.matrix_lookup is None and \
+                self.__update_in_place(assignment):
+            return
+
         assignment.expression.accept(self)
         if assignment.reference is not None:
             return_result = self.scope_manager.return_result
-            self.scope_manager.return_result = self.scope_manager.last_result.value
+            self.scope_manager.return_result = assigned_value(self.scope_manager.last_result)
             assignment.reference.accept(self)
             self.scope_manager.return_result = return_result
 
         if assignment.matrix_lookup is not None:
             return_result = self.scope_manager.return_result
-            self.scope_manager.return_result = self.scope_manager.last_result.value
+            self.scope_manager.return_result = assigned_value(self.scope_manager.last_result)
             assignment.matrix_lookup.accept(self)
             self.scope_manager.return_result = return_result
 
@@ -347,6 +352,11 @@ class Interpreter(Visitor):
     def visit_reference(self, reference: Reference):
         reference_result = None
         variable = self.scope_manager.get_variable(reference.id1)
+        assigned = self.scope_manager.return_result
+        if isinstance(assigned, Variable) and \
+                not (isinstance(variable, ImageVariable) and isinstance(assigned, MatrixVariable)):
+            raise ArgumentTypeException(reference.id2, 'number', type(assigned))
+
         if isinstance(variable, PixelVariable):
             pixel = variable
             if reference.id2 == 'r':
@@ -388,18 +398,50 @@ class Interpreter(Visitor):
                 else:
                     reference_result = NumberVariable('', 3)
 
+        elif isinstance(variable, ImageVariable):
+            image = variable
+            if reference.id2 in ImageVariable.CHANNELS:
+                if isinstance(assigned, int) or isinstance(assigned, MatrixVariable):
+                    # value assigned to image channel
+                    image.set_channel(reference.id2, assigned)
+                    reference_result = image
+                else:
+                    # image channel assigned to variable
+                    reference_result = image.get_channel(reference.id2)
+            elif reference.id2 == 'xdim':
+                reference_result = NumberVariable('', image.xdim)
+            elif reference.id2 == 'ydim':
+                reference_result = NumberVariable('', image.ydim)
+
         if reference_result is not None:
             self.scope_manager.last_result = reference_result
         else:
             raise UndefinedReferenceException(reference.id2)
 
+    def visit_slice(self, _slice: Slice):
+        bounds = []
+        for bound in (_slice.start, _slice.stop):
+            if bound is not None:
+                bound.accept(self)
+                bound = self.scope_manager.last_result.value
+            bounds.append(bound)
+        self.scope_manager.last_result = slice(*bounds)
+
     def visit_matrix_lookup(self, matrix_lookup: MatrixLookup):
         indices = []
         for index in matrix_lookup.indices:
             index.accept(self)
-            indices.append(self.scope_manager.last_result.value)
+            result = self.scope_manager.last_result
+            indices.append(result if isinstance(result, slice) else result.value)
 
         matrix = self.scope_manager.get_variable(matrix_lookup.id)
+        assigned = self.scope_manager.return_result
+        if any(isinstance(index, slice) for index in indices):
+            self.__lookup_region(matrix_lookup.id, matrix, indices, assigned)
+            return
+        if isinstance(assigned, Variable) and \
+                not (isinstance(matrix, ImageVariable) and isinstance(assigned, PixelVariable)):
+            raise ArgumentTypeException(matrix_lookup.id, 'number', type(assigned))
 
         if isinstance(matrix, MatrixVariable):
             if len(indices) != 2:
@@ -408,11 +450,11 @@ class Interpreter(Visitor):
                 raise IndexOutOfRangeError()
             if isinstance(self.scope_manager.return_result, int):
                 # value assigned to matrix field
-                matrix.rows[indices[0]][indices[1]] = self.scope_manager.return_result
+                matrix.set_value(indices[0], indices[1], self.scope_manager.return_result)
                 self.scope_manager.last_result = matrix
             else:
                 # matrix field value assigned to variable
-                self.scope_manager.last_result = NumberVariable('', matrix.rows[indices[0]][indices[1]])
+                self.scope_manager.last_result = NumberVariable('', matrix.get_value(indices[0], indices[1]))
         if isinstance(matrix, Matrix3dVariable):
             if len(indices) != 3:
                 raise InvalidArgumentsNumberException("To look up matrix value use 3 indices.", len(indices))
@@ -420,12 +462,169 @@ class Interpreter(Visitor):
                 raise IndexOutOfRangeError()
             if isinstance(self.scope_manager.return_result, int):
                 # value assigned to matrix field
-                matrix.matrices[indices[0]].rows[indices[1]][indices[2]] = self.scope_manager.return_result
+                matrix.set_value(indices[0], indices[1], indices[2], self.scope_manager.return_result)
                 self.scope_manager.last_result = matrix
             else:
                 # matrix field value assigned to variable
                 self.scope_manager.last_result = \
-                    NumberVariable('', matrix.matrices[indices[0]].rows[indices[1]][indices[2]])
+                    NumberVariable('', matrix.get_value(indices[0], indices[1], indices[2]))
+        if isinstance(matrix, ImageVariable):
+            if len(indices) != 2:
+                raise InvalidArgumentsNumberException("To look up image pixel use 2 indices.", len(indices))
+            if indices[0] >= matrix.ydim or indices[1] >= matrix.xdim:
+                raise IndexOutOfRangeError()
+            if isinstance(assigned, int):
+                # gray pixel assigned to image field
+                matrix.set_pixel(indices[0], indices[1], PixelVariable('', assigned, assigned, assigned))
+                self.scope_manager.last_result = matrix
+            elif isinstance(assigned, PixelVariable):
+                # pixel assigned to image field
+                matrix.set_pixel(indices[0], indices[1], assigned)
+                self.scope_manager.last_result = matrix
+            else:
+                # image pixel assigned to variable
+                self.scope_manager.last_result = matrix.get_pixel(indices[0], indices[1])
+
+    def __lookup_region(self, _id, matrix, indices, assigned):
+        if not isinstance(matrix, ArrayVariable):
+            raise ArgumentTypeException(_id, 'matrix', type(matrix))
+        if len(indices) != len(matrix.storage.shape):
+            raise InvalidArgumentsNumberException("To look up matrix region use {} indices."
+                                                  .format(len(matrix.storage.shape)), len(indices))
+        index = region(matrix.storage.shape, indices)
+        if assigned is None:
+            # matrix region assigned to variable, it reads the buffer of the matrix until one of them is written
+            self.scope_manager.last_result = matrix.get_region(index)
+            return
+        if not isinstance(assigned, int) and not isinstance(assigned, ArrayVariable):
+            raise ArgumentTypeException(_id, 'number or matrix', type(assigned))
+        # value assigned to matrix region
+        matrix.set_region(index, assigned)
+        self.scope_manager.last_result = matrix
+
+    def __arithmetic(self, node):
+        # element-wise matrix arithmetic of a whole subtree is collected into one lazy expression
+        if isinstance(node, MultiplicativeExpression):
+            result = self.__arithmetic(node.base_expressions[0])
+            for operator, expression in zip(node.multiplicative_operators, node.base_expressions[1:]):
+                result = self.__apply_multiplicative(operator, result, self.__arithmetic(expression))
+            return result
+
+        if isinstance(node, AdditiveExpression):
+            result = self.__arithmetic(node.multiplicative_expressions[0])
+            for operator, expression in zip(node.additive_operators, node.multiplicative_expressions[1:]):
+                result = self.__apply_additive(operator, result, self.__arithmetic(expression))
+            return result
+
+        if isinstance(node, BaseExpression) and isinstance(node.expression, ExpressionInParenthesis) and \
+                isinstance(node.expression.expression, LogicalExpression) and \
+                not node.expression.expression.negation_operator:
+            result = self.__arithmetic(node.expression.expression.expression)
+            if node.subtract_operator:
+                return self.__apply_multiplicative(TokenType.MULTIPLY, result, NumberVariable('', -1))
+            return self.__times_one(result)
+
+        node.accept(self)
+        return self.scope_manager.last_result
+
+    def __times_one(self, value):
+        # base expressions without a minus sign are named as multiplied by one, matrices skip the copy it makes
+        if isinstance(value, ArrayVariable) or isinstance(value, fusion.LazyExpression):
+            value.name += '*'
+            return value
+        if isinstance(value, NumberVariable) or isinstance(value, PixelVariable):
+            return self.__apply_multiplicative(TokenType.MULTIPLY, value, NumberVariable('', 1))
+        return value
+
+    def __update_in_place(self, assignment: Assignment):
+        # reads always copy, so a variable updated from its own value, like m = m + 1,
+        # is the only holder of its buffer and the update can overwrite it
+        chain = self_update_chain(assignment.expression, assignment.id)
+        if not chain:
+            return False
+        variable = self.scope_manager.get_variable(assignment.id)
+        if not isinstance(variable, ArrayVariable) and not isinstance(variable, PixelVariable) and \
+                not isinstance(variable, ImageVariable):
+            return False
+
+        result = variable
+        for operator, expression in chain:
+            if isinstance(expression, BaseExpression) and isinstance(expression.expression, str) and \
+                    not expression.subtract_operator:
+                # operands are only read, so they do not need a copy either
+                operand = self.scope_manager.get_variable(expression.expression)
+            else:
+                operand = self.__materialize(self.__arithmetic(expression))
+
+            if result is variable and apply_in_place(variable, operator, operand):
+                self.__release(operand)
+                continue
+            if operator == TokenType.ADD or operator == TokenType.SUBTRACT:
+                result = self.__apply_additive(operator, result, operand)
+            else:
+                result = self.__apply_multiplicative(operator, result, operand)
+
+        result = self.__materialize(result)
+        result.name = assignment.id
+        self.scope_manager.add_update_variable(assignment.id, result)
+        self.scope_manager.last_result = result
+        return True
+
+    def __apply_multiplicative(self, operator, result, operand):
+        lazy_result = fusion.combine(operator, result, operand)
+        if lazy_result is not None:
+            return lazy_result
+
+        result = self.__materialize(result)
+        operand = self.__materialize(operand)
+        operands = (result, operand)
+        if operator == TokenType.MULTIPLY:
+            result *= operand
+        elif operator == TokenType.DIVIDE:
+            # every divisor type raises on zero while it divides
+            result /= operand
+        elif operator == TokenType.MODULO:
+            result %= operand
+        elif operator == TokenType.SPECIAL_MULTIPLY:
+            if not isinstance(result, MatrixVariable) or isinstance(result, Matrix3dVariable):
+                raise IllicitOperatorException(operator, type(result), type(operand))
+            result = result.special_multiply(operand)
+
+        if result is None:
+            raise IllicitOperatorException(operator, type(result), type(operand))
+        self.__release(*operands, keep=result)
+        return result
+
+    def __apply_additive(self, operator, result, operand):
+        lazy_result = fusion.combine(operator, result, operand)
+        if lazy_result is not None:
+            return lazy_result
+
+        result = self.__materialize(result)
+        operand = self.__materialize(operand)
+        operands = (result, operand)
+        if operator == TokenType.ADD:
+            result += operand
+        elif operator == TokenType.SUBTRACT:
+            result -= operand
+
+        if result is None:
+            raise IllicitOperatorException(operator, type(result), type(operand))
+        self.__release(*operands, keep=result)
+        return result
+
+    def __materialize(self, value):
+        if isinstance(value, fusion.LazyExpression):
+            result = value.evaluate()
+            self.__release(*value.leaves())
+            return result
+        return value
+
+    def __release(self, *values, keep=None):
+        # temporaries are dead once used, unless they are stored in a scope
+        for value in values:
+            if isinstance(value, ArrayVariable) and value is not keep and not self.scope_manager.holds(value):
+                value.release()
 
     def __execute_function(self, function, arguments):
         if not function.verify_arguments(arguments):
@@ -438,7 +637,13 @@ class Interpreter(Visitor):
         self.scope_manager.switch_to_previous_scope()
 
     def __load_built_in_functions(self):
-        builtin_functions = [PrintFunction(), RandomPixelFunction(), DeterminantFunction()]
+        builtin_functions = [PrintFunction(), RandomPixelFunction(), DeterminantFunction(), InverseFunction(),
+                             SolveFunction(), RankFunction(), PowerFunction(), TransposeFunction(),
+                             ConvolveFunction(), IntegralFunction(), BoxSumFunction(), BoxFilterFunction(),
+                             MedianFilterFunction(), LoadImageFunction(), SaveImageFunction()] + \
+            [ReductionFunction(reduction) for reduction in reductions.REDUCTIONS] + \
+            [CompareFunction(comparison) for comparison in masks.COMPARISONS] + [WhereFunction()] + \
+            [MorphologyFunction(operator) for operator in morphology.OPERATORS]
         for function_definition in builtin_functions:
             self.scope_manager.add_function(function_definition.id, function_definition)
 
@@ -453,7 +658,100 @@ class Interpreter(Visitor):
         return -1
 
 
+def self_update_chain(node, name: str):
+    # operators and operands applied to the variable, for expressions starting with its bare read
+    if isinstance(node, AdditiveExpression):
+        operators, operands = node.additive_operators, node.multiplicative_expressions
+    elif isinstance(node, MultiplicativeExpression):
+        operators, operands = node.multiplicative_operators, node.base_expressions
+    elif isinstance(node, BaseExpression) and node.expression == name and not node.subtract_operator:
+        return []
+    else:
+        return None
+
+    chain = self_update_chain(operands[0], name)
+    if chain is None or not all(is_pure(operand, name) for operand in operands[1:]):
+        return None
+    return chain + list(zip(operators, operands[1:]))
+
+
+def is_pure(node, name: str):
+    # true if evaluating the node can neither read nor change the variable
+    if isinstance(node, FunctionCall) or isinstance(node, Expression):
+        return False
+    if isinstance(node, BaseExpression) and node.expression == name:
+        return False
+    if isinstance(node, MatrixLookup) and node.id == name:
+        return False
+    if isinstance(node, Reference) and node.id1 == name:
+        return False
+    if isinstance(node, list):
+        return all(is_pure(element, name) for element in node)
+    if isinstance(node, Visitable):
+        return all(is_pure(attribute, name) for attribute in vars(node).values())
+    return True
+
+
+def apply_in_place(variable, operator, operand):
+    if isinstance(operand, NumberVariable):
+        if operator == TokenType.ADD:
+            variable.add_value(operand.value)
+        elif operator == TokenType.SUBTRACT:
+            variable.add_value(-operand.value)
+        elif operator == TokenType.MULTIPLY:
+            variable.multiply_by_value(operand.value)
+        elif operator == TokenType.DIVIDE:
+            variable.divide_by_value(operand.value)
+        elif operator == TokenType.MODULO:
+            variable.modulo_with_value(operand.value)
+        else:
+            return False
+        return True
+
+    if not isinstance(variable, ArrayVariable) or not isinstance(operand, ArrayVariable):
+        return False
+    # the result has to keep the shape of the variable, 2d operands are broadcast over 3d ones
+    same_shape = variable.storage.shape == operand.storage.shape
+    broadcast = isinstance(variable, Matrix3dVariable) and isinstance(operand, MatrixVariable) and \
+        variable.storage.shape[1:] == operand.storage.shape
+    if operator == TokenType.ADD and (same_shape or broadcast):
+        variable.add_array(operand)
+    elif operator == TokenType.SUBTRACT and (same_shape or broadcast):
+        variable.subtract_array(operand)
+    elif operator == TokenType.SPECIAL_MULTIPLY and same_shape and isinstance(variable, MatrixVariable):
+        variable.special_multiply_by_array(operand)
+    else:
+        return False
+    return True
+
+
+def region(shape, indices):
+    # numpy index of a matrix region, single indices keep their axis of length one,
+    # except for the plane index of a 3d matrix, which selects a 2d matrix
+    index = []
+    for axis, (length, item) in enumerate(zip(shape, indices)):
+        if isinstance(item, slice):
+            start = 0 if item.start is None else item.start
+            stop = length if item.stop is None else item.stop
+            if not 0 <= start < stop <= length:
+                raise IndexOutOfRangeError()
+            index.append(slice(start, stop))
+        else:
+            if not 0 <= item < length:
+                raise IndexOutOfRangeError()
+            index.append(item if axis == 0 and len(shape) == 3 else slice(item, item + 1))
+    return tuple(index)
+
+
+def assigned_value(variable):
+    # numbers are assigned by value, pixels and matrices as variables
+    if isinstance(variable, NumberVariable):
+        return variable.value
+    return variable
+
+
 def check_type(variable, expected_type):
     return (isinstance(variable, NumberVariable) and expected_type == TokenType.NUMBER_TYPE) or \
            (isinstance(variable, PixelVariable) and expected_type == TokenType.PIXEL) or \
-           (isinstance(variable, MatrixVariable) and expected_type == TokenType.MATRIX)
+           (isinstance(variable, MatrixVariable) and expected_type == TokenType.MATRIX) or \
+           (isinstance(variable, ImageVariable) and expected_type == TokenType.IMAGE)
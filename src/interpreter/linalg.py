@@ -0,0 +1,314 @@
+import math
+import numpy as np
+from . import arrays
+from ..exceptions.exceptions import SingularMatrixException
+
+# every integer up to 2**53 is exactly representable in float64
+FLOAT64_BITS = 53
+# below this many multiplications splitting into limbs costs more than it saves
+SMALL_PRODUCT = 4096
+# from this size on systems with python int intermediates are solved by p-adic lifting instead of elimination
+LIFTING_SIZE = 20
+# residues below 2**31, so that the product of two of them fits int64
+MODULUS_BITS = 31
+
+
+def matmul(a: np.ndarray, b: np.ndarray, a_magnitude: int = None, b_magnitude: int = None):
+    # stacks of matrices are multiplied slice by slice in one call, a 2d operand is used for every slice
+    inner = a.shape[-1]
+    a_magnitude = arrays.magnitude(a) if a_magnitude is None else a_magnitude
+    b_magnitude = arrays.magnitude(b) if b_magnitude is None else b_magnitude
+    # no partial sum of the dot products can exceed this bound
+    bound = a_magnitude * b_magnitude * inner
+    if bound < 2 ** FLOAT64_BITS:
+        return _float_matmul(a, b).astype(np.int64), bound
+    if a.ndim == 2 and b.ndim == 2 and a.shape[0] * inner * b.shape[1] <= SMALL_PRODUCT:
+        return arrays.narrow(_row_matmul(a.tolist(), b.tolist(), b.shape[1]))
+
+    # split operands into signed limbs small enough for exact float64 products
+    width = max(1, (FLOAT64_BITS - inner.bit_length()) // 2)
+    a_limbs = _split(a, width, a_magnitude)
+    b_limbs = _split(b, width, b_magnitude)
+    result_type = np.int64 if arrays.fits(bound) else object
+    shape = np.broadcast_shapes(a.shape[:-2], b.shape[:-2]) + (a.shape[-2], b.shape[-1])
+    result = np.zeros(shape, dtype=result_type)
+    for shift in range(len(a_limbs) + len(b_limbs) - 1):
+        diagonal = np.zeros(result.shape, dtype=np.int64)
+        for p in range(max(0, shift - len(b_limbs) + 1), min(shift, len(a_limbs) - 1) + 1):
+            diagonal += _float_matmul(a_limbs[p], b_limbs[shift - p]).astype(np.int64)
+        result += diagonal.astype(result_type) << (width * shift)
+    if result_type is object:
+        return arrays.narrow(result)
+    return result, bound
+
+
+def _row_matmul(a, b, xdim):
+    result = []
+    for a_row in a:
+        result_row = [0] * xdim
+        for a_value, b_row in zip(a_row, b):
+            if a_value:
+                result_row = [r + a_value * x for r, x in zip(result_row, b_row)]
+        result.append(result_row)
+    return np.array(result, dtype=object).reshape(len(a), xdim)
+
+
+def _float_matmul(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.matmul(a.astype(np.float64), b.astype(np.float64))
+
+
+def _split(values: np.ndarray, width: int, magnitude: int):
+    negative = values < 0
+    magnitudes = np.where(negative, -values, values)
+    mask = (1 << width) - 1
+    limbs = []
+    for shift in range(0, max(magnitude.bit_length(), 1), width):
+        limb = ((magnitudes >> shift) & mask).astype(np.int64)
+        limbs.append(np.where(negative, -limb, limb))
+    return limbs
+
+
+def determinant(values: np.ndarray) -> int:
+    size = values.shape[0]
+    if size == 0:
+        return 1
+    matrix = _working_copy(values)
+
+    sign = 1
+    previous_pivot = 1
+    for k in range(size - 1):
+        pivot_row = find_pivot(matrix, k, k)
+        if pivot_row is None:
+            return 0
+        if pivot_row != k:
+            swap_rows(matrix, k, pivot_row)
+            sign = -sign
+        # fraction-free bareiss step, the division is always exact
+        matrix[k + 1:, k + 1:] = (matrix[k + 1:, k + 1:] * matrix[k, k] -
+                                  np.outer(matrix[k + 1:, k], matrix[k, k + 1:])) // previous_pivot
+        previous_pivot = matrix[k, k]
+    return sign * int(matrix[size - 1, size - 1])
+
+
+def inverse(values: np.ndarray, scale: int = 1):
+    return solve(values, np.eye(values.shape[0], dtype=np.int64), scale)
+
+
+def solve(a: np.ndarray, b: np.ndarray, scale: int = 1):
+    # floor of scale * a^-1 * b, exact whatever the size of the values; a has to be square and regular
+    size = a.shape[0]
+    right = arrays.narrow(arrays.exact(b) * scale)[0]
+    augmented = np.concatenate((a, right), axis=1)
+    bits = _hadamard_bound(augmented)
+    if size >= LIFTING_SIZE and (arrays.is_exact(augmented) or 2 * bits + 1 >= arrays.INT64_MAX.bit_length()):
+        result = _lift(a, right, bits)
+        if result is not None:
+            return arrays.narrow(result)
+    adjugate, determinant_value = _eliminate(augmented, size)
+    return arrays.narrow(adjugate // determinant_value)
+
+
+def rank(values: np.ndarray) -> int:
+    rows, columns = values.shape
+    if rows == 0 or columns == 0:
+        return 0
+    # reducing modulo a prime can only lose rank, so full rank modulo a prime is full rank
+    _, pivots = _modular_elimination(values, _prime_below(1 << MODULUS_BITS))
+    if len(pivots) == min(rows, columns):
+        return len(pivots)
+    matrix = _working_copy(values)
+
+    found = 0
+    previous_pivot = 1
+    for column in range(columns):
+        if found == rows:
+            break
+        pivot_row = find_pivot(matrix, found, column)
+        if pivot_row is None:
+            continue
+        if pivot_row != found:
+            swap_rows(matrix, found, pivot_row)
+        # bareiss step over the columns right of the pivot, columns without a pivot are skipped
+        matrix[found + 1:, column + 1:] = (matrix[found + 1:, column + 1:] * matrix[found, column] -
+                                           np.outer(matrix[found + 1:, column], matrix[found, column + 1:])) \
+            // previous_pivot
+        previous_pivot = matrix[found, column]
+        found += 1
+    return found
+
+
+def find_pivot(matrix: np.ndarray, row: int, column: int):
+    candidates = np.flatnonzero(matrix[row:, column])
+    if candidates.size == 0:
+        return None
+    return row + int(candidates[0])
+
+
+def swap_rows(matrix: np.ndarray, row1: int, row2: int):
+    matrix[[row1, row2]] = matrix[[row2, row1]]
+
+
+def _working_copy(values: np.ndarray) -> np.ndarray:
+    # every intermediate of fraction-free elimination is a product of two minors, each bounded by hadamard's bound
+    if not arrays.is_exact(values) and 2 * _hadamard_bound(values) + 1 < arrays.INT64_MAX.bit_length():
+        return values.copy()
+    return arrays.exact(values).copy()
+
+
+def _eliminate(augmented: np.ndarray, size: int):
+    # fraction-free gauss-jordan on [a | b], gives det(a) * a^-1 * b and det(a) up to a common sign
+    matrix = _working_copy(augmented)
+    others = np.ones(size, dtype=bool)
+    previous_pivot = 1
+    for k in range(size):
+        pivot_row = find_pivot(matrix, k, k)
+        if pivot_row is None:
+            raise SingularMatrixException()
+        if pivot_row != k:
+            swap_rows(matrix, k, pivot_row)
+        # columns left of the pivot are settled, they only hold the pivot on the diagonal
+        others[k] = False
+        matrix[others, k + 1:] = (matrix[others, k + 1:] * matrix[k, k] -
+                                  np.outer(matrix[others, k], matrix[k, k + 1:])) // previous_pivot
+        others[k] = True
+        previous_pivot = matrix[k, k]
+    return matrix[:, size:], previous_pivot
+
+
+def _lift(a: np.ndarray, right: np.ndarray, bits: float):
+    # dixon's p-adic lifting: a is inverted once modulo a prime small enough for exact float64 products,
+    # then every step gives the next base p digit of the solution; None when the prime divides det(a)
+    # or the solution could not be proven, both are left to the elimination
+    size = a.shape[0]
+    prime = _prime_below(1 << (FLOAT64_BITS - size.bit_length()) // 2)
+    reduced, pivots = _modular_elimination(np.concatenate((a, np.eye(size, dtype=np.int64)), axis=1), prime)
+    if pivots[:size] != list(range(size)):
+        return None
+    lifting = Lifting(a, reduced[:, size:], prime)
+
+    # numerators and denominators of the solution are minors of [a | right], bounded by 2**bits; the common
+    # denominator of all columns is almost always the one of a random combination of them, which is
+    # found from digits far enough past the cube of the bound
+    combination = np.random.randint(1, 1 << 16, (right.shape[1], 1))
+    combined = matmul(right, combination, b_magnitude=1 << 16)[0]
+    combined_bound = 1 << math.ceil(_hadamard_bound(np.concatenate((a, arrays.exact(combined)), axis=1)))
+    modulus, steps = _modulus(prime, combined_bound ** 3)
+    solution, _ = lifting.solve(combined, steps)
+    denominator, _ = _common_denominator(solution % modulus, modulus, combined_bound, combined_bound)
+
+    # times the denominator the solution is integral and its expansion ends once the residual vanishes;
+    # when that fails its denominators divide det(a) / denominator, and the digits go far enough to find them
+    bound = 1 << math.ceil(bits)
+    remaining = max(1, bound // denominator)
+    modulus, steps = _modulus(prime, bound * remaining ** 2)
+    solution, exact = lifting.solve(arrays.narrow(arrays.exact(right) * denominator)[0], steps)
+    if not exact:
+        extra, solution = _common_denominator(solution % modulus, modulus, bound, remaining)
+        denominator *= extra
+    return solution // denominator
+
+
+class Lifting:
+    def __init__(self, a: np.ndarray, inverse_residues: np.ndarray, prime: int):
+        self.a = a
+        self.a_magnitude = arrays.magnitude(a)
+        self.inverse_residues = inverse_residues
+        self.prime = prime
+
+    def solve(self, right: np.ndarray, steps: int):
+        # symmetric base p digits of a^-1 * right, and whether the residual vanished within the steps
+        prime = self.prime
+        residual, residual_magnitude = right, arrays.magnitude(right)
+        digits = []
+        while len(digits) < steps and residual_magnitude > 0:
+            digit = matmul(self.inverse_residues, residual % prime, prime - 1, prime - 1)[0] % prime
+            digit[digit > prime // 2] -= prime
+            product, product_bound = matmul(self.a, digit, self.a_magnitude, prime // 2)
+            if not arrays.fits(residual_magnitude + product_bound):
+                residual = arrays.exact(residual)
+            # the residual minus the product is a multiple of the prime
+            residual, residual_magnitude = arrays.narrow((residual - product) // prime)
+            digits.append(digit)
+        return _combine(digits, prime, right.shape), residual_magnitude == 0
+
+
+def _combine(digits, prime: int, shape) -> np.ndarray:
+    # sum of the digits times powers of the prime, joined pairwise so that the numbers in each addition
+    # have about the same size, and the first joins stay in int64
+    power = prime
+    while len(digits) > 1:
+        if len(digits) % 2:
+            digits.append(np.zeros(shape, dtype=np.int64))
+        if not arrays.fits(power * power):
+            digits = [arrays.exact(digit) for digit in digits]
+        digits = [low + high * power for low, high in zip(digits[::2], digits[1::2])]
+        power *= power
+    return arrays.exact(digits[0]) if digits else np.zeros(shape, dtype=object)
+
+
+def _modulus(prime: int, bound: int):
+    # smallest power of the prime above twice the bound, and its exponent
+    steps = 1
+    while prime ** steps <= 2 * bound:
+        steps += 1
+    return prime ** steps, steps
+
+
+def _common_denominator(solution: np.ndarray, modulus: int, numerator_bound: int, denominator_bound: int):
+    # the denominator grows from the elements that it does not yet turn into small integers; while it stays
+    # within the bound, a residue times it is small exactly when that is the integer numerator
+    denominator = 1
+    while True:
+        numerators = solution * denominator % modulus
+        numerators = np.where(numerators > modulus // 2, numerators - modulus, numerators)
+        large = np.flatnonzero(np.abs(numerators) > numerator_bound * denominator_bound)
+        if large.size == 0:
+            return denominator, numerators
+        denominator = math.lcm(denominator, _denominator(solution.flat[large[0]], modulus, numerator_bound))
+
+
+def _denominator(residue: int, modulus: int, numerator_bound: int) -> int:
+    # rational reconstruction: extended euclid on the modulus and the residue, stopped at the first remainder
+    # within the numerator bound, gives the unique fraction within the bounds when the modulus is large enough
+    remainder, next_remainder = modulus, residue % modulus
+    coefficient, next_coefficient = 0, 1
+    while next_remainder > numerator_bound:
+        quotient = remainder // next_remainder
+        remainder, next_remainder = next_remainder, remainder - quotient * next_remainder
+        coefficient, next_coefficient = next_coefficient, coefficient - quotient * next_coefficient
+    return abs(next_coefficient) // math.gcd(next_remainder, next_coefficient)
+
+
+def _modular_elimination(values: np.ndarray, prime: int):
+    # gauss-jordan modulo a prime with pivots scaled to one, gives the reduced matrix and its pivot columns
+    matrix = (values % prime).astype(np.int64)
+    pivots = []
+    for column in range(matrix.shape[1]):
+        row = len(pivots)
+        if row == matrix.shape[0]:
+            break
+        pivot_row = find_pivot(matrix, row, column)
+        if pivot_row is None:
+            continue
+        if pivot_row != row:
+            swap_rows(matrix, row, pivot_row)
+        matrix[row, column:] = matrix[row, column:] * pow(int(matrix[row, column]), -1, prime) % prime
+        factors = matrix[:, column].copy()
+        factors[row] = 0
+        matrix[:, column:] = (matrix[:, column:] - np.outer(factors, matrix[row, column:]) % prime) % prime
+        pivots.append(column)
+    return matrix, pivots
+
+
+def _prime_below(limit: int) -> int:
+    candidate = limit - 1 if limit % 2 == 0 else limit - 2
+    while any(candidate % divisor == 0 for divisor in range(3, math.isqrt(candidate) + 1, 2)):
+        candidate -= 2
+    return candidate
+
+
+def _hadamard_bound(values: np.ndarray) -> float:
+    # log2 of the product of euclidean row norms, zero rows take part in no nonzero minor; python ints
+    # are squared exactly, they may be out of the range of float64
+    squares = np.square(values if arrays.is_exact(values) else values.astype(np.float64)).sum(axis=1)
+    return sum(math.log2(square) for square in squares if square > 0) / 2
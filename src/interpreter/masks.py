@@ -0,0 +1,69 @@
+import numpy as np
+from . import arrays
+from .pool import buffers
+from .tiles import store
+from ..exceptions.exceptions import MatrixDimensionsException
+
+# element-wise comparisons by name, each gives ones where it holds and zeros elsewhere
+COMPARISONS = {'greater': np.greater, 'greater_equal': np.greater_equal, 'less': np.less,
+               'less_equal': np.less_equal, 'equal': np.equal, 'not_equal': np.not_equal}
+
+
+def compare(name: str, a, b):
+    # operands are numbers or arrays, 2d arrays are compared with every slice of 3d ones
+    shape = _shape(a, b)
+    if not shape:
+        return int(COMPARISONS[name](a, b)), 1
+    result = buffers.acquire(shape)
+    comparison = _comparison(COMPARISONS[name])
+    if store.backs(shape, result.dtype):
+        return store.apply(comparison, a, b, result), 1
+    return comparison(a, b, out=result), 1
+
+
+def where(mask, a, b, a_magnitude: int = None, b_magnitude: int = None):
+    # a where the mask is not zero and b elsewhere, in one pass over each operand
+    shape = _shape(mask, a, b)
+    a_magnitude = arrays.magnitude(a) if a_magnitude is None else a_magnitude
+    b_magnitude = arrays.magnitude(b) if b_magnitude is None else b_magnitude
+    bound = max(a_magnitude, b_magnitude)
+    if not shape:
+        return (a if mask else b), bound
+    if arrays.is_exact(a) or arrays.is_exact(b) or not arrays.fits(bound):
+        result = np.empty(shape, dtype=object)
+    else:
+        result = buffers.acquire(shape)
+    if store.backs(shape, result.dtype):
+        store.apply(_fill, b, None, result)
+        store.apply(_select, mask, a, result)
+    else:
+        _fill(b, None, out=result)
+        _select(mask, a, out=result)
+    return arrays.narrow(result)[0] if arrays.is_exact(result) else result, bound
+
+
+def _comparison(operation):
+    # booleans are written straight into the int64 mask
+    def comparison(a, b, out):
+        return operation(a, b, out=out, casting='unsafe')
+    return comparison
+
+
+def _fill(values, _, out):
+    np.copyto(out, values)
+
+
+def _select(mask, values, out):
+    np.copyto(out, values, where=np.not_equal(mask, 0))
+
+
+def _shape(*operands):
+    # shape of the result, operands of fewer dimensions have to match the trailing ones
+    shapes = [np.shape(operand) for operand in operands if np.ndim(operand) > 0]
+    if not shapes:
+        return ()
+    shape = max(shapes, key=len)
+    for other in shapes:
+        if other != shape[len(shape) - len(other):]:
+            raise MatrixDimensionsException(' by '.join(map(str, shape)), ' by '.join(map(str, other)))
+    return shape
@@ -0,0 +1,73 @@
+import numpy as np
+from .tiles import store
+
+# operators by name, with the sweeps they are made of: erosion takes minima, dilation maxima
+OPERATORS = {'erode': ('erode',), 'dilate': ('dilate',), 'open': ('erode', 'dilate'), 'close': ('dilate', 'erode')}
+# windows up to this length are swept as extremes of shifted copies, longer ones in constant time per element
+DIRECT_LENGTH = 12
+
+
+def apply(name: str, values: np.ndarray, height: int, width: int):
+    # every ydim x xdim slice with a height x width rectangle, centered like convolution kernels;
+    # elements outside the values take no part, results never leave the range of the values
+    if values.size == 0:
+        # np.pad cannot repeat the border of an empty axis, and there is nothing to sweep
+        return values.copy()
+    if store.backs(values.shape, values.dtype):
+        # out of core values are processed one band of rows at a time, each sweep reads height rows around it
+        result = store.allocate(values.shape, values.dtype)
+        planes = values.reshape((-1,) + values.shape[-2:])
+        halo = height * len(OPERATORS[name])
+        for z, plane in enumerate(result.reshape(planes.shape)):
+            store.neighbourhood(lambda block: _apply(name, block, height, width), planes[z], halo, out=plane)
+        return result
+    return _apply(name, values, height, width)
+
+
+def _apply(name: str, values: np.ndarray, height: int, width: int) -> np.ndarray:
+    result = values
+    for sweep in OPERATORS[name]:
+        # dilation is by the reflected rectangle, so that opening and closing are idempotent for even sizes too
+        operation = np.minimum if sweep == 'erode' else np.maximum
+        rows_before = (height - 1) // 2 if sweep == 'erode' else height // 2
+        columns_before = (width - 1) // 2 if sweep == 'erode' else width // 2
+        result = _sweep(_sweep(result, width, columns_before, -1, operation), height, rows_before, -2, operation)
+    # a 1 x 1 element sweeps nothing, the result must not share the buffer the argument gives back to the pool
+    return result.copy() if result is values else result
+
+
+def _sweep(values: np.ndarray, length: int, before: int, axis: int, operation) -> np.ndarray:
+    # extremes of the windows of length elements along the axis, each starting before elements ahead of its own
+    if length == 1:
+        return values
+    axis %= values.ndim
+    size = values.shape[axis]
+    if length <= DIRECT_LENGTH:
+        # short windows are cheaper as extremes of a few shifted copies
+        padded = _pad(values, axis, before, length - 1 - before)
+        result = padded[_along(axis, 0, size)].copy()
+        for shift in range(1, length):
+            operation(result, padded[_along(axis, shift, shift + size)], out=result)
+        return result
+
+    # van herk/gil-werman: the axis is cut into blocks of the window length, every window spans the end of one
+    # block and the start of the next, so running extremes inside the blocks in both directions give each
+    # window from two elements whatever its length
+    blocks = -(-(size + length - 1) // length)
+    padded = _pad(values, axis, before, blocks * length - size - before)
+    shaped = padded.reshape(values.shape[:axis] + (blocks, length) + values.shape[axis + 1:])
+    forward = operation.accumulate(shaped, axis=axis + 1).reshape(padded.shape)
+    backward = np.flip(operation.accumulate(np.flip(shaped, axis=axis + 1), axis=axis + 1), axis=axis + 1)
+    backward = backward.reshape(padded.shape)
+    return operation(backward[_along(axis, 0, size)], forward[_along(axis, length - 1, length - 1 + size)])
+
+
+def _pad(values: np.ndarray, axis: int, before: int, after: int) -> np.ndarray:
+    # repeating the border elements leaves every extreme unchanged, the windows already hold them
+    widths = [(0, 0)] * values.ndim
+    widths[axis] = (before, after)
+    return np.pad(values, widths, mode='edge')
+
+
+def _along(axis: int, start: int, stop: int):
+    return (slice(None),) * axis + (slice(start, stop),)
@@ -0,0 +1,87 @@
+import mmap
+import numpy as np
+from . import arrays
+from .pool import buffers
+from .tiles import store
+from ..exceptions.exceptions import ImageFormatException
+
+# rows converted and written at once, so that output is streamed instead of converted as a whole
+WRITE_ROWS = 256
+
+
+def read(path: str):
+    # binary graymap as a ydim x xdim matrix, pixmap as a ydim x xdim x 3 image, and the maximum value
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        magic, xdim, ydim, maxval, offset = _header(path, mapped)
+        shape = (ydim, xdim, 3) if magic == b'P6' else (ydim, xdim)
+        dtype = np.dtype(np.uint8) if maxval < 256 else np.dtype('>u2')
+        count = int(np.prod(shape))
+        if offset + count * dtype.itemsize > len(mapped):
+            raise ImageFormatException(path, 'raster is truncated')
+
+        raster = np.frombuffer(mapped, dtype=dtype, count=count, offset=offset).reshape(shape)
+        if magic == b'P6' and dtype == np.uint8:
+            values = store.copy(raster)
+        elif magic == b'P6':
+            # 16 bit pixmaps do not fit an image, their channels become the slices of a 3d matrix
+            values = buffers.acquire((3, ydim, xdim))
+            np.copyto(values, np.moveaxis(raster, -1, 0))
+        else:
+            values = buffers.acquire(shape)
+            np.copyto(values, raster)
+        # the mapping can only be closed once no array refers to it
+        del raster
+    return values, maxval
+
+
+def write(path: str, values: np.ndarray):
+    # ydim x xdim values are written as a graymap, ydim x xdim x 3 values as a pixmap
+    magic = b'P6' if values.ndim == 3 else b'P5'
+    maxval = 255 if values.dtype == np.uint8 or arrays.magnitude(values) < 256 else 65535
+    dtype = np.dtype(np.uint8) if maxval == 255 else np.dtype('>u2')
+    with open(path, 'wb') as file:
+        file.write(b'%s\n%d %d\n%d\n' % (magic, values.shape[1], values.shape[0], maxval))
+        for y in range(0, values.shape[0], WRITE_ROWS):
+            rows = values[y:y + WRITE_ROWS]
+            if rows.dtype != np.uint8:
+                rows = np.clip(rows, 0, maxval).astype(dtype)
+            file.write(np.ascontiguousarray(rows).data)
+
+
+def _header(path: str, mapped: mmap.mmap):
+    magic = mapped[:2]
+    if magic != b'P5' and magic != b'P6':
+        raise ImageFormatException(path, 'only binary P5 and P6 images are supported')
+
+    position = 2
+    fields = []
+    while len(fields) < 3:
+        position = _skip_whitespaces(mapped, position)
+        start = position
+        while position < len(mapped) and mapped[position:position + 1].isdigit():
+            position += 1
+        if start == position:
+            raise ImageFormatException(path, 'malformed header')
+        fields.append(int(mapped[start:position]))
+    # a single whitespace separates the header from the raster
+    if position >= len(mapped) or not mapped[position:position + 1].isspace():
+        raise ImageFormatException(path, 'malformed header')
+
+    xdim, ydim, maxval = fields
+    if not 0 < maxval < 65536:
+        raise ImageFormatException(path, 'maximum value out of range')
+    return magic, xdim, ydim, maxval, position + 1
+
+
+def _skip_whitespaces(mapped: mmap.mmap, position: int) -> int:
+    while position < len(mapped):
+        char = mapped[position:position + 1]
+        if char == b'#':
+            # comments run to the end of the line
+            end = mapped.find(b'\n', position)
+            position = len(mapped) if end == -1 else end + 1
+        elif char.isspace():
+            position += 1
+        else:
+            break
+    return position
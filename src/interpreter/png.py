@@ -0,0 +1,258 @@
+import struct
+import zlib
+import numpy as np
+from . import arrays
+from .pool import buffers
+from .tiles import store
+from ..exceptions.exceptions import ImageFormatException
+
+SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# channels of every supported color type: gray, rgb, palette, gray with alpha and rgb with alpha
+CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+DEPTHS = {0: (1, 2, 4, 8, 16), 2: (8, 16), 3: (1, 2, 4, 8), 4: (8, 16), 6: (8, 16)}
+# decoded bytes unfiltered together, and filtered together when writing
+READ_BATCH_BYTES = 16 << 20
+WRITE_BATCH_BYTES = 1 << 20
+# limit of bytes inflated at once, so that a single huge data chunk is never expanded as a whole
+INFLATE_SIZE = 1 << 20
+
+
+def is_png(path: str) -> bool:
+    with open(path, 'rb') as file:
+        return file.read(len(SIGNATURE)) == SIGNATURE
+
+
+def read(path: str):
+    # gray images become ydim x xdim matrices, color images ydim x xdim x 3 images or 3d matrices for 16 bits
+    with open(path, 'rb') as file:
+        if file.read(len(SIGNATURE)) != SIGNATURE:
+            raise ImageFormatException(path, 'missing png signature')
+        chunks = _chunks(path, file)
+        chunk_type, data = next(chunks, (None, None))
+        if chunk_type != b'IHDR' or len(data) != 13:
+            raise ImageFormatException(path, 'missing image header')
+        xdim, ydim, depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', data)
+        if color_type not in CHANNELS or depth not in DEPTHS[color_type]:
+            raise ImageFormatException(path, 'unsupported color type or bit depth')
+        if interlace:
+            raise ImageFormatException(path, 'interlaced images are not supported')
+
+        bits = depth * CHANNELS[color_type]
+        scanlines = Scanlines(path, ydim, (xdim * bits + 7) // 8, max(1, bits // 8))
+        palette = None
+        decompressor = zlib.decompressobj()
+        for chunk_type, data in chunks:
+            if chunk_type == b'PLTE':
+                palette = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+            elif chunk_type == b'IDAT':
+                while data:
+                    scanlines.feed(decompressor.decompress(data, INFLATE_SIZE))
+                    data = decompressor.unconsumed_tail
+            elif chunk_type == b'IEND':
+                break
+        scanlines.feed(decompressor.flush())
+        rows = scanlines.finish()
+    return _samples(path, rows, xdim, depth, color_type, palette)
+
+
+def write(path: str, values: np.ndarray):
+    # ydim x xdim values are written as a gray image, ydim x xdim x 3 values as an rgb image
+    channels = 3 if values.ndim == 3 else 1
+    depth = 8 if values.dtype == np.uint8 or arrays.magnitude(values) < 256 else 16
+    dtype = np.dtype(np.uint8) if depth == 8 else np.dtype('>u2')
+    stride = values.shape[1] * channels * depth // 8
+    batch = max(1, WRITE_BATCH_BYTES // max(1, stride))
+
+    with open(path, 'wb') as file:
+        file.write(SIGNATURE)
+        _write_chunk(file, b'IHDR', struct.pack('>IIBBBBB', values.shape[1], values.shape[0], depth,
+                                                2 if channels == 3 else 0, 0, 0, 0))
+        compressor = zlib.compressobj()
+        prior = np.zeros(stride, dtype=np.uint8)
+        for y in range(0, values.shape[0], batch):
+            rows = values[y:y + batch]
+            if rows.dtype != np.uint8:
+                rows = np.clip(rows, 0, (1 << depth) - 1).astype(dtype)
+            rows = np.ascontiguousarray(rows).view(np.uint8).reshape(-1, stride)
+            data = compressor.compress(_filter(rows, prior, channels * depth // 8))
+            if data:
+                _write_chunk(file, b'IDAT', data)
+            prior = rows[-1]
+        _write_chunk(file, b'IDAT', compressor.flush())
+        _write_chunk(file, b'IEND', b'')
+
+
+class Scanlines:
+    def __init__(self, path: str, ydim: int, stride: int, bpp: int):
+        self.path = path
+        self.stride = stride
+        self.bpp = bpp
+        # unfiltered in place, this buffer becomes the storage of the decoded image
+        self.rows = store.allocate((ydim, stride), np.uint8)
+        self.filters = np.empty(ydim, dtype=np.uint8)
+        self.received = 0
+        self.unfiltered = 0
+        # the skewed buffer of a batch grows with its height squared, narrow images use short batches
+        self.batch = max(1, min(READ_BATCH_BYTES // max(1, stride), max(256, stride // bpp)))
+        self.__pending = bytearray()
+
+    def feed(self, data: bytes):
+        self.__pending += data
+        line = self.stride + 1
+        count = min(len(self.__pending) // line, self.rows.shape[0] - self.received)
+        if count == 0:
+            return
+        lines = np.frombuffer(self.__pending, dtype=np.uint8, count=count * line).reshape(count, line)
+        self.filters[self.received:self.received + count] = lines[:, 0]
+        self.rows[self.received:self.received + count] = lines[:, 1:]
+        del lines
+        del self.__pending[:count * line]
+        self.received += count
+        while self.received - self.unfiltered >= self.batch:
+            self.unfilter(self.unfiltered, self.unfiltered + self.batch)
+
+    def finish(self) -> np.ndarray:
+        if self.received < self.rows.shape[0]:
+            raise ImageFormatException(self.path, 'image data is truncated')
+        if self.unfiltered < self.received:
+            self.unfilter(self.unfiltered, self.received)
+        return self.rows
+
+    def unfilter(self, start: int, stop: int):
+        filters = self.filters[start:stop]
+        if np.any(filters > 4):
+            raise ImageFormatException(self.path, 'unknown filter type')
+        prior = self.rows[start - 1] if start > 0 else np.zeros(self.stride, dtype=np.uint8)
+        if np.all(filters <= 2):
+            self.__unfilter_rows(start, stop, prior)
+        else:
+            self.__unfilter_diagonals(start, stop, prior)
+        self.unfiltered = stop
+
+    def __unfilter_rows(self, start: int, stop: int, prior: np.ndarray):
+        # none, sub and up only depend on the previous row, which is already done
+        for y in range(start, stop):
+            row = self.rows[y]
+            if self.filters[y] == 1:
+                row[:] = np.cumsum(row.reshape(-1, self.bpp), axis=0, dtype=np.uint8).reshape(-1)
+            elif self.filters[y] == 2:
+                np.add(row, prior, out=row)
+            prior = row
+
+    def __unfilter_diagonals(self, start: int, stop: int, prior: np.ndarray):
+        # average and paeth depend on the left, upper and upper left neighbours, so all pixels
+        # on one anti-diagonal of the batch are independent and unfiltered at once; the batch is
+        # skewed so that every anti-diagonal is a contiguous row of the work buffer
+        count = stop - start
+        pixels = self.stride // self.bpp
+        work = np.zeros((pixels + count + 1, count + 1, self.bpp), dtype=np.uint8)
+        strides = work.strides
+        skewed = np.lib.stride_tricks.as_strided(work, (count + 1, pixels + 1, self.bpp),
+                                                 (strides[0] + strides[1], strides[0], strides[2]))
+        skewed[0, 1:] = prior.reshape(pixels, self.bpp)
+        skewed[1:, 1:] = self.rows[start:stop].reshape(count, pixels, self.bpp)
+        filters = self.filters[start:stop]
+        kinds = [kind for kind in range(5) if np.any(filters == kind)]
+
+        for diagonal in range(2, pixels + count + 1):
+            first = max(1, diagonal - pixels)
+            last = min(count, diagonal - 1) + 1
+            left = work[diagonal - 1, first:last].astype(np.int16)
+            up = work[diagonal - 1, first - 1:last - 1].astype(np.int16)
+            up_left = work[diagonal - 2, first - 1:last - 1].astype(np.int16)
+            predictions = {0: 0, 1: left, 2: up, 3: (left + up) >> 1}
+            if 4 in kinds:
+                predictions[4] = _paeth(left, up, up_left)
+            if len(kinds) == 1:
+                prediction = predictions[kinds[0]]
+            else:
+                row_filters = filters[first - 1:last - 1, None]
+                prediction = 0
+                for kind in kinds:
+                    prediction = np.where(row_filters == kind, predictions[kind], prediction)
+            current = work[diagonal, first:last]
+            current += prediction.astype(np.uint8)
+
+        self.rows[start:stop] = skewed[1:, 1:].reshape(count, self.stride)
+
+
+def _chunks(path: str, file):
+    while True:
+        header = file.read(8)
+        if len(header) < 8:
+            return
+        length, chunk_type = struct.unpack('>I4s', header)
+        data = file.read(length)
+        crc = file.read(4)
+        if len(data) < length or len(crc) < 4:
+            raise ImageFormatException(path, 'chunk is truncated')
+        if zlib.crc32(data, zlib.crc32(chunk_type)) != struct.unpack('>I', crc)[0]:
+            raise ImageFormatException(path, 'chunk checksum mismatch')
+        yield chunk_type, data
+
+
+def _write_chunk(file, chunk_type: bytes, data: bytes):
+    file.write(struct.pack('>I4s', len(data), chunk_type))
+    file.write(data)
+    file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type))))
+
+
+def _paeth(left, up, up_left):
+    estimate = left + up - up_left
+    left_distance = np.abs(estimate - left)
+    up_distance = np.abs(estimate - up)
+    up_left_distance = np.abs(estimate - up_left)
+    return np.where((left_distance <= up_distance) & (left_distance <= up_left_distance), left,
+                    np.where(up_distance <= up_left_distance, up, up_left))
+
+
+def _filter(rows: np.ndarray, prior: np.ndarray, bpp: int) -> bytes:
+    # every filter type is applied to every row, each row keeps the one with the smallest residuals
+    up = np.vstack((prior[None], rows[:-1]))
+    left = np.zeros_like(rows)
+    left[:, bpp:] = rows[:, :-bpp]
+    up_left = np.zeros_like(rows)
+    up_left[:, bpp:] = up[:, :-bpp]
+    wide = (left.astype(np.int16), up.astype(np.int16), up_left.astype(np.int16))
+
+    # residuals wrap around as bytes, their distance from zero is the absolute value as signed bytes
+    candidates = np.stack((rows, rows - left, rows - up, rows - ((wide[0] + wide[1]) >> 1).astype(np.uint8),
+                           rows - _paeth(*wide).astype(np.uint8)))
+    scores = np.abs(candidates.view(np.int8)).view(np.uint8).sum(axis=2, dtype=np.int64)
+    filters = np.argmin(scores, axis=0)
+
+    lines = np.empty((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+    lines[:, 0] = filters
+    lines[:, 1:] = candidates[filters, np.arange(rows.shape[0])]
+    return lines.tobytes()
+
+
+def _samples(path: str, rows: np.ndarray, xdim: int, depth: int, color_type: int, palette):
+    ydim = rows.shape[0]
+    channels = CHANNELS[color_type]
+    if depth == 16:
+        samples = rows.view('>u2').reshape(ydim, xdim, channels)
+    elif depth == 8:
+        samples = rows.reshape(ydim, xdim, channels)
+    else:
+        # several samples are packed in a byte, most significant bits first
+        shifts = np.arange(8 - depth, -1, -depth, dtype=np.uint8)
+        samples = ((rows[:, :, None] >> shifts) & ((1 << depth) - 1)).reshape(ydim, -1)[:, :xdim, None]
+
+    if color_type == 3:
+        if palette is None or samples.max(initial=0) >= palette.shape[0]:
+            raise ImageFormatException(path, 'missing or too short palette')
+        values = store.allocate((ydim, xdim, 3), np.uint8)
+        for block in store.blocks(values.shape, values.dtype):
+            values[block] = palette[samples[block][..., 0]]
+        return values, 255
+    if color_type == 2 or color_type == 6:
+        if depth == 8:
+            # alpha is dropped, images hold colors only
+            return samples if channels == 3 else store.copy(samples[:, :, :3]), 255
+        values = buffers.acquire((3, ydim, xdim))
+        np.copyto(values, np.moveaxis(samples[:, :, :3], -1, 0))
+        return values, (1 << depth) - 1
+    values = buffers.acquire((ydim, xdim))
+    np.copyto(values, samples[:, :, 0])
+    return values, (1 << depth) - 1
@@ -0,0 +1,80 @@
+from collections import OrderedDict
+import numpy as np
+from .tiles import store
+
+# bytes of idle buffers kept for reuse
+DEFAULT_BUDGET = 64 << 20
+
+
+class BufferPool:
+    def __init__(self, budget: int = DEFAULT_BUDGET):
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # idle int64 buffers by shape, least recently used shapes first
+        self.__buffers = OrderedDict()
+
+    def reset(self, budget: int = DEFAULT_BUDGET):
+        self.__buffers.clear()
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def acquire(self, shape) -> np.ndarray:
+        # uninitialized int64 buffer, recycled when one of the same shape is idle
+        shape = tuple(shape)
+        idle = self.__buffers.get(shape)
+        if idle:
+            self.hits += 1
+            buffer = idle.pop()
+            self.size -= buffer.nbytes
+            if not idle:
+                del self.__buffers[shape]
+            return buffer
+        self.misses += 1
+        return store.allocate(shape, np.int64)
+
+    def zeros(self, shape) -> np.ndarray:
+        buffer = self.acquire(shape)
+        buffer.fill(0)
+        return buffer
+
+    def copy(self, values: np.ndarray) -> np.ndarray:
+        if values.dtype != np.int64:
+            return values.copy()
+        buffer = self.acquire(values.shape)
+        np.copyto(buffer, values)
+        return buffer
+
+    def release(self, values):
+        # only buffers owning their memory are kept, views would pin or alias other arrays
+        # and memory mapped buffers are based on their mapping, so they are never kept either
+        if not isinstance(values, np.ndarray) or values.dtype != np.int64 or \
+                values.base is not None or not values.flags.c_contiguous or values.nbytes > self.budget:
+            return
+        idle = self.__buffers.setdefault(values.shape, [])
+        if any(buffer is values for buffer in idle):
+            return
+        idle.append(values)
+        self.__buffers.move_to_end(values.shape)
+        self.size += values.nbytes
+        while self.size > self.budget:
+            self.__evict()
+
+    def statistics(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': self.size, 'budget': self.budget}
+
+    def __evict(self):
+        shape, idle = next(iter(self.__buffers.items()))
+        self.size -= idle.pop(0).nbytes
+        self.evictions += 1
+        if not idle:
+            del self.__buffers[shape]
+
+
+buffers = BufferPool()
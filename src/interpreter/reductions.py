@@ -0,0 +1,71 @@
+import numpy as np
+from . import arrays, sparse
+from ..exceptions.exceptions import MatrixDimensionsException, ZeroDivisionException
+
+REDUCTIONS = ('sum', 'min', 'max', 'mean', 'argmax')
+
+
+def reduce(name: str, storage, axes=None, magnitude: int = None):
+    # a python int when every axis is reduced, otherwise an array over the kept axes;
+    # argmax gives the coordinates of the first largest element instead of a value
+    if sparse.is_sparse(storage):
+        if axes is None and name != 'argmax':
+            return _reduce_sparse(name, storage)
+        storage = storage.to_dense()
+
+    axes = tuple(range(storage.ndim)) if axes is None else axes
+    count = int(np.prod([storage.shape[axis] for axis in axes]))
+    if count == 0:
+        if name == 'sum':
+            return _result(np.zeros(_kept_shape(storage.shape, axes), dtype=np.int64))
+        if name == 'mean':
+            raise ZeroDivisionException()
+        raise MatrixDimensionsException('at least one element', 'none')
+
+    if name == 'argmax':
+        return _result(_argmax(storage, axes))
+    if name == 'min':
+        return _result(storage.min(axis=axes))
+    if name == 'max':
+        return _result(storage.max(axis=axes))
+
+    # sums are exact, they move to python ints when they could overflow
+    magnitude = arrays.magnitude(storage) if magnitude is None else magnitude
+    values = storage if arrays.fits(magnitude * count) else arrays.exact(storage)
+    total = values.sum(axis=axes, dtype=values.dtype if values.dtype == object else np.int64)
+    return _result(total // count if name == 'mean' else total)
+
+
+def _reduce_sparse(name: str, storage: sparse.SparseMatrix) -> int:
+    # only stored values are read, the implicit zeros take part in min and max when there are any
+    data = storage.data
+    if storage.size == 0:
+        return reduce(name, storage.to_dense())
+    if name == 'sum' or name == 'mean':
+        total = int(data.sum()) if arrays.fits(arrays.magnitude(data) * max(1, data.size)) else \
+            sum(data.tolist())
+        return total // storage.size if name == 'mean' else total
+    extremes = data.tolist() + ([0] if data.size < storage.size else [])
+    return min(extremes) if name == 'min' else max(extremes)
+
+
+def _argmax(values: np.ndarray, axes) -> np.ndarray:
+    # reduced axes are flattened together, single axes give plain indices
+    kept = len(values.shape) - len(axes)
+    moved = np.moveaxis(values, axes, range(kept, values.ndim))
+    index = moved.reshape(moved.shape[:kept] + (-1,)).argmax(axis=-1)
+    if len(axes) == 1:
+        return index
+    return np.stack(np.unravel_index(index, [values.shape[axis] for axis in axes]), axis=-1)
+
+
+def _kept_shape(shape, axes):
+    return tuple(length for axis, length in enumerate(shape) if axis not in axes)
+
+
+def _result(values):
+    if np.ndim(values) == 0:
+        return int(values)
+    if values.dtype == object:
+        return arrays.narrow(values)[0]
+    return values.astype(np.int64)
@@ -27,7 +27,15 @@ class Scope:
             raise UndeclaredSymbolException(name)
         if not isinstance(value, type(self.symbols[name])):
             raise TypeMismatchError(type(self.symbols[name]), type(value))
+        previous = self.symbols[name]
         self.symbols[name] = value
+        if previous is not value and isinstance(previous, ArrayVariable):
+            previous.release()
+
+    def release_symbols(self, keep=None):
+        for value in self.symbols.values():
+            if value is not keep and isinstance(value, ArrayVariable):
+                value.release()
 
     def copy_symbols(self, source):
         self.symbols.update(source)
@@ -55,6 +63,12 @@ class ScopeManager:
         if len(self.__scope_stack) > 0:
             self.__scope_stack[-1].add_symbol(name, value)
 
+    def holds(self, value):
+        for scope in self.__scope_stack:
+            if any(symbol is value for symbol in scope.symbols.values()):
+                return True
+        return False
+
     def get_variable(self, name: str):
         for scope in reversed(self.__scope_stack):
             if scope.has_symbol(name):
@@ -73,6 +87,7 @@ class ScopeManager:
     def switch_to_previous_scope(self):
         if len(self.__scope_stack) <= 1:
             raise NoParentScopeError(self.__scope_stack[-1].name)
-        self.__scope_stack.pop()
+        # local values die with the scope, only the returned one lives on
+        self.__scope_stack.pop().release_symbols(keep=self.return_result)
         self.last_result = self.return_result
         self.return_result = None
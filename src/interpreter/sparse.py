@@ -0,0 +1,216 @@
+import numpy as np
+from . import arrays, linalg
+
+# matrices smaller than this are always kept dense
+SPARSE_MIN_SIZE = 4096
+# matrices with a larger share of nonzero values are kept dense
+SPARSE_DENSITY = 0.1
+
+
+class SparseMatrix:
+    def __init__(self, shape, keys: np.ndarray = None, data: np.ndarray = None):
+        self.shape = shape
+        # sorted flat indices of nonzero values, in row-major order
+        self.__keys = np.zeros(0, dtype=np.int64) if keys is None else keys
+        self.__data = np.zeros(0, dtype=np.int64) if data is None else data
+        # single writes are buffered until a vectorized operation needs the arrays
+        self.__pending = {}
+
+    @staticmethod
+    def from_dense(values: np.ndarray):
+        keys = np.flatnonzero(values)
+        return SparseMatrix(values.shape, keys, values.reshape(-1)[keys])
+
+    @property
+    def size(self):
+        return self.shape[0] * self.shape[1]
+
+    @property
+    def keys(self) -> np.ndarray:
+        self.__flush()
+        return self.__keys
+
+    @property
+    def data(self) -> np.ndarray:
+        self.__flush()
+        return self.__data
+
+    @property
+    def nnz(self):
+        return self.keys.size
+
+    @property
+    def stored(self):
+        # upper bound of nonzero values that does not flush buffered writes
+        return self.__keys.size + len(self.__pending)
+
+    @property
+    def density(self):
+        return self.nnz / self.size if self.size else 1.0
+
+    def to_dense(self) -> np.ndarray:
+        values = np.zeros(self.shape, dtype=self.data.dtype)
+        values.reshape(-1)[self.keys] = self.data
+        return values
+
+    def get(self, y: int, x: int) -> int:
+        key = self.__flat(y, x)
+        if key in self.__pending:
+            return self.__pending[key]
+        position = np.searchsorted(self.__keys, key)
+        if position < self.__keys.size and self.__keys[position] == key:
+            return int(self.__data[position])
+        return 0
+
+    def set(self, y: int, x: int, value: int):
+        self.__pending[self.__flat(y, x)] = value
+
+    def __flat(self, y: int, x: int) -> int:
+        # negative indices wrap around like in numpy arrays
+        return (y % self.shape[0]) * self.shape[1] + x % self.shape[1]
+
+    def __flush(self):
+        if not self.__pending:
+            return
+        new_keys = np.fromiter(self.__pending.keys(), dtype=np.int64, count=len(self.__pending))
+        new_data = arrays.to_array([list(self.__pending.values())])[0]
+        self.__pending = {}
+        kept = ~np.isin(self.__keys, new_keys)
+        keys = np.concatenate((self.__keys[kept], new_keys))
+        data = np.concatenate((self.__data[kept], new_data))
+        order = np.argsort(keys, kind='stable')
+        nonzero = data[order] != 0
+        self.__keys = keys[order][nonzero]
+        self.__data = data[order][nonzero]
+
+
+def is_sparse(storage):
+    return isinstance(storage, SparseMatrix)
+
+
+def zeros(ydim: int, xdim: int):
+    if ydim * xdim >= SPARSE_MIN_SIZE:
+        return SparseMatrix((ydim, xdim))
+    return np.zeros((ydim, xdim), dtype=np.int64)
+
+
+def choose(values: np.ndarray):
+    if values.ndim == 2 and values.size >= SPARSE_MIN_SIZE and \
+            np.count_nonzero(values) <= SPARSE_DENSITY * values.size:
+        return SparseMatrix.from_dense(values)
+    return values
+
+
+def settle(storage):
+    # sparse matrices that filled up are converted back to dense storage
+    if is_sparse(storage) and storage.stored > SPARSE_DENSITY * storage.size and \
+            storage.density > SPARSE_DENSITY:
+        return storage.to_dense()
+    return storage
+
+
+def dense(storage) -> np.ndarray:
+    return storage.to_dense() if is_sparse(storage) else storage
+
+
+def region(storage: SparseMatrix, index) -> np.ndarray:
+    # dense copy of a block of rows and columns, only the stored values inside it are read
+    rows, columns = index
+    values = np.zeros((rows.stop - rows.start, columns.stop - columns.start), dtype=storage.data.dtype)
+    y, x = np.divmod(storage.keys, storage.shape[1])
+    inside = (y >= rows.start) & (y < rows.stop) & (x >= columns.start) & (x < columns.stop)
+    values[y[inside] - rows.start, x[inside] - columns.start] = storage.data[inside]
+    return values
+
+
+def transpose(storage: SparseMatrix) -> SparseMatrix:
+    # stored values move to their mirrored keys, which are sorted again
+    y, x = np.divmod(storage.keys, storage.shape[1])
+    keys = x * storage.shape[0] + y
+    order = np.argsort(keys, kind='stable')
+    return SparseMatrix(storage.shape[::-1], keys[order], storage.data[order])
+
+
+def magnitude(storage) -> int:
+    return arrays.magnitude(storage.data if is_sparse(storage) else storage)
+
+
+def add(a, b, a_magnitude=None, b_magnitude=None):
+    if is_sparse(a) and is_sparse(b):
+        keys, a_data, b_data = _union(a, b)
+        data, bound = arrays.add(a_data, b_data, a_magnitude, b_magnitude)
+        return _result(a.shape, keys, data), bound
+    return arrays.add(dense(a), dense(b), a_magnitude, b_magnitude)
+
+
+def subtract(a, b, a_magnitude=None, b_magnitude=None):
+    if is_sparse(a) and is_sparse(b):
+        keys, a_data, b_data = _union(a, b)
+        data, bound = arrays.subtract(a_data, b_data, a_magnitude, b_magnitude)
+        return _result(a.shape, keys, data), bound
+    return arrays.subtract(dense(a), dense(b), a_magnitude, b_magnitude)
+
+
+def add_value(a: SparseMatrix, value: int, a_magnitude=None):
+    if value == 0:
+        return SparseMatrix(a.shape, a.keys, a.data), a_magnitude
+    return arrays.add(a.to_dense(), value, a_magnitude)
+
+
+def scale(a: SparseMatrix, operation, value: int, a_magnitude=None):
+    # multiplying, dividing and taking modulo keep zeros at zero
+    data, bound = operation(a.data, value, a_magnitude)
+    return _result(a.shape, a.keys, data), bound
+
+
+def special_multiply(a, b, a_magnitude=None, b_magnitude=None):
+    if is_sparse(a) and is_sparse(b):
+        keys, a_positions, b_positions = np.intersect1d(a.keys, b.keys, assume_unique=True, return_indices=True)
+        data, bound = arrays.multiply(a.data[a_positions], b.data[b_positions], a_magnitude, b_magnitude)
+        return _result(a.shape, keys, data), bound
+    if is_sparse(b):
+        a, b, a_magnitude, b_magnitude = b, a, b_magnitude, a_magnitude
+    data, bound = arrays.multiply(a.data, b.reshape(-1)[a.keys], a_magnitude, b_magnitude)
+    return _result(a.shape, a.keys, data), bound
+
+
+def matmul(a, b, a_magnitude=None, b_magnitude=None):
+    if not is_sparse(a):
+        return linalg.matmul(a, dense(b), a_magnitude, b_magnitude)
+    b = dense(b)
+    a_magnitude = magnitude(a) if a_magnitude is None else a_magnitude
+    b_magnitude = arrays.magnitude(b) if b_magnitude is None else b_magnitude
+    bound = a_magnitude * b_magnitude * a.shape[1]
+    result = np.zeros((a.shape[0], b.shape[1]), dtype=np.int64 if arrays.fits(bound) else object)
+
+    # only rows holding nonzero values contribute, each one against the rows of b it touches
+    rows, columns = np.divmod(a.keys, a.shape[1])
+    starts = np.flatnonzero(np.diff(rows, prepend=-1))
+    for start, stop in zip(starts, np.append(starts[1:], rows.size)):
+        result[rows[start]] = linalg.matmul(a.data[None, start:stop], b[columns[start:stop]],
+                                            a_magnitude, b_magnitude)[0][0]
+    if arrays.is_exact(result):
+        result, bound = arrays.narrow(result)
+    return choose(result), bound
+
+
+def equal(a, b):
+    if is_sparse(a) and is_sparse(b):
+        return a.shape == b.shape and np.array_equal(a.keys, b.keys) and bool(np.all(a.data == b.data))
+    a = dense(a)
+    b = dense(b)
+    return a.shape == b.shape and bool(np.all(a == b))
+
+
+def _union(a: SparseMatrix, b: SparseMatrix):
+    keys, inverse = np.unique(np.concatenate((a.keys, b.keys)), return_inverse=True)
+    a_data = np.zeros(keys.size, dtype=a.data.dtype)
+    b_data = np.zeros(keys.size, dtype=b.data.dtype)
+    a_data[inverse[:a.nnz]] = a.data
+    b_data[inverse[a.nnz:]] = b.data
+    return keys, a_data, b_data
+
+
+def _result(shape, keys: np.ndarray, data: np.ndarray):
+    nonzero = data != 0
+    return settle(SparseMatrix(shape, keys[nonzero], data[nonzero]))
@@ -0,0 +1,81 @@
+import tempfile
+import numpy as np
+
+# bytes of one tile, small enough to stay resident while the rest of a value is paged out
+DEFAULT_TILE_BYTES = 4 << 20
+
+
+class TileStore:
+    def __init__(self, threshold: int = None, tile_bytes: int = DEFAULT_TILE_BYTES, directory: str = None):
+        self.reset(threshold, tile_bytes, directory)
+
+    def reset(self, threshold: int = None, tile_bytes: int = DEFAULT_TILE_BYTES, directory: str = None):
+        # values of at least threshold bytes are kept in memory mapped files, None keeps all in memory
+        self.threshold = threshold
+        self.tile_bytes = tile_bytes
+        self.directory = directory
+        self.mapped = 0
+
+    def backs(self, shape, dtype) -> bool:
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        return self.threshold is not None and nbytes > 0 and nbytes >= self.threshold
+
+    def allocate(self, shape, dtype=np.int64) -> np.ndarray:
+        # uninitialized buffer, on disk for large values
+        if not self.backs(shape, dtype):
+            return np.empty(shape, dtype=dtype)
+        self.mapped += 1
+        # the file is already unlinked, its space is freed together with the last view of the mapping
+        with tempfile.TemporaryFile(dir=self.directory) as file:
+            return np.memmap(file, dtype=dtype, mode='w+', shape=tuple(shape))
+
+    def copy(self, values: np.ndarray) -> np.ndarray:
+        result = self.allocate(values.shape, values.dtype)
+        for block in self.blocks(values.shape, values.dtype):
+            result[block] = values[block]
+        return result
+
+    def blocks(self, shape, dtype):
+        # index tuples over the leading axes, each selecting about one tile of the value
+        if len(shape) == 0:
+            yield ()
+            return
+        row_bytes = int(np.prod(shape[1:])) * np.dtype(dtype).itemsize
+        if row_bytes > self.tile_bytes and len(shape) > 1:
+            for index in range(shape[0]):
+                for block in self.blocks(shape[1:], dtype):
+                    yield (index,) + block
+            return
+        rows = max(1, self.tile_bytes // max(1, row_bytes))
+        for start in range(0, shape[0], rows):
+            yield (slice(start, start + rows),)
+
+    def apply(self, operation, a, b, out: np.ndarray) -> np.ndarray:
+        # element-wise operation streamed tile by tile, operands broadcast like numpy does
+        for block in self.blocks(out.shape, out.dtype):
+            operation(_part(a, block, out.ndim), _part(b, block, out.ndim), out=out[block])
+        return out
+
+    def neighbourhood(self, function, values: np.ndarray, halo: int, out: np.ndarray = None, dtype=None):
+        # function maps a block of rows to a block of the same shape, each block is read with halo
+        # extra rows on both sides, only clipped at the borders of the whole value
+        if out is None:
+            out = self.allocate(values.shape, values.dtype if dtype is None else dtype)
+        row_bytes = int(np.prod(values.shape[1:])) * values.dtype.itemsize
+        rows = max(1, halo, self.tile_bytes // max(1, row_bytes))
+        for start in range(0, values.shape[0], rows):
+            stop = min(start + rows, values.shape[0])
+            low = max(0, start - halo)
+            high = min(values.shape[0], stop + halo)
+            out[start:stop] = function(values[low:high])[start - low:stop - low]
+        return out
+
+
+def _part(operand, block, ndim: int):
+    # operands align with the trailing axes of the output
+    if not isinstance(operand, np.ndarray) or operand.ndim == 0:
+        return operand
+    return operand[block[ndim - operand.ndim:]]
+
+
+store = TileStore()
@@ -1,9 +1,16 @@
-from typing import List
-from copy import deepcopy
-from ..exceptions.exceptions import MatrixDimensionsException
+from typing import List, Union
+from copy import copy, deepcopy
+import numpy as np
+from . import arrays, linalg, sparse
+from .pool import buffers
+from .tiles import store
+from ..exceptions.exceptions import MatrixDimensionsException, ZeroDivisionException
 
 
 class Variable:
+    # value classes are slotted, subclasses without __slots__ get a regular __dict__
+    __slots__ = ('name',)
+
     def __init__(self, name: str):
         self.name = name
 
@@ -21,10 +28,15 @@ class Variable:
 
 
 class NumberVariable(Variable):
+    __slots__ = ('value',)
+
     def __init__(self, name: str, value: int):
         super().__init__(name)
         self.value = value
 
+    def __deepcopy__(self, memo):
+        return NumberVariable(self.name, self.value)
+
     def has_zero(self):
         return self.value == 0
 
@@ -70,6 +82,8 @@ class NumberVariable(Variable):
     def __truediv__(self, other):
         if not isinstance(other, NumberVariable):
             return None
+        if other.value == 0:
+            raise ZeroDivisionException()
 
         return NumberVariable(self.name + '/' + other.name,
                               self.value // other.value)
@@ -77,6 +91,8 @@ class NumberVariable(Variable):
     def __mod__(self, other):
         if not isinstance(other, NumberVariable):
             return None
+        if other.value == 0:
+            raise ZeroDivisionException()
 
         return NumberVariable(self.name + '%' + other.name,
                               self.value % other.value)
@@ -118,17 +134,49 @@ class NumberVariable(Variable):
         return 'number \'' + self.name + '\' = ' + str(self.value)
 
 
+class StringVariable(Variable):
+    __slots__ = ('value',)
+
+    def __init__(self, name: str, value: str):
+        super().__init__(name)
+        self.value = value
+
+    def __bool__(self):
+        return len(self.value) > 0
+
+    def __eq__(self, other):
+        if isinstance(other, StringVariable):
+            return self.value == other.value
+        return False
+
+    def __ne__(self, other):
+        if isinstance(other, StringVariable):
+            return self.value != other.value
+        return False
+
+    def __str__(self):
+        return 'string \'' + self.name + '\' = "' + self.value + '"'
+
+
 class PixelVariable(Variable):
+    __slots__ = ('r', 'g', 'b')
+    MIN_VALUE = 0
+    MAX_VALUE = 255
+
     def __init__(self, name: str, r: int = 0, g: int = 0, b: int = 0):
         super().__init__(name)
-        self.__MIN_VALUE = 0
-        self.__MAX_VALUE = 255
         self.r = self.__pixelize(r)
         self.g = self.__pixelize(g)
         self.b = self.__pixelize(b)
 
     def __pixelize(self, number):
-        return int(min(max(number, self.__MIN_VALUE), self.__MAX_VALUE))
+        return int(min(max(number, self.MIN_VALUE), self.MAX_VALUE))
+
+    def __deepcopy__(self, memo):
+        # channels are already clamped
+        pixel = PixelVariable.__new__(PixelVariable)
+        pixel.name, pixel.r, pixel.g, pixel.b = self.name, self.r, self.g, self.b
+        return pixel
 
     def set_r(self, value):
         self.r = self.__pixelize(value)
@@ -153,11 +201,15 @@ class PixelVariable(Variable):
         self.set_b(self.b * value)
 
     def divide_by_value(self, value):
+        if value == 0:
+            raise ZeroDivisionException()
         self.set_r(self.r / value)
         self.set_g(self.g / value)
         self.set_b(self.b / value)
 
     def modulo_with_value(self, value):
+        if value == 0:
+            raise ZeroDivisionException()
         self.set_r(self.r % value)
         self.set_g(self.g % value)
         self.set_b(self.b % value)
@@ -212,6 +264,8 @@ class PixelVariable(Variable):
 
         if not isinstance(other, PixelVariable):
             return None
+        if other.has_zero():
+            raise ZeroDivisionException()
 
         new_pixel = deepcopy(other)
         new_pixel.name = self.name + '/' + other.name
@@ -229,6 +283,8 @@ class PixelVariable(Variable):
 
         if not isinstance(other, PixelVariable):
             return None
+        if other.has_zero():
+            raise ZeroDivisionException()
 
         new_pixel = deepcopy(other)
         new_pixel.name = self.name + '%' + other.name
@@ -275,35 +331,248 @@ class PixelVariable(Variable):
                ', g=' + str(self.g) + ', b=' + str(self.b) + ')'
 
 
-class MatrixVariable(Variable):
-    def __init__(self, name: str, rows: List[List[int]] = None):
+class Share:
+    # variables reading one buffer, while there are more of them each copies it before writing
+    def __init__(self):
+        self.holders = 1
+
+
+class ArrayVariable(Variable):
+    def __init__(self, name: str, values, magnitude: int = None):
         super().__init__(name)
-        self.rows = rows
-        self.xdim = len(rows[0])
-        self.ydim = len(rows)
+        self.storage = values
+        self._magnitude = magnitude
+        self._share = None
+
+    @property
+    def storage(self):
+        # a dense ndarray, or a sparse matrix for mostly zero 2d matrices
+        return self._storage
+
+    @storage.setter
+    def storage(self, storage):
+        self._storage = storage
+        self._magnitude = None
+
+    @property
+    def values(self) -> np.ndarray:
+        return sparse.dense(self._storage)
+
+    @values.setter
+    def values(self, values: np.ndarray):
+        self.storage = values
+
+    @property
+    def is_sparse(self):
+        return sparse.is_sparse(self._storage)
+
+    @property
+    def magnitude(self) -> int:
+        # upper bound of absolute values, propagated through operations to skip range scans
+        if self._magnitude is None:
+            self._magnitude = sparse.magnitude(self._storage)
+        return self._magnitude
+
+    def _update(self, result):
+        self.storage, self._magnitude = result
+
+    def release(self):
+        # called once the value is dead, its buffer is recycled for later values of the same shape
+        # unless a region of it or the matrix it is a region of still reads it
+        if self._share is not None:
+            self._share.holders -= 1
+            self._share = None
+        elif not self.is_sparse:
+            buffers.release(self._storage)
+
+    def _own(self):
+        # copy on write, called before the buffer is overwritten
+        if self._share is None:
+            return
+        if self._share.holders > 1:
+            self._storage = buffers.copy(self._storage)
+        self._share.holders -= 1
+        self._share = None
+
+    def __deepcopy__(self, memo):
+        variable = copy(self)
+        variable._share = None
+        if self.is_sparse:
+            variable._storage = deepcopy(self._storage, memo)
+        else:
+            variable._storage = buffers.copy(self._storage)
+        return variable
+
+    def get_value(self, *indices) -> int:
+        if self.is_sparse:
+            return self._storage.get(*indices)
+        return int(self._storage[indices])
+
+    def set_value(self, *indices_and_value):
+        *indices, value = indices_and_value
+        if self.is_sparse:
+            self._storage.set(*indices, value)
+            magnitude = None if self._magnitude is None else max(self._magnitude, abs(value))
+            self._update((sparse.settle(self._storage), magnitude))
+        else:
+            self._own()
+            self._update(arrays.store(self._storage, tuple(indices), value, self._magnitude))
+
+    def get_region(self, index):
+        if self.is_sparse:
+            return MatrixVariable('', sparse.region(self._storage, index), self._magnitude)
+        return self._view(self._storage[index])
+
+    def transpose(self):
+        # the last two axes swap, every slice of a 3d matrix is transposed on its own
+        if self.is_sparse:
+            return MatrixVariable('', sparse.transpose(self._storage), self._magnitude)
+        return self._view(np.swapaxes(self._storage, -1, -2))
+
+    def power(self, exponent: int):
+        # repeated squaring, every product takes the multiplication path of the operands
+        result = None
+        square = self
+        while exponent:
+            if exponent & 1:
+                result = square if result is None else result * square
+            exponent >>= 1
+            if exponent:
+                square = square * square
+        if result is None:
+            identity = np.zeros(self._storage.shape, dtype=np.int64)
+            identity[..., range(identity.shape[-1]), range(identity.shape[-1])] = 1
+            return type(self)('', sparse.choose(identity), 1)
+        return deepcopy(result) if result is self else result
+
+    def _view(self, values: np.ndarray):
+        # views share the buffer, whichever of the two is written first copies it
+        if self._share is None:
+            self._share = Share()
+        self._share.holders += 1
+        view = MatrixVariable('', values, self._magnitude) if values.ndim == 2 else \
+            Matrix3dVariable('', values, self._magnitude)
+        view._share = self._share
+        return view
+
+    def set_region(self, index, value):
+        # value is a number filling the region, or a matrix of its shape; 2d matrices fill every plane of 3d regions
+        shape = tuple(item.stop - item.start for item in index if isinstance(item, slice))
+        if isinstance(value, int):
+            region, magnitude = value, abs(value)
+        else:
+            region, magnitude = value.values, value.magnitude
+            if region.shape != shape and (len(shape) != 3 or region.shape != shape[1:]):
+                raise MatrixDimensionsException(' by '.join(map(str, shape)), ' by '.join(map(str, region.shape)))
+        if self.is_sparse:
+            values, magnitude = arrays.assign(self._storage.to_dense(), index, region, self._magnitude, magnitude)
+            self._update((sparse.choose(values), magnitude))
+        else:
+            self._own()
+            self._update(arrays.assign(self._storage, index, region, self._magnitude, magnitude))
 
     def has_zero(self):
-        for row in self.rows:
-            for number in row:
-                if number == 0:
-                    return True
-        return False
+        if self.is_sparse:
+            return self._storage.nnz < self._storage.size
+        return not np.all(self._storage)
 
+    # in-place updates overwrite the dense buffer as long as the result stays int64
     def add_value(self, value: int):
-        for i in range(self.ydim):
-            self.rows[i] = [x + value for x in self.rows[i]]
+        if self.is_sparse:
+            self._update(sparse.add_value(self._storage, value, self.magnitude))
+        else:
+            self._own()
+            self._update(arrays.add(self._storage, value, self.magnitude, out=self._storage))
 
     def multiply_by_value(self, value: int):
-        for i in range(self.ydim):
-            self.rows[i] = [x * value for x in self.rows[i]]
+        self._update(self._scale(arrays.multiply, value, in_place=True))
 
     def divide_by_value(self, value: int):
-        for i in range(self.ydim):
-            self.rows[i] = [x // value for x in self.rows[i]]
+        self._update(self._scale(arrays.floor_divide, value, in_place=True))
 
     def modulo_with_value(self, value: int):
-        for i in range(self.ydim):
-            self.rows[i] = [x % value for x in self.rows[i]]
+        self._update(self._scale(arrays.modulo, value, in_place=True))
+
+    def add_array(self, other):
+        self._update(self._combine(sparse.add, arrays.add, other))
+
+    def subtract_array(self, other):
+        self._update(self._combine(sparse.subtract, arrays.subtract, other))
+
+    def special_multiply_by_array(self, other):
+        self._update(self._combine(sparse.special_multiply, arrays.multiply, other))
+
+    def _scale(self, operation, value: int, in_place: bool = False):
+        if self.is_sparse:
+            return sparse.scale(self._storage, operation, value, self.magnitude)
+        if in_place:
+            self._own()
+        return operation(self._storage, value, self.magnitude, out=self._storage if in_place else None)
+
+    def _combine(self, sparse_operation, operation, other):
+        if self.is_sparse:
+            return sparse_operation(self._storage, other.storage, self.magnitude, other.magnitude)
+        self._own()
+        return operation(self._storage, other.values, self.magnitude, other.magnitude, out=self._storage)
+
+    def __bool__(self):
+        if self.is_sparse:
+            return self._storage.nnz == self._storage.size and bool(np.all(self._storage.data > 0))
+        return bool(np.all(self._storage > 0))
+
+    def __eq__(self, other):
+        if isinstance(other, type(self)):
+            return sparse.equal(self._storage, other.storage)
+        return False
+
+    def __ne__(self, other):
+        if isinstance(other, type(self)):
+            return not self == other
+        return False
+
+    def __gt__(self, other):
+        if isinstance(other, type(self)):
+            return self.values.tolist() > other.values.tolist()
+        return False
+
+    def __ge__(self, other):
+        if isinstance(other, type(self)):
+            return self.values.tolist() >= other.values.tolist()
+        return False
+
+    def __lt__(self, other):
+        if isinstance(other, type(self)):
+            return self.values.tolist() < other.values.tolist()
+        return False
+
+    def __le__(self, other):
+        if isinstance(other, type(self)):
+            return self.values.tolist() <= other.values.tolist()
+        return False
+
+
+class MatrixVariable(ArrayVariable):
+    def __init__(self, name: str, rows: Union[List[List[int]], np.ndarray, sparse.SparseMatrix] = None,
+                 magnitude: int = None):
+        if isinstance(rows, list):
+            rows = sparse.choose(arrays.to_array(rows))
+        super().__init__(name, rows, magnitude)
+
+    @staticmethod
+    def zeros(ydim: int, xdim: int):
+        return MatrixVariable('', sparse.zeros(ydim, xdim), 0)
+
+    @property
+    def rows(self) -> List[List[int]]:
+        return self.values.tolist()
+
+    @property
+    def xdim(self):
+        return self.storage.shape[1]
+
+    @property
+    def ydim(self):
+        return self.storage.shape[0]
 
     def special_multiply(self, other):
         if isinstance(other, Matrix3dVariable):
@@ -315,13 +584,11 @@ class MatrixVariable(Variable):
         if other.xdim != self.xdim or other.ydim != self.ydim:
             raise MatrixDimensionsException(str(self.xdim) + ' by ' + str(self.ydim),
                                             str(other.xdim) + ' by ' + str(other.ydim))
-        new_rows = []
-        for row, o_row in zip(self.rows, other.rows):
-            new_row = []
-            for field, o_field in zip(row, o_row):
-                new_row.append(field * o_field)
-            new_rows.append(new_row)
-        return MatrixVariable('', new_rows)
+        if self.is_sparse or other.is_sparse:
+            return MatrixVariable('', *sparse.special_multiply(self.storage, other.storage,
+                                                               self.magnitude, other.magnitude))
+        values, magnitude = arrays.multiply(self.values, other.values, self.magnitude, other.magnitude)
+        return MatrixVariable('', sparse.choose(values), magnitude)
 
     def __add__(self, other):
         if isinstance(other, NumberVariable):
@@ -331,11 +598,8 @@ class MatrixVariable(Variable):
             if self.xdim != other.xdim or self.ydim != other.ydim:
                 raise MatrixDimensionsException(str(self.xdim) + ' by ' + str(self.ydim),
                                                 str(other.xdim) + ' by ' + str(other.ydim))
-            new_matrix = deepcopy(other)
-            new_matrix.name = self.name + '+' + other.name
-            for i in range(new_matrix.zdim):
-                new_matrix.matrices[i] += self
-            return new_matrix
+            return Matrix3dVariable(self.name + '+' + other.name,
+                                    *arrays.add(other.values, self.values, other.magnitude, self.magnitude))
 
         if not isinstance(other, MatrixVariable):
             return None
@@ -343,13 +607,8 @@ class MatrixVariable(Variable):
         if self.xdim != other.xdim or self.ydim != other.ydim:
             raise MatrixDimensionsException(str(self.xdim) + ' by ' + str(self.ydim),
                                             str(other.xdim) + ' by ' + str(other.ydim))
-        new_rows = []
-        for row, o_row in zip(self.rows, other.rows):
-            new_row = []
-            for field, o_field in zip(row, o_row):
-                new_row.append(field + o_field)
-            new_rows.append(new_row)
-        return MatrixVariable(self.name + '+' + other.name, new_rows)
+        return MatrixVariable(self.name + '+' + other.name,
+                              *sparse.add(self.storage, other.storage, self.magnitude, other.magnitude))
 
     def __sub__(self, other):
         if isinstance(other, NumberVariable):
@@ -361,11 +620,8 @@ class MatrixVariable(Variable):
             if self.xdim != other.xdim or self.ydim != other.ydim:
                 raise MatrixDimensionsException(str(self.xdim) + ' by ' + str(self.ydim),
                                                 str(other.xdim) + ' by ' + str(other.ydim))
-            new_matrix = deepcopy(other)
-            new_matrix.name = self.name + '-' + other.name
-            for i in range(new_matrix.zdim):
-                new_matrix.matrices[i] -= self
-            return new_matrix
+            return Matrix3dVariable(self.name + '-' + other.name,
+                                    *arrays.subtract(other.values, self.values, other.magnitude, self.magnitude))
 
         if not isinstance(other, MatrixVariable):
             return None
@@ -373,146 +629,99 @@ class MatrixVariable(Variable):
         if self.xdim != other.xdim or self.ydim != other.ydim:
             raise MatrixDimensionsException(str(self.xdim) + ' by ' + str(self.ydim),
                                             str(other.xdim) + ' by ' + str(other.ydim))
-        new_rows = []
-        for row, o_row in zip(self.rows, other.rows):
-            new_row = []
-            for field, o_field in zip(row, o_row):
-                new_row.append(field - o_field)
-            new_rows.append(new_row)
-        return MatrixVariable(self.name + '-' + other.name, new_rows)
+        return MatrixVariable(self.name + '-' + other.name,
+                              *sparse.subtract(self.storage, other.storage, self.magnitude, other.magnitude))
 
     def __mul__(self, other):
         if isinstance(other, NumberVariable):
             return other * self
 
+        if isinstance(other, Matrix3dVariable):
+            # the matrix multiplies every slice of the 3d matrix
+            if self.xdim != other.ydim:
+                raise MatrixDimensionsException(str(other.ydim), str(self.xdim))
+            return Matrix3dVariable(self.name + '*' + other.name,
+                                    *linalg.matmul(self.values, other.values, self.magnitude, other.magnitude))
+
         if not isinstance(other, MatrixVariable):
             return None
 
         if self.xdim != other.ydim:
             raise MatrixDimensionsException(str(other.ydim), str(self.xdim))
 
-        rows = []
-        for i in range(self.ydim):
-            rows.append([0] * other.xdim)
-        # iterating by row by self
-        for i in range(self.ydim):
-            # iterating by coloum by other
-            for j in range(other.xdim):
-                # iterating by rows of other
-                for k in range(other.ydim):
-                    rows[i][j] += self.rows[i][k] * other.rows[k][j]
-
-        return MatrixVariable(self.name + '*' + other.name, rows)
+        return MatrixVariable(self.name + '*' + other.name,
+                              *sparse.matmul(self.storage, other.storage, self.magnitude, other.magnitude))
 
     def __truediv__(self, other):
         if isinstance(other, NumberVariable):
-            new_matrix = deepcopy(self)
-            new_matrix.name = self.name + '/' + other.name
-            new_matrix.divide_by_value(other.value)
-            return new_matrix
+            return MatrixVariable(self.name + '/' + other.name, *self._scale(arrays.floor_divide, other.value))
         return None
 
     def __mod__(self, other):
         if isinstance(other, NumberVariable):
-            new_matrix = deepcopy(self)
-            new_matrix.name = self.name + '%' + other.name
-            new_matrix.modulo_with_value(other.value)
-            return new_matrix
+            return MatrixVariable(self.name + '%' + other.name, *self._scale(arrays.modulo, other.value))
         return None
 
-    def __bool__(self):
-        for row in self.rows:
-            for number in row:
-                if number <= 0:
-                    return False
-        return True
-
-    def __eq__(self, other):
-        if isinstance(other, MatrixVariable):
-            return self.rows == other.rows
-        return False
-
-    def __ne__(self, other):
-        if isinstance(other, MatrixVariable):
-            return self.rows != other.rows
-        return False
-
-    def __gt__(self, other):
-        if isinstance(other, MatrixVariable):
-            return self.rows > other.rows
-        return False
-
-    def __ge__(self, other):
-        if isinstance(other, MatrixVariable):
-            return self.rows >= other.rows
-        return False
-
-    def __lt__(self, other):
-        if isinstance(other, MatrixVariable):
-            return self.rows < other.rows
-        return False
-
-    def __le__(self, other):
-        if isinstance(other, MatrixVariable):
-            return self.rows <= other.rows
-        return False
-
     def __str__(self):
         return 'matrix \'' + self.name + '\' = ' + str(self.rows)
 
 
-class Matrix3dVariable(Variable):
-    def __init__(self, name: str, matrices: List[MatrixVariable]):
-        super().__init__(name)
-        self.matrices = matrices
-        self.xdim = matrices[0].xdim
-        self.ydim = matrices[0].ydim
-        self.zdim = len(matrices)
+class Matrix3dVariable(ArrayVariable):
+    def __init__(self, name: str, matrices: Union[List[MatrixVariable], np.ndarray], magnitude: int = None):
+        if not isinstance(matrices, np.ndarray):
+            for matrix in matrices:
+                if matrix.xdim != matrices[0].xdim or matrix.ydim != matrices[0].ydim:
+                    raise MatrixDimensionsException(str(matrices[0].xdim) + ' by ' + str(matrices[0].ydim),
+                                                    str(matrix.xdim) + ' by ' + str(matrix.ydim))
+            matrices = np.stack([matrix.values for matrix in matrices])
+        super().__init__(name, matrices, magnitude)
 
-    def has_zero(self):
-        for matrix in self.matrices:
-            if matrix.has_zero():
-                return True
-        return False
+    @staticmethod
+    def zeros(zdim: int, ydim: int, xdim: int):
+        return Matrix3dVariable('', buffers.zeros((zdim, ydim, xdim)), 0)
 
-    def add_value(self, value: int):
-        for i in range(len(self.matrices)):
-            self.matrices[i].add_value(value)
+    @property
+    def matrices(self) -> List[MatrixVariable]:
+        # slices are copies, a matrix holding part of the 3d buffer would outlive changes to it
+        return [MatrixVariable('', self.values[m].copy()) for m in range(self.zdim)]
 
-    def multiply_by_value(self, value: int):
-        for i in range(len(self.matrices)):
-            self.matrices[i].multiply_by_value(value)
+    @property
+    def xdim(self):
+        return self.values.shape[2]
+
+    @property
+    def ydim(self):
+        return self.values.shape[1]
+
+    @property
+    def zdim(self):
+        return self.values.shape[0]
 
     def special_multiply(self, other):
         if isinstance(other, Matrix3dVariable):
             if other.xdim != self.xdim or other.ydim != self.ydim or other.zdim != self.zdim:
                 raise MatrixDimensionsException(str(self.xdim) + ' by ' + str(self.ydim) + ' by ' + str(self.zdim),
                                                 str(other.xdim) + ' by ' + str(other.ydim) + ' by ' + str(other.zdim))
-            new_matrices = []
-            for matrix, o_matrix in zip(self.matrices, other.matrices):
-                new_matrices.append(matrix.special_multiply(o_matrix))
-            return Matrix3dVariable('', new_matrices)
+            return Matrix3dVariable('', *arrays.multiply(self.values, other.values, self.magnitude, other.magnitude))
 
         elif isinstance(other, MatrixVariable):
             if other.xdim != self.xdim or other.ydim != self.ydim:
                 raise MatrixDimensionsException(str(self.xdim) + ' by ' + str(self.ydim),
                                                 str(other.xdim) + ' by ' + str(other.ydim))
-            new_matrices = []
-            for matrix in self.matrices:
-                new_matrices.append(matrix.special_multiply(other))
-            return Matrix3dVariable('', new_matrices)
+            return Matrix3dVariable('', *arrays.multiply(self.values, other.values, self.magnitude, other.magnitude))
         return None
 
     def __add__(self, other):
         if isinstance(other, NumberVariable):
-            return other + self
+            return Matrix3dVariable(self.name + '+' + other.name,
+                                    *arrays.add(self.values, other.value, self.magnitude))
 
         if isinstance(other, MatrixVariable):
-            new_matrix = deepcopy(self)
-            new_matrix.name = self.name + '+' + other.name
-            for m in range(self.zdim):
-                new_matrix.matrices[m] += other
-            return new_matrix
+            if self.xdim != other.xdim or self.ydim != other.ydim:
+                raise MatrixDimensionsException(str(self.xdim) + ' by ' + str(self.ydim),
+                                                str(other.xdim) + ' by ' + str(other.ydim))
+            return Matrix3dVariable(self.name + '+' + other.name,
+                                    *arrays.add(self.values, other.values, self.magnitude, other.magnitude))
 
         if not isinstance(other, Matrix3dVariable):
             return None
@@ -520,19 +729,20 @@ class Matrix3dVariable(Variable):
         if self.xdim != other.xdim or self.ydim != other.ydim or self.zdim != other.zdim:
             raise MatrixDimensionsException(str(self.xdim) + ' by ' + str(self.ydim),
                                             str(other.xdim) + ' by ' + str(other.ydim),)
-        new_matrix = deepcopy(self)
-        new_matrix.name = self.name + '+' + other.name
-        for m in range(self.zdim):
-            new_matrix.matrices[m] += other.matrices[m]
-        return new_matrix
+        return Matrix3dVariable(self.name + '+' + other.name,
+                                *arrays.add(self.values, other.values, self.magnitude, other.magnitude))
 
     def __sub__(self, other):
-        if isinstance(other, MatrixVariable) or isinstance(other, NumberVariable):
-            new_matrix = deepcopy(self)
-            new_matrix.name = self.name + '-' + other.name
-            for m in range(self.zdim):
-                new_matrix.matrices[m] -= other
-            return new_matrix
+        if isinstance(other, NumberVariable):
+            return Matrix3dVariable(self.name + '-' + other.name,
+                                    *arrays.subtract(self.values, other.value, self.magnitude))
+
+        if isinstance(other, MatrixVariable):
+            if self.xdim != other.xdim or self.ydim != other.ydim:
+                raise MatrixDimensionsException(str(self.xdim) + ' by ' + str(self.ydim),
+                                                str(other.xdim) + ' by ' + str(other.ydim))
+            return Matrix3dVariable(self.name + '-' + other.name,
+                                    *arrays.subtract(self.values, other.values, self.magnitude, other.magnitude))
 
         if not isinstance(other, Matrix3dVariable):
             return None
@@ -540,89 +750,239 @@ class Matrix3dVariable(Variable):
         if self.xdim != other.xdim or self.ydim != other.ydim or self.zdim != other.zdim:
             raise MatrixDimensionsException(str(self.xdim) + ' by ' + str(self.ydim),
                                             str(other.xdim) + ' by ' + str(other.ydim),)
-        new_matrix = deepcopy(self)
-        new_matrix.name = self.name + '-' + other.name
-        for m in range(self.zdim):
-            new_matrix.matrices[m] -= other.matrices[m]
-        return new_matrix
+        return Matrix3dVariable(self.name + '-' + other.name,
+                                *arrays.subtract(self.values, other.values, self.magnitude, other.magnitude))
 
     def __mul__(self, other):
-        if isinstance(other, MatrixVariable) or isinstance(other, NumberVariable):
-            new_matrix = deepcopy(self)
-            new_matrix.name = self.name + '*' + other.name
-            for m in range(self.zdim):
-                new_matrix.matrices[m] *= other
-            return new_matrix
+        if isinstance(other, NumberVariable):
+            return Matrix3dVariable(self.name + '*' + other.name,
+                                    *arrays.multiply(self.values, other.value, self.magnitude))
 
-        if not isinstance(other, Matrix3dVariable):
+        if not isinstance(other, MatrixVariable) and not isinstance(other, Matrix3dVariable):
             return None
 
-        if self.zdim != other.zdim:
+        # all slices are multiplied in one call, a 2d matrix multiplies every slice
+        if isinstance(other, Matrix3dVariable) and self.zdim != other.zdim:
             raise MatrixDimensionsException(str(other.zdim), str(self.zdim))
-        new_matrix = deepcopy(self)
-        new_matrix.name = self.name + '*' + other.name
-        for m in range(self.zdim):
-            new_matrix.matrices[m] *= other.matrices[m]
-        return new_matrix
+        if self.xdim != other.ydim:
+            raise MatrixDimensionsException(str(other.ydim), str(self.xdim))
+        return Matrix3dVariable(self.name + '*' + other.name,
+                                *linalg.matmul(self.values, other.values, self.magnitude, other.magnitude))
 
     def __truediv__(self, other):
         if not isinstance(other, NumberVariable):
             return None
 
-        new_matrix = deepcopy(self)
-        new_matrix.name = self.name + '/' + other.name
-        for m in range(new_matrix.zdim):
-            new_matrix.matrices[m] /= other
-        return new_matrix
+        return Matrix3dVariable(self.name + '/' + other.name,
+                                *arrays.floor_divide(self.values, other.value, self.magnitude))
 
     def __mod__(self, other):
         if not isinstance(other, NumberVariable):
             return None
 
-        new_matrix = deepcopy(self)
-        new_matrix.name = self.name + '%' + other.name
-        for m in range(new_matrix.zdim):
-            new_matrix.matrices[m] %= other
-        return new_matrix
+        return Matrix3dVariable(self.name + '%' + other.name,
+                                *arrays.modulo(self.values, other.value, self.magnitude))
+
+    def __str__(self):
+        matrices_str = ',\n'.join(str(rows) for rows in self.values.tolist())
+        return 'matrix \'' + self.name + '\' = {' + matrices_str + '}'
+
+
+class ImageVariable(Variable):
+    CHANNELS = {'r': 0, 'g': 1, 'b': 2}
+
+    def __init__(self, name: str, values: np.ndarray):
+        super().__init__(name)
+        # packed ydim x xdim x 3 buffer of r, g, b channels
+        self.values = values
+
+    def __deepcopy__(self, memo):
+        return ImageVariable(self.name, store.copy(self.values))
+
+    @staticmethod
+    def zeros(ydim: int, xdim: int):
+        values = store.allocate((ydim, xdim, 3), np.uint8)
+        values.fill(0)
+        return ImageVariable('', values)
+
+    @staticmethod
+    def filled(ydim: int, xdim: int, pixel: PixelVariable):
+        values = store.allocate((ydim, xdim, 3), np.uint8)
+        values[:, :] = (pixel.r, pixel.g, pixel.b)
+        return ImageVariable('', values)
+
+    @staticmethod
+    def from_matrix3d(matrix: Matrix3dVariable):
+        # a 3d matrix holds the r, g and b channels as its three slices
+        if matrix.zdim != 3:
+            raise MatrixDimensionsException('3 channels', str(matrix.zdim) + ' channels')
+        channels = np.moveaxis(matrix.values, 0, -1)
+        values = store.allocate(channels.shape, np.uint8)
+        for block in store.blocks(values.shape, values.dtype):
+            values[block] = _saturate(channels[block])
+        return ImageVariable('', values)
+
+    @property
+    def xdim(self):
+        return self.values.shape[1]
+
+    @property
+    def ydim(self):
+        return self.values.shape[0]
+
+    def get_pixel(self, y: int, x: int) -> PixelVariable:
+        return PixelVariable('', *self.values[y, x].tolist())
+
+    def set_pixel(self, y: int, x: int, pixel: PixelVariable):
+        self.values[y, x] = (pixel.r, pixel.g, pixel.b)
+
+    def get_channel(self, channel: str) -> MatrixVariable:
+        values = buffers.acquire((self.ydim, self.xdim))
+        np.copyto(values, self.values[:, :, self.CHANNELS[channel]])
+        return MatrixVariable('', values, PixelVariable.MAX_VALUE)
+
+    def set_channel(self, channel: str, value):
+        if isinstance(value, MatrixVariable):
+            if value.xdim != self.xdim or value.ydim != self.ydim:
+                raise MatrixDimensionsException(str(self.xdim) + ' by ' + str(self.ydim),
+                                                str(value.xdim) + ' by ' + str(value.ydim))
+            value = value.values
+        channel_values = self.values[:, :, self.CHANNELS[channel]]
+        for block in store.blocks(channel_values.shape, self.values.dtype):
+            channel_values[block] = _saturate(value[block] if isinstance(value, np.ndarray) else value)
+
+    def has_zero(self):
+        return not np.all(self.values)
+
+    def add_value(self, value: int):
+        self.values = self._apply(np.add, _limit(value))
+
+    def multiply_by_value(self, value: int):
+        self.values = self._apply(np.multiply, _limit(value))
+
+    def divide_by_value(self, value: int):
+        if value == 0:
+            raise ZeroDivisionException()
+        self.values = self._divide(arrays.checked_floor_divide, value)
+
+    def modulo_with_value(self, value: int):
+        if value == 0:
+            raise ZeroDivisionException()
+        self.values = self._divide(arrays.checked_remainder, value)
+
+    def _apply(self, operation, operand) -> np.ndarray:
+        # computed on int32, which holds any product of a channel and a limited operand,
+        # one tile at a time so that the wide copy never exists for the whole image
+        result = store.allocate(self.values.shape, np.uint8)
+        for block in store.blocks(result.shape, result.dtype):
+            part = operand[block] if isinstance(operand, np.ndarray) and operand.ndim == 3 else operand
+            result[block] = _saturate(operation(self.values[block].astype(np.int32), part))
+        return result
+
+    def _divide(self, operation, operand) -> np.ndarray:
+        # channels divided by channels, or by numbers up to 255, stay within 0 to 255, so they are
+        # divided as bytes in a single pass that also finds zero divisors
+        if isinstance(operand, int) and not 0 < operand < 256:
+            return self._apply(operation, _limit(operand))
+        operand = np.asarray(operand).astype(np.uint8, copy=False)
+        return store.apply(operation, self.values, operand, out=store.allocate(self.values.shape, np.uint8))
+
+    def _operand(self, other):
+        if isinstance(other, PixelVariable):
+            return np.array([other.r, other.g, other.b], dtype=np.int32)
+        if not isinstance(other, ImageVariable):
+            return None
+        if self.xdim != other.xdim or self.ydim != other.ydim:
+            raise MatrixDimensionsException(str(self.xdim) + ' by ' + str(self.ydim),
+                                            str(other.xdim) + ' by ' + str(other.ydim))
+        return other.values
+
+    def __add__(self, other):
+        if isinstance(other, NumberVariable):
+            return other + self
+        operand = self._operand(other)
+        if operand is None:
+            return None
+        return ImageVariable(self.name + '+' + other.name, self._apply(np.add, operand))
+
+    def __sub__(self, other):
+        if isinstance(other, NumberVariable):
+            return ImageVariable(self.name + '-' + other.name, self._apply(np.subtract, _limit(other.value)))
+        operand = self._operand(other)
+        if operand is None:
+            return None
+        return ImageVariable(self.name + '-' + other.name, self._apply(np.subtract, operand))
+
+    def __mul__(self, other):
+        if isinstance(other, NumberVariable):
+            return other * self
+        operand = self._operand(other)
+        if operand is None:
+            return None
+        return ImageVariable(self.name + '*' + other.name, self._apply(np.multiply, operand))
+
+    def __truediv__(self, other):
+        if isinstance(other, NumberVariable):
+            if other.value == 0:
+                raise ZeroDivisionException()
+            return ImageVariable(self.name + '/' + other.name, self._divide(arrays.checked_floor_divide, other.value))
+        operand = self._operand(other)
+        if operand is None:
+            return None
+        return ImageVariable(self.name + '/' + other.name, self._divide(arrays.checked_floor_divide, operand))
+
+    def __mod__(self, other):
+        if isinstance(other, NumberVariable):
+            if other.value == 0:
+                raise ZeroDivisionException()
+            return ImageVariable(self.name + '%' + other.name, self._divide(arrays.checked_remainder, other.value))
+        operand = self._operand(other)
+        if operand is None:
+            return None
+        return ImageVariable(self.name + '%' + other.name, self._divide(arrays.checked_remainder, operand))
 
     def __bool__(self):
-        for matrix in self.matrices:
-            if not matrix:
-                return False
-        return True
+        return bool(np.all(self.values > 0))
 
     def __eq__(self, other):
-        if isinstance(other, Matrix3dVariable):
-            return self.matrices == other.matrices
+        if isinstance(other, ImageVariable):
+            return self.values.shape == other.values.shape and bool(np.all(self.values == other.values))
         return False
 
     def __ne__(self, other):
-        if isinstance(other, Matrix3dVariable):
-            return self.matrices != other.matrices
+        if isinstance(other, ImageVariable):
+            return not self == other
         return False
 
     def __gt__(self, other):
-        if isinstance(other, Matrix3dVariable):
-            return self.matrices > other.matrices
+        if isinstance(other, ImageVariable):
+            return bool(np.all(self.values > other.values))
         return False
 
     def __ge__(self, other):
-        if isinstance(other, Matrix3dVariable):
-            return self.matrices >= other.matrices
+        if isinstance(other, ImageVariable):
+            return bool(np.all(self.values >= other.values))
         return False
 
     def __lt__(self, other):
-        if isinstance(other, Matrix3dVariable):
-            return self.matrices < other.matrices
+        if isinstance(other, ImageVariable):
+            return bool(np.all(self.values < other.values))
         return False
 
     def __le__(self, other):
-        if isinstance(other, Matrix3dVariable):
-            return self.matrices <= other.matrices
+        if isinstance(other, ImageVariable):
+            return bool(np.all(self.values <= other.values))
         return False
 
     def __str__(self):
-        matrices_str = str(self.matrices[0].rows)
-        for matrix in self.matrices[1:]:
-            matrices_str += ',\n' + str(matrix.rows)
-        return 'matrix \'' + self.name + '\' = {' + matrices_str + '}'
+        return 'image \'' + self.name + '\' = ' + str(self.values.tolist())
+
+
+def _saturate(values) -> np.ndarray:
+    # same clamping as pixel channels
+    return np.clip(values, PixelVariable.MIN_VALUE, PixelVariable.MAX_VALUE).astype(np.uint8)
+
+
+def _limit(value: int) -> int:
+    # on channels of 0 to 255 any operand beyond 256 saturates exactly like 256 does
+    return max(-256, min(256, value))
@@ -20,6 +20,9 @@ class Visitor:
     def visit_matrix_lookup(self, matrix_lookup: MatrixLookup):
         pass
 
+    def visit_slice(self, _slice: Slice):
+        pass
+
     def visit_function_definition(self, function_definition: FunctionDefinition):
         pass
 
@@ -76,3 +79,6 @@ class Visitor:
 
     def visit_argument_list(self, argument_list: ArgumentList):
         pass
+
+    def visit_string(self, string: String):
+        pass
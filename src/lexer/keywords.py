@@ -15,7 +15,8 @@ def get_keyword(token_str):
         'return': TokenType.RETURN,
         'number': TokenType.NUMBER_TYPE,
         'pixel': TokenType.PIXEL,
-        'matrix': TokenType.MATRIX
+        'matrix': TokenType.MATRIX,
+        'image': TokenType.IMAGE
     }
     if token_str in keywords:
         return keywords[token_str]
@@ -33,6 +34,7 @@ def get_operator(token_str):
         '%': TokenType.MODULO,
         '.': TokenType.DOT,
         ',': TokenType.COMMA,
+        ':': TokenType.COLON,
         ';': TokenType.SEMICOLON,
         '(': TokenType.L_PARENTHESIS,
         ')': TokenType.R_PARENTHESIS,
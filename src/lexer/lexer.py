@@ -5,7 +5,8 @@ from ..exceptions.exceptions import *
 
 
 class Lexer:
-    def __init__(self, source, max_id_length=128, max_comment_length=512, max_number=pow(2, 128)):
+    def __init__(self, source, max_id_length=128, max_comment_length=512, max_number=pow(2, 128),
+                 max_string_length=1024):
         self.__source = source
         self.__source.next_char()
 
@@ -16,6 +17,7 @@ class Lexer:
         self.__max_id_length = max_id_length
         self.__max_comment_length = max_comment_length
         self.__max_number = max_number
+        self.__max_string_length = max_string_length
 
     def get_next_token(self):
         self.skip_whitespaces()
@@ -30,6 +32,8 @@ class Lexer:
             return self.token
         if self.build_comment():
             return self.token
+        if self.build_string():
+            return self.token
         if self.build_operator():
             return self.token
 
@@ -89,6 +93,24 @@ class Lexer:
         self.token = self.construct_token(TokenType.COMMENT, comment_str)
         return True
 
+    def build_string(self):
+        if self.__source.char != '"':
+            return False
+
+        string_chars = []
+        while self.get_next_char() != '"':
+            if self.is_eof():
+                raise SyntaxException(self.token_start_position, self.token_start_byte,
+                                      "String is missing a closing quotation mark")
+            if len(string_chars) == self.__max_string_length:
+                raise StringTooLongException(self.__source.position, self.token_start_position)
+            string_chars.append(self.__source.char)
+        self.get_next_char()
+        string_str = ''.join(string_chars)
+
+        self.token = self.construct_token(TokenType.STRING, string_str)
+        return True
+
     def build_operator(self):
         first_char = self.__source.char
         two_chars = first_char + self.get_next_char()
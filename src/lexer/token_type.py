@@ -4,6 +4,7 @@ from enum import Enum, auto
 class TokenType(Enum):
     ID = auto()
     NUMBER = auto()
+    STRING = auto()
     COMMENT = auto()
     EOT = auto()
     UNKNOWN = auto()
@@ -22,6 +23,7 @@ class TokenType(Enum):
     NUMBER_TYPE = auto()
     PIXEL = auto()
     MATRIX = auto()
+    IMAGE = auto()
 
     NOT = auto()
     LESS_THAN = auto()
@@ -36,6 +38,7 @@ class TokenType(Enum):
     HASHTAG = auto()
     DOT = auto()
     COMMA = auto()
+    COLON = auto()
     SEMICOLON = auto()
     L_PARENTHESIS = auto()
     R_PARENTHESIS = auto()
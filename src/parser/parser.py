@@ -199,16 +199,23 @@ class Parser:
         if not self.parse_next_token(TokenType.L_BRACKET):
             return None
 
-        expression = self.parse_expression()
+        expression = self.parse_index()
         self.try_or_exception(expression, "No value specified to look up matrix field")
         expressions = [expression]
         while self.parse_next_token(TokenType.COMMA):
-            expression = self.parse_expression()
+            expression = self.parse_index()
             self.try_or_exception(expression, "No other index after a coma in a matrix lookup")
             expressions.append(expression)
         self.try_or_exception(TokenType.R_BRACKET, "Missing closing bracket to look up matrix field")
         return MatrixLookup(_id, expressions)
 
+    def parse_index(self):
+        # a single index or a range of them, either bound of a range may be left out
+        expression = self.parse_expression()
+        if not self.parse_next_token(TokenType.COLON):
+            return expression
+        return Slice(expression, self.parse_expression())
+
     def parse_operator_definition(self):
         if not self.parse_next_token(TokenType.NEW_OPERATOR):
             return None
@@ -376,6 +383,10 @@ class Parser:
         if number_token:
             number = number_token.value
             return BaseExpression(number, subtraction)
+        string_token = self.parse_next_token(TokenType.STRING)
+        if string_token:
+            self.try_or_exception((not subtraction), "Unary '-' operator must not be used with a string")
+            return BaseExpression(String(string_token.value))
         matrix = self.parse_matrix()
         if matrix:
             return BaseExpression(matrix, subtraction)
@@ -469,7 +480,8 @@ class Parser:
 
     def parse_type(self):
         _type = self._token.type
-        if not (_type == TokenType.NUMBER_TYPE or _type == TokenType.PIXEL or _type == TokenType.MATRIX):
+        if not (_type == TokenType.NUMBER_TYPE or _type == TokenType.PIXEL or _type == TokenType.MATRIX or
+                _type == TokenType.IMAGE):
             return None
         return _type
 
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Union
 
 
 class Visitable:
@@ -19,6 +19,14 @@ class ExpressionInParenthesis(Visitable):
         visitor.visit_expression_in_parenthesis(self)
 
 
+class String(Visitable):
+    def __init__(self, value: str):
+        self.value = value
+
+    def accept(self, visitor):
+        visitor.visit_string(self)
+
+
 class BaseExpression(Visitable):
     def __init__(self, expression, subtract_operator: bool = False):
         self.expression = expression
@@ -204,8 +212,17 @@ class FunctionDefinition(Callable):
         visitor.visit_function_definition(self)
 
 
+class Slice(Visitable):
+    def __init__(self, start: Expression = None, stop: Expression = None):
+        self.start = start
+        self.stop = stop
+
+    def accept(self, visitor):
+        visitor.visit_slice(self)
+
+
 class MatrixLookup(Visitable):
-    def __init__(self, _id: str, indices: List[Expression]):
+    def __init__(self, _id: str, indices: List[Union[Expression, Slice]]):
         self.id = _id
         self.indices = indices
 
@@ -1,4 +1,6 @@
 import io
+import struct
+import zlib
 import pytest
 
 from src.lexer.lexer import Lexer
@@ -933,6 +935,892 @@ def test_program_matrix_multiplication_number():
                                                                          [2, 6]])
 
 
+def test_program_matrix_fused_expression():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     a = [1, 2;'
+                                  '          3, 4;];'
+                                  '     b = [5, -6;'
+                                  '          7, 8;];'
+                                  '     c = a * 2 + b - a % 3;'
+                                  '     return c;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result == MatrixVariable('c', [[6, -4],
+                                                                         [13, 15]])
+
+
+def test_program_matrix_fused_expression_in_parenthesis():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     a = [1, 2;'
+                                  '          3, 4;];'
+                                  '     b = [5, -6;'
+                                  '          7, 8;];'
+                                  '     c = -(a + b) * 3 / 2;'
+                                  '     return c;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result == MatrixVariable('c', [[-9, 6],
+                                                                         [-15, -18]])
+
+
+@pytest.mark.parametrize('expression, name', [('2 * a', 'a*'), ('2 + a', 'a+'), ('a - 1', 'a+'), ('a - b', 'a-b'),
+                                              ('(a + b) * 3', 'a+b**'), ('-(a - b) % 4', 'a-b*%'), ('a @ b', '')])
+def test_program_matrix_fused_expression_name(expression, name):
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     a = [1, 2;'
+                                  '          3, 4;];'
+                                  '     b = [5, -6;'
+                                  '          7, 8;];'
+                                  '     return ' + expression + ';'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result.name == name
+
+
+def test_program_matrix3d_fused_expression_with_broadcast():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     a = [1, 2;'
+                                  '          3, 4;];'
+                                  '     c = {[1, 2; 3, 4;], [5, 6; 7, 8;]} + a @ a - 1;'
+                                  '     return c;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result == Matrix3dVariable('c', [
+        MatrixVariable('', [[1, 5],
+                            [11, 19]]),
+
+        MatrixVariable('', [[5, 9],
+                            [15, 23]])
+    ])
+
+
+def test_program_matrix_fused_expression_overflow():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     a = [1, 2;];'
+                                  '     c = a * 4611686018427387904 * 4 - 1;'
+                                  '     return c;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result == MatrixVariable('c', [[2 ** 64 - 1, 2 ** 65 - 1]])
+
+
+def test_program_matrix_fused_division_by_zero():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     a = [1, 2;];'
+                                  '     c = a * 2 / 0;'
+                                  '     return c;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == -1
+
+
+def test_program_matrix_update_in_place():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [1, 2;'
+                                  '          3, 4;];'
+                                  '     t = [1, 0;'
+                                  '          0, 1;];'
+                                  '     for (i in 3) {'
+                                  '         m = m * 2 + t;'
+                                  '         m = m - t @ m % 5;'
+                                  '     }'
+                                  '     return m;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result == MatrixVariable('m', [[0, 16],
+                                                                         [24, 20]])
+
+
+def test_program_matrix_update_reading_itself():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [1, 2;'
+                                  '          3, 4;];'
+                                  '     m = m + 1 + m;'
+                                  '     return m;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result == MatrixVariable('m', [[3, 5],
+                                                                         [7, 9]])
+
+
+def test_program_pixel_update_reading_its_member():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     p = pixel(10, 10, 10);'
+                                  '     p = p + 1 + p.r;'
+                                  '     return p;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result == PixelVariable('p', 21, 21, 21)
+
+def test_program_matrix3d_update_in_place_with_matrix():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = {[1, 2; 3, 4;], [5, 6; 7, 8;]};'
+                                  '     t = [1, 0;'
+                                  '          0, 1;];'
+                                  '     m = m - t;'
+                                  '     return m;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result == Matrix3dVariable('m', [
+        MatrixVariable('', [[0, 2],
+                            [3, 3]]),
+
+        MatrixVariable('', [[4, 6],
+                            [7, 7]])
+    ])
+
+
+def test_program_matrix_update_in_place_division_by_zero():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [1, 2;];'
+                                  '     m = m / 0;'
+                                  '     return m;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == -1
+
+
+def test_program_pool_recycles_temporaries():
+    interpreter = new_interpreter(
+                                  'half(m) {'
+                                  '     return m / 2;'
+                                  '}'
+                                  'main() {'
+                                  '     a = matrix(2, 8, 8);'
+                                  '     for (i in 10) {'
+                                  '         b = half(a + 4) - a;'
+                                  '         a = b + a;'
+                                  '     }'
+                                  '     return a[1, 7, 7];'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 3
+    statistics = interpreter.pool_statistics()
+    assert statistics['hits'] > 10 * statistics['misses']
+
+
+def test_program_out_of_core_matches_in_memory():
+    source = ('main() {'
+              '     a = matrix(3, 10, 12);'
+              '     for (i in 10) {'
+              '         a[i % 3, i, i + 1] = i * i;'
+              '     }'
+              '     b = a * 3 + a + 1;'
+              '     b = b - a;'
+              '     return b;'
+              '}')
+    expected = new_interpreter(source)
+    assert expected.interpret() == 0
+    interpreter = new_interpreter(source)
+    interpreter.tile_store.reset(threshold=3 * 10 * 12 * 8, tile_bytes=12 * 8 * 4)
+    returned = interpreter.interpret()
+    assert returned == 0
+    result = interpreter.scope_manager.last_result
+    assert isinstance(result.values, np.memmap)
+    assert result == expected.scope_manager.last_result
+    assert (result.zdim, result.ydim, result.xdim) == (3, 10, 12)
+    assert result.get_value(2, 8, 9) == 3 * 64 + 1
+
+
+def test_program_out_of_core_image():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     img = image(20, 30, pixel(100, 50, 0));'
+                                  '     img = img * 2 - pixel(10);'
+                                  '     img.g = img.r / 2;'
+                                  '     img[19, 29] = pixel(1, 2, 3);'
+                                  '     return img;'
+                                  '}'
+                                  )
+    interpreter.tile_store.reset(threshold=1000, tile_bytes=30 * 3 * 4)
+    returned = interpreter.interpret()
+    assert returned == 0
+    image = interpreter.scope_manager.last_result
+    assert isinstance(image.values, np.memmap)
+    assert (image.ydim, image.xdim) == (20, 30)
+    assert image.get_pixel(0, 0) == PixelVariable('', 190, 95, 0)
+    assert image.get_pixel(19, 29) == PixelVariable('', 1, 2, 3)
+
+
+def test_program_image_arithmetic():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     img = image(1, 2, pixel(100, 200, 250));'
+                                  '     img = img * 2 - pixel(50);'
+                                  '     img[0, 1] = pixel(1, 2, 3);'
+                                  '     return img;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result == ImageVariable('img', np.array([[[150, 205, 205],
+                                                                                    [1, 2, 3]]]))
+
+
+def test_program_image_channels():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     img = image({[1, 2; 3, 4;], [5, 6; 7, 8;], [-9, 10; 11, 300;]});'
+                                  '     img.r = 7;'
+                                  '     return img.b;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result == MatrixVariable('', [[0, 10],
+                                                                        [11, 255]])
+
+
+def test_program_image_pixel_lookup():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     img = image({[1, 2; 3, 4;], [5, 6; 7, 8;], [9, 10; 11, 12;]});'
+                                  '     p = img[1, 0];'
+                                  '     return p;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result == PixelVariable('p', 3, 7, 11)
+
+
+def test_program_exception_matrix_field_pixel():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [1, 2;];'
+                                  '     m[0, 0] = pixel(3);'
+                                  '     return m;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == -1
+
+
+def test_program_builtin_load_save_pixmap(tmp_path):
+    values = np.arange(2 * 3 * 3, dtype=np.uint8).reshape(2, 3, 3) * 15
+    with open(tmp_path / 'in.ppm', 'wb') as file:
+        file.write(b'P6\n# made by hand\n3 2\n255\n' + values.tobytes())
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     img = load_image("' + str(tmp_path / 'in.ppm') + '");'
+                                  '     img = img * 2;'
+                                  '     save_image("' + str(tmp_path / 'out.ppm') + '", img);'
+                                  '     return img[1, 2];'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result == PixelVariable('', 255, 255, 255)
+    with open(tmp_path / 'out.ppm', 'rb') as file:
+        assert file.read() == b'P6\n3 2\n255\n' + np.minimum(values.astype(int) * 2, 255).astype(np.uint8).tobytes()
+
+
+def test_program_builtin_load_save_graymap(tmp_path):
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [0, 300, 70000;'
+                                  '          -5, 1, 2;];'
+                                  '     save_image("' + str(tmp_path / 'out.pgm') + '", m);'
+                                  '     m = load_image("' + str(tmp_path / 'out.pgm') + '");'
+                                  '     return m;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result == MatrixVariable('', [[0, 300, 65535],
+                                                                        [0, 1, 2]])
+
+
+def test_program_builtin_load_image_plain_format(tmp_path):
+    with open(tmp_path / 'in.ppm', 'wb') as file:
+        file.write(b'P3\n1 1\n255\n1 2 3\n')
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     img = load_image("' + str(tmp_path / 'in.ppm') + '");'
+                                  '     return img;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == -1
+
+
+def test_program_builtin_convolve():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [1, 2, 3;'
+                                  '          4, 5, 6;'
+                                  '          7, 8, 9;];'
+                                  '     k = [0, 1, 0;'
+                                  '          1, -4, 1;'
+                                  '          0, 1, 0;];'
+                                  '     return convolve(m, k);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result == MatrixVariable('', [[2, 1, -4],
+                                                                        [-3, 0, -7],
+                                                                        [-16, -11, -22]])
+
+
+def test_program_builtin_convolve_separable_border_modes():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = {[1, 2, 3;'
+                                  '           4, 5, 6;], [0, 0, 1;'
+                                  '                       0, 0, 0;]};'
+                                  '     k = [1, 2;'
+                                  '          2, 4;];'
+                                  '     a = convolve(m, k, "edge");'
+                                  '     b = convolve(m, k, "wrap");'
+                                  '     return (a[0, 1, 2] == 54 and a[1, 0, 1] == 2 and b[0, 0, 2] == 30'
+                                  '         and b[1, 1, 2] == 2);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+@pytest.mark.parametrize('dimensions, mode', [('0, 3', 'edge'), ('2, 0', 'reflect'), ('2, 0, 3', 'edge')])
+def test_program_builtin_convolve_empty_matrix(dimensions, mode):
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     return convolve(matrix(%s), [1, 2;'
+                                  '                                 2, 4;], "%s");'
+                                  '}' % (dimensions, mode)
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result.values.shape == tuple(int(d) for d in dimensions.split(', '))
+
+def test_program_builtin_convolve_unknown_mode():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     return convolve([1;], [1;], "mirror");'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == -1
+
+
+def test_program_builtin_integral_box_sum():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [1, 2, 3;'
+                                  '          4, 5, 6;'
+                                  '          7, 8, 9;];'
+                                  '     t = integral(m);'
+                                  '     c = integral({[1, 2; 3, 4;], [0, 1; 1, 0;]});'
+                                  '     return (t == [1, 3, 6; 5, 12, 21; 12, 27, 45;] and box_sum(t, 1, 1, 3, 3) == 28'
+                                  '         and box_sum(t, 0, 0, 3, 3) == 45 and box_sum(t, 2, 0, 2, 3) == 0'
+                                  '         and box_sum(c, 0, 1, 2, 2) == [6, 1;]);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_builtin_box_sum_3d_edges():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     c = integral({[1, 2; 3, 4;], [0, 1; 1, 0;]});'
+                                  '     return (box_sum(c, 1, 1, 1, 2) == [0, 0;] and box_sum(c, 0, 0, 0, 0) == [0, 0;]'
+                                  '         and box_sum(c, 0, 0, 1, 1) == [1, 0;] and box_sum(c, 0, 0, 2, 2) == [10, 2;]);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+def test_program_builtin_box_sum_out_of_range():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     return box_sum(integral([1, 2;]), 0, 0, 2, 2);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == -1
+
+
+def test_program_builtin_box_filter():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [9, 9, 9, 0;'
+                                  '          9, 9, 9, 0;'
+                                  '          9, 9, 9, 0;];'
+                                  '     return (box_filter(m, 1) == [4, 6, 4, 2; 6, 9, 6, 3; 4, 6, 4, 2;]'
+                                  '         and box_filter(m, 1, "edge") == [9, 9, 6, 3; 9, 9, 6, 3; 9, 9, 6, 3;]'
+                                  '         and box_filter(m, 0) == m);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+@pytest.mark.parametrize('dimensions, mode', [('0, 3', 'edge'), ('2, 0', 'reflect'), ('2, 0, 3', 'zero')])
+def test_program_builtin_box_filter_empty_matrix(dimensions, mode):
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     return box_filter(matrix(%s), 1, "%s");'
+                                  '}' % (dimensions, mode)
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result.values.shape == tuple(int(d) for d in dimensions.split(', '))
+
+
+def test_program_builtin_median_filter():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [1, 2, 3;'
+                                  '          4, 5, 6;'
+                                  '          7, 8, 9;];'
+                                  '     n = [5, 5, 5, 5;'
+                                  '          5, 200, 5, 5;'
+                                  '          5, 5, 5, 0;];'
+                                  '     return (median_filter(m, 1) == [0, 2, 0; 2, 5, 3; 0, 5, 0;]'
+                                  '         and median_filter(m, 1, "edge") == [2, 3, 3; 4, 5, 6; 7, 7, 8;]'
+                                  '         and max(median_filter(n, 1, "edge")) == 5 and median_filter(m, 0) == m);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_builtin_median_filter_negative_radius():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     return median_filter([1, 2;], 0 - 1);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == -1
+
+
+def test_program_builtin_morphology():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [0, 0, 0, 0, 0;'
+                                  '          0, 9, 9, 9, 0;'
+                                  '          0, 9, 9, 9, 0;'
+                                  '          0, 9, 9, 9, 5;];'
+                                  '     e = erode(m, 3);'
+                                  '     d = dilate([0, 0, 0; 0, 7, 0; 0, 0, 0;], 1, 3);'
+                                  '     h = close([9, 9, 9; 9, 0, 9; 9, 9, 9;], 3);'
+                                  '     return (e[2, 2] == 9 and sum(e) == 18 and d == [0, 0, 0; 7, 7, 7; 0, 0, 0;]'
+                                  '         and open(m, 3) == m - [0, 0, 0, 0, 0; 0, 0, 0, 0, 0; 0, 0, 0, 0, 0;'
+                                  '                                0, 0, 0, 0, 5;]'
+                                  '         and min(h) == 9);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_builtin_morphology_single_element():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [1, 2;'
+                                  '          3, 4;];'
+                                  '     e = erode(m, 1);'
+                                  '     d = dilate(m, 1, 1);'
+                                  '     z = [9, 9;'
+                                  '          9, 9;];'
+                                  '     w = z + 1;'
+                                  '     v = z + 2;'
+                                  '     return (e == [1, 2; 3, 4;] and d == [1, 2; 3, 4;] and w == [10, 10; 10, 10;]);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+@pytest.mark.parametrize('dimensions, name', [('0, 3', 'erode'), ('2, 0', 'dilate'), ('2, 0, 3', 'close')])
+def test_program_builtin_morphology_empty_matrix(dimensions, name):
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     return %s(matrix(%s), 3);'
+                                  '}' % (name, dimensions)
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result.values.shape == tuple(int(d) for d in dimensions.split(', '))
+
+def test_program_builtin_morphology_empty_element():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     return erode([1, 2;], 0);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == -1
+
+
+def test_program_builtin_reductions():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [3, -1, 4;'
+                                  '          1, 5, -9;];'
+                                  '     return (sum(m) == 3 and min(m) == -9 and max(m) == 5 and mean(m) == 0'
+                                  '         and argmax(m) == [1, 1;] and sum(m, 0) == [4, 4, -5;]'
+                                  '         and max(m, 1) == [4; 5;] and argmax(m, 0) == [0, 1, 0;]);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_builtin_reductions_per_channel():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = {[1, 2;'
+                                  '          3, 4;], [8, 7;'
+                                  '                   6, 5;]};'
+                                  '     img = image(2, 3, pixel(10, 20, 250));'
+                                  '     img[1, 2] = pixel(0, 90, 255);'
+                                  '     return (sum(m, "channels") == [10, 26;] and sum(m, 0) == [9, 9; 9, 9;]'
+                                  '         and argmax(m, "channels") == [1, 1; 0, 0;] and min(m, 2) == [1, 3; 7, 5;]'
+                                  '         and sum(img) == 1745 and max(img, "channels") == [10, 90, 255;]'
+                                  '         and mean(img, "channels") == [8, 31, 250;]);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_builtin_sum_is_exact():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = matrix(100, 100);'
+                                  '     m[3, 4] = 4611686018427387904;'
+                                  '     m[7, 8] = 4611686018427387904;'
+                                  '     m[9, 9] = -5;'
+                                  '     print(sum(m));'
+                                  '     return (min(m) == -5 and max(m, 0) == max(m, 0) and mean(m) == 922337203685477'
+                                  '         and sum(m * 1) == sum(m));'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_builtin_reduction_invalid_axis():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     return sum([1, 2;], 2);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == -1
+
+
+def test_program_matrix_region():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [1, 2, 3;'
+                                  '          4, 5, 6;'
+                                  '          7, 8, 9;];'
+                                  '     m[1:, :2] = [0, -1;'
+                                  '                  -2, -3;];'
+                                  '     m[:, 2] = 7;'
+                                  '     return (m[0:2, 1:] == [2, 7; -1, 7;] and m[1, :] == [0, -1, 7;]'
+                                  '         and m[:, 0] == [1; 0; -2;] and sum(m[1:3, 0:2]) == -6'
+                                  '         and m == [1, 2, 7; 0, -1, 7; -2, -3, 7;]);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_matrix3d_region():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     c = {[1, 2;'
+                                  '          3, 4;], [5, 6;'
+                                  '                   7, 8;]};'
+                                  '     p = c[1, :, :];'
+                                  '     c[0, :, :] = p * 2;'
+                                  '     c[:, 1, :] = [0, 0;];'
+                                  '     return (p == [5, 6; 7, 8;] and c[:, :, 0] == {[10; 0;], [5; 0;]}'
+                                  '         and c == {[10, 12; 0, 0;], [5, 6; 0, 0;]});'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_matrix_region_copy_on_write():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [1, 2;'
+                                  '          3, 4;];'
+                                  '     v = m[0:2, 0:1];'
+                                  '     w = m[1, 0:2];'
+                                  '     m[0, 0] = 10;'
+                                  '     w[0, 1] = 40;'
+                                  '     m[0:1, 0:2] = m[1:2, 0:2];'
+                                  '     return (v == [1; 3;] and w == [3, 40;] and m == [3, 4; 3, 4;]);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_sparse_matrix_region():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = matrix(100, 100);'
+                                  '     m[50, 60] = 3;'
+                                  '     m[10:12, 20:22] = [1, 2;'
+                                  '                        3, 4;];'
+                                  '     return (m[49:51, 59:61] == [0, 0; 0, 3;] and sum(m) == 13'
+                                  '         and m[10:12, 21] == [2; 4;]);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_matrix_region_dimensions_mismatch():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [1, 2;'
+                                  '          3, 4;];'
+                                  '     m[0:2, 0:2] = [1, 2;];'
+                                  '     return 0;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == -1
+
+
+def test_program_matrix_region_out_of_range():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [1, 2;'
+                                  '          3, 4;];'
+                                  '     return m[1:3, :];'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == -1
+
+
+def test_program_builtin_comparison_masks():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [1, 200, 30;'
+                                  '          140, 5, 255;];'
+                                  '     c = {[1, 2;'
+                                  '          3, 4;], [5, 6;'
+                                  '                   7, 8;]};'
+                                  '     return (greater(m, 128) == [0, 1, 0; 1, 0, 1;]'
+                                  '         and less_equal(m, 30) == [1, 0, 1; 0, 1, 0;]'
+                                  '         and equal(c, [1, 6; 3, 8;]) == {[1, 0; 1, 0;], [0, 1; 0, 1;]}'
+                                  '         and not_equal(m, m) == [0, 0, 0; 0, 0, 0;] and greater_equal(3, 3) == 1'
+                                  '         and less(c, c) == {[0, 0; 0, 0;], [0, 0; 0, 0;]});'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_builtin_where():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [1, 200, 30;'
+                                  '          140, 5, 255;];'
+                                  '     clamped = where(less(m, 10), 10, where(greater(m, 250), 250, m));'
+                                  '     c = {[1, 2;], [5, 6;]};'
+                                  '     img = image(1, 2, pixel(10, 200, 90));'
+                                  '     return (clamped == [10, 200, 30; 140, 10, 250;]'
+                                  '         and where(greater(c, 2), [7, 8;], 0) == {[0, 0;], [7, 8;]}'
+                                  '         and image(where(greater_equal(img, 90), 255, 0)) =='
+                                  '             image(1, 2, pixel(0, 255, 255))'
+                                  '         and where(equal(m, 5), 4611686018427387904 * 4, 0) =='
+                                  '             [0, 0, 0; 0, 18446744073709551616, 0;]);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_builtin_where_dimensions_mismatch():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     return where([1, 0;], [1, 2, 3;], 0);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == -1
+
+
+def test_program_image_division():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     a = image(2, 2, pixel(200, 100, 50));'
+                                  '     b = image(2, 2, pixel(3, 7, 9));'
+                                  '     return (a / b == image(2, 2, pixel(66, 14, 5))'
+                                  '         and a % b == image(2, 2, pixel(2, 2, 5))'
+                                  '         and a / pixel(1, 2, 50) == image(2, 2, pixel(200, 50, 1))'
+                                  '         and a / 300 == image(2, 2) and a % 60 == image(2, 2, pixel(20, 40, 50)));'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_image_division_by_zero_channel():
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     a = image(2, 2, pixel(200, 100, 50));'
+                                  '     return a % pixel(1, 0, 1);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == -1
+
+
+def png_file(path, header, *chunks):
+    def chunk(chunk_type, data):
+        return struct.pack('>I', len(data)) + chunk_type + data + \
+            struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type)))
+    with open(path, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', *header)) +
+                   b''.join(chunk(*c) for c in chunks) + chunk(b'IEND', b''))
+
+
+def test_program_builtin_load_png_filters(tmp_path):
+    # sub, paeth and average rows of a 2 x 3 graymap, the compressed stream split between two chunks
+    data = zlib.compress(bytes([1, 10, 5, 4, 1, 2, 3, 3, 4]))
+    png_file(tmp_path / 'in.png', (2, 3, 8, 0, 0, 0, 0), (b'IDAT', data[:5]), (b'IDAT', data[5:]))
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = load_image("' + str(tmp_path / 'in.png') + '");'
+                                  '     return m;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result == MatrixVariable('', [[10, 15],
+                                                                        [11, 17],
+                                                                        [8, 16]])
+
+
+def test_program_builtin_load_save_png_pixmap(tmp_path):
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     img = image(40, 30, pixel(10, 20, 30));'
+                                  '     for (i in 40) {'
+                                  '         img[i, i % 30] = pixel(i * 6, 255 - i, i);'
+                                  '     }'
+                                  '     save_image("' + str(tmp_path / 'out.png') + '", img);'
+                                  '     copy = load_image("' + str(tmp_path / 'out.png') + '");'
+                                  '     return (copy == img and copy[39, 9] == pixel(234, 216, 39));'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_builtin_load_save_png_graymap(tmp_path):
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = [0, 300, 70000;'
+                                  '          -5, 1, 2;];'
+                                  '     save_image("' + str(tmp_path / 'out.png') + '", m);'
+                                  '     m = load_image("' + str(tmp_path / 'out.png') + '");'
+                                  '     return m;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result == MatrixVariable('', [[0, 300, 65535],
+                                                                        [0, 1, 2]])
+
+
+def test_program_builtin_load_png_palette(tmp_path):
+    # 2 bit indices, a row of 3 pixels fits a single byte
+    png_file(tmp_path / 'in.png', (3, 1, 2, 3, 0, 0, 0),
+             (b'PLTE', bytes([255, 0, 0, 0, 255, 0, 0, 0, 255])),
+             (b'IDAT', zlib.compress(bytes([0, 0b10010000]))))
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     img = load_image("' + str(tmp_path / 'in.png') + '");'
+                                  '     return (img[0, 0] == pixel(0, 0, 255) and img[0, 1] == pixel(0, 255, 0)'
+                                  '         and img[0, 2] == pixel(255, 0, 0));'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_builtin_load_png_corrupted(tmp_path):
+    png_file(tmp_path / 'in.png', (1, 1, 8, 0, 0, 0, 0), (b'IDAT', zlib.compress(bytes([0, 7]))))
+    with open(tmp_path / 'in.png', 'r+b') as file:
+        # checksum of the data chunk, right before the end chunk
+        file.seek(-16, 2)
+        file.write(b'\xff\xff\xff\xff')
+    interpreter = new_interpreter(
+                                  'main() {'
+                                  '     m = load_image("' + str(tmp_path / 'in.png') + '");'
+                                  '     return m;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == -1
+
+
 def test_greater_than_condition_positive():
     interpreter = new_interpreter('a > b')
     condition = interpreter.parser.parse_condition()
@@ -1185,6 +2073,152 @@ def test_program_builtin_det_3by3():
     assert returned == -5
 
 
+def test_program_builtin_det_zero_pivot():
+    interpreter = new_interpreter('main() {'
+                                  '     m = [0, 2, 1;'
+                                  '          3, 0, 4;'
+                                  '          5, 6, 0;];'
+                                  '     d = det(m);'
+                                  '     return d;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 58
+
+
+def test_program_builtin_det_singular():
+    interpreter = new_interpreter('main() {'
+                                  '     m = [1, 2, 3;'
+                                  '          2, 4, 6;'
+                                  '          1, 1, 3;];'
+                                  '     d = det(m);'
+                                  '     return d;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+
+
+def test_program_builtin_det_12by12():
+    interpreter = new_interpreter('main() {'
+                                  '     m = matrix(12, 12);'
+                                  '     for (i in 12) {'
+                                  '         for (j in 12) {'
+                                  '             m[i, j] = (i + 1) * (j + 1) % 13;'
+                                  '         }'
+                                  '         m[i, i] = i + 2;'
+                                  '     }'
+                                  '     d = det(m);'
+                                  '     return d;'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == -101685803432
+
+
+def test_program_builtin_inverse_scaled():
+    interpreter = new_interpreter('main() {'
+                                  '     m = [4, 7;'
+                                  '          2, 6;];'
+                                  '     s = inverse(m, 10);'
+                                  '     u = inverse([2, 0; 0, 1;]);'
+                                  '     return (s[0, 0] == 6 and s[0, 1] == -7 and s[1, 0] == -2 and s[1, 1] == 4 and'
+                                  '             u[0, 0] == 0 and u[1, 1] == 1);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_builtin_solve_lifted():
+    # past the lifting size the solution is found p-adically, it has to be exact all the same
+    interpreter = new_interpreter('main() {'
+                                  '     a = matrix(24, 24);'
+                                  '     x = matrix(24, 2);'
+                                  '     for (i in 24) {'
+                                  '         for (j in 24) {'
+                                  '             a[i, j] = (i * 7 + j * j * 3) % 251;'
+                                  '         }'
+                                  '         a[i, i] = 300 + i;'
+                                  '         x[i, 0] = i - 12;'
+                                  '         x[i, 1] = i * i;'
+                                  '     }'
+                                  '     y = solve(a, a * x);'
+                                  '     return (sum(not_equal(y, x)) == 0 and'
+                                  '             sum(solve(a, a * x * 3, 2)) == 6 * sum(x));'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_builtin_rank():
+    interpreter = new_interpreter('main() {'
+                                  '     m = [1, 2, 3;'
+                                  '          2, 4, 6;'
+                                  '          0, 1, 1;];'
+                                  '     return (rank(m) == 2 and rank([0, 0; 0, 0;]) == 0 and rank([1, 2, 3;]) == 1);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_builtin_inverse_singular():
+    interpreter = new_interpreter('main() {'
+                                  '     m = [1, 2;'
+                                  '          2, 4;];'
+                                  '     return inverse(m);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == -1
+
+
+def test_program_builtin_pow():
+    interpreter = new_interpreter('main() {'
+                                  '     f = [1, 1;'
+                                  '          1, 0;];'
+                                  '     p = pow(f, 10);'
+                                  '     i = pow(f, 0);'
+                                  '     b = pow(f, 100);'
+                                  '     return (p[0, 1] == 55 and p[1, 1] == 34 and i[0, 0] == 1 and i[0, 1] == 0 and'
+                                  '             b[0, 1] == 354224848179261915075);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
+def test_program_builtin_pow_negative():
+    interpreter = new_interpreter('main() {'
+                                  '     return pow([1, 1; 1, 0;], -1);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == -1
+
+
+def test_program_builtin_transpose():
+    interpreter = new_interpreter('main() {'
+                                  '     m = [1, 2, 3;'
+                                  '          4, 5, 6;];'
+                                  '     t = transpose(m);'
+                                  '     t[0, 1] = 7;'
+                                  '     p = m * transpose(m);'
+                                  '     return (t[2, 0] == 3 and t[0, 1] == 7 and m[1, 0] == 4 and p[0, 1] == 32 and'
+                                  '             p[1, 1] == 77);'
+                                  '}'
+                                  )
+    returned = interpreter.interpret()
+    assert returned == 0
+    assert interpreter.scope_manager.last_result is True
+
+
 def test_return_from_if():
     interpreter = new_interpreter('main() {'
                                   '     return foo();'
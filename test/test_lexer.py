@@ -182,6 +182,12 @@ def test_build_keyword_matrix():
     assert token.type == TokenType.MATRIX
 
 
+def test_build_keyword_image():
+    lexer = new_lexer('image')
+    token = lexer.get_next_token()
+    assert token.type == TokenType.IMAGE
+
+
 def test_build_operator_not():
     lexer = new_lexer('!')
     token = lexer.get_next_token()
@@ -254,6 +260,12 @@ def test_build_operator_comma():
     assert token.type == TokenType.COMMA
 
 
+def test_build_operator_colon():
+    lexer = new_lexer(':')
+    token = lexer.get_next_token()
+    assert token.type == TokenType.COLON
+
+
 def test_build_operator_semicolon():
     lexer = new_lexer(';')
     token = lexer.get_next_token()
@@ -342,6 +354,21 @@ def test_build_comment():
     assert token.value == file_text
 
 
+def test_build_string():
+    lexer = new_lexer('"images/lena #1.ppm";')
+    token = lexer.get_next_token()
+    assert token.type == TokenType.STRING
+    assert token.value == 'images/lena #1.ppm'
+    token = lexer.get_next_token()
+    assert token.type == TokenType.SEMICOLON
+
+
+def test_build_string_unterminated():
+    lexer = new_lexer('"images/lena.ppm')
+    with pytest.raises(SyntaxException):
+        lexer.get_next_token()
+
+
 def test_expression():
     file_text = 'a + 2 > 3*b'
     lexer = new_lexer(file_text)
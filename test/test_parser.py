@@ -40,6 +40,12 @@ def test_parse_type_matrix():
     assert matrix_type == TokenType.MATRIX
 
 
+def test_parse_type_image():
+    parser = new_parser('image')
+    image_type = parser.parse_type()
+    assert image_type == TokenType.IMAGE
+
+
 def test_parse_type_none():
     parser = new_parser('id')
     _type = parser.parse_type()
@@ -159,6 +165,14 @@ def test_base_expression_number():
     assert expression.expression == 5
 
 
+def test_base_expression_string():
+    parser = new_parser('"lena.ppm"')
+    expression = parser.parse_expression()
+    assert isinstance(expression, BaseExpression)
+    assert isinstance(expression.expression, String)
+    assert expression.expression.value == 'lena.ppm'
+
+
 def test_base_expression_matrix():
     parser = new_parser('[1, 2, 4;]')
     expression = parser.parse_expression()
@@ -363,6 +377,20 @@ def test_matrix_lookup():
     assert matrix_lookup.indices[1].expression == 4
 
 
+def test_matrix_lookup_slices():
+    parser = new_parser('mat[1:b, :, 2:]')
+    matrix_lookup = parser.parse_reference_or_call()
+    assert isinstance(matrix_lookup, MatrixLookup)
+    assert len(matrix_lookup.indices) == 3
+    assert isinstance(matrix_lookup.indices[0], Slice)
+    assert matrix_lookup.indices[0].start.expression == 1
+    assert matrix_lookup.indices[0].stop.expression == 'b'
+    assert matrix_lookup.indices[1].start is None
+    assert matrix_lookup.indices[1].stop is None
+    assert matrix_lookup.indices[2].start.expression == 2
+    assert matrix_lookup.indices[2].stop is None
+
+
 def test_reference():
     parser = new_parser('.b')
     reference = parser.parse_reference('a')
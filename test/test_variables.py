@@ -0,0 +1,489 @@
+import pytest
+
+from src.exceptions.exceptions import *
+from src.interpreter.variables import *
+from src.interpreter import filters, fusion, morphology
+from src.interpreter.pool import BufferPool
+from src.interpreter.tiles import TileStore
+from src.lexer.token_type import TokenType
+
+
+def test_matrix_rows_and_dims():
+    matrix = MatrixVariable('m', [[1, 2, 3],
+                                  [4, 5, 6]])
+    assert matrix.xdim == 3
+    assert matrix.ydim == 2
+    assert matrix.rows == [[1, 2, 3], [4, 5, 6]]
+    assert str(matrix) == 'matrix \'m\' = [[1, 2, 3], [4, 5, 6]]'
+
+
+def test_matrix_get_and_set_value():
+    matrix = MatrixVariable.zeros(2, 2)
+    matrix.set_value(1, 0, 7)
+    assert matrix.get_value(1, 0) == 7
+    assert isinstance(matrix.get_value(1, 0), int)
+    assert matrix.rows == [[0, 0], [7, 0]]
+
+
+def test_matrix_ragged_rows():
+    with pytest.raises(MatrixDimensionsException):
+        MatrixVariable('m', [[1, 2], [3]])
+
+
+def test_matrix_vectorized_arithmetic():
+    a = MatrixVariable('a', [[1, -2], [3, 4]])
+    b = MatrixVariable('b', [[5, 6], [-7, 8]])
+    assert (a + b).rows == [[6, 4], [-4, 12]]
+    assert (a - b).rows == [[-4, -8], [10, -4]]
+    assert a.special_multiply(b).rows == [[5, -12], [-21, 32]]
+    assert (a / NumberVariable('', 2)).rows == [[0, -1], [1, 2]]
+    assert (a % NumberVariable('', 3)).rows == [[1, 1], [0, 1]]
+    assert not a.has_zero()
+    assert (a - a).has_zero()
+
+
+def test_matrix_values_beyond_int64():
+    big = 2 ** 62
+    a = MatrixVariable('a', [[big, 1]])
+    assert (a + a).rows == [[2 ** 63, 2]]
+    assert (a * NumberVariable('', big)).rows == [[2 ** 124, big]]
+    assert MatrixVariable('b', [[2 ** 100]]).rows == [[2 ** 100]]
+
+
+def test_matrix_set_value_beyond_int64():
+    matrix = MatrixVariable.zeros(1, 2)
+    matrix.set_value(0, 1, 2 ** 80)
+    assert matrix.get_value(0, 1) == 2 ** 80
+    assert matrix.rows == [[0, 2 ** 80]]
+
+
+def test_matrix_modulo_by_zero():
+    matrix = MatrixVariable('m', [[1, 2]])
+    with pytest.raises(ZeroDivisionException):
+        matrix.modulo_with_value(0)
+
+
+def test_matrix3d_contiguous_storage():
+    matrix = Matrix3dVariable('m', [MatrixVariable('', [[1, 2], [3, 4]]),
+                                    MatrixVariable('', [[5, 6], [7, 8]])])
+    assert matrix.values.shape == (2, 2, 2)
+    assert matrix.values.flags['C_CONTIGUOUS']
+    assert (matrix.zdim, matrix.ydim, matrix.xdim) == (2, 2, 2)
+    assert str(matrix) == 'matrix \'m\' = {[[1, 2], [3, 4]],\n[[5, 6], [7, 8]]}'
+
+
+def test_matrix3d_slices_are_copies():
+    matrix = Matrix3dVariable.zeros(2, 2, 3)
+    matrix.set_value(1, 0, 2, 9)
+    first, second = matrix.matrices
+    second.set_value(0, 2, 5)
+    assert second.rows == [[0, 0, 5], [0, 0, 0]] and first.rows == [[0, 0, 0], [0, 0, 0]]
+    assert matrix.get_value(1, 0, 2) == 9
+
+
+def test_matrix3d_whole_volume_arithmetic():
+    a = Matrix3dVariable('a', [MatrixVariable('', [[1, 2]]),
+                               MatrixVariable('', [[3, 4]])])
+    b = MatrixVariable('b', [[10, 20]])
+    assert (a + b).values.tolist() == [[[11, 22]], [[13, 24]]]
+    assert (a - b).values.tolist() == [[[-9, -18]], [[-7, -16]]]
+    assert a.special_multiply(b).values.tolist() == [[[10, 40]], [[30, 80]]]
+    assert (a / NumberVariable('', 2)).values.tolist() == [[[0, 1]], [[1, 2]]]
+    assert (a % NumberVariable('', 2)).values.tolist() == [[[1, 0]], [[1, 0]]]
+
+
+@pytest.mark.parametrize('operator, left, right', [
+    (TokenType.ADD, 'a', 'b'), (TokenType.ADD, 'n', 'a'), (TokenType.ADD, 'a', 'n'), (TokenType.SUBTRACT, 'a', 'n'),
+    (TokenType.SUBTRACT, 'a', 'b'), (TokenType.MULTIPLY, 'n', 'a'), (TokenType.MULTIPLY, 'a', 'n'),
+    (TokenType.DIVIDE, 'a', 'n'), (TokenType.MODULO, 'a', 'n'), (TokenType.SPECIAL_MULTIPLY, 'a', 'b'),
+    (TokenType.ADD, 'c', 'a'), (TokenType.ADD, 'a', 'c'), (TokenType.SUBTRACT, 'c', 'a')])
+def test_fused_names_match_eager(operator, left, right):
+    operands = {'a': MatrixVariable('a', [[1, 2], [3, 4]]), 'b': MatrixVariable('b', [[5, 6], [7, 8]]),
+                'c': Matrix3dVariable('c', [MatrixVariable('', [[1, 2], [3, 4]])] * 2), 'n': NumberVariable('n', 2)}
+    eager = {TokenType.ADD: lambda x, y: x + y, TokenType.SUBTRACT: lambda x, y: x - y,
+             TokenType.MULTIPLY: lambda x, y: x * y, TokenType.DIVIDE: lambda x, y: x / y,
+             TokenType.MODULO: lambda x, y: x % y, TokenType.SPECIAL_MULTIPLY: lambda x, y: x.special_multiply(y)}
+    fused = fusion.combine(operator, operands[left], operands[right])
+    assert fused is not None
+    assert fused.name == eager[operator](operands[left], operands[right]).name
+    three = NumberVariable('', 3)
+    assert fusion.combine(TokenType.MULTIPLY, three, fused).name == (three * eager[operator](operands[left],
+                                                                                            operands[right])).name
+
+
+@pytest.mark.parametrize('limit', [255, 2 ** 40, 2 ** 100])
+def test_matrix3d_batched_multiplication(limit):
+    slices = [MatrixVariable('', [[(z * 3 + i * 7 + j * 13) % 17 * limit // 17 - limit // 2 for j in range(3)]
+                                  for i in range(2)]) for z in range(4)]
+    transposed = [MatrixVariable('', [list(row) for row in zip(*matrix.rows)]) for matrix in slices]
+    b = MatrixVariable('b', [[(i * 5 + j * 3) % 11 * limit // 11 - limit // 3 for j in range(2)] for i in range(3)])
+    a = Matrix3dVariable('a', slices)
+    c = Matrix3dVariable('c', transposed)
+    assert (a * b).values.tolist() == [(matrix * b).rows for matrix in slices]
+    assert (b * a).values.tolist() == [(b * matrix).rows for matrix in slices]
+    assert (a * c).values.tolist() == [(matrix * other).rows for matrix, other in zip(slices, transposed)]
+    with pytest.raises(MatrixDimensionsException):
+        a * a
+
+
+@pytest.mark.parametrize('size, limit', [(4, 9), (6, 2 ** 40), (30, 255), (24, 2 ** 70)])
+def test_solve_and_inverse_are_exact(size, limit):
+    # small sizes are eliminated in int64 or python ints, large ones lifted p-adically
+    identity = np.eye(size, dtype=np.int64).astype(object)
+    a = np.array([[(i * 31 + j * j * 17) % 97 * limit // 97 - limit // 3 for j in range(size)]
+                  for i in range(size)], dtype=object) + identity * limit
+    x = np.array([[(i * 5 + j) % 7 - 3 for j in range(3)] for i in range(size)], dtype=object)
+    determinant = linalg.determinant(a)
+    assert np.array(linalg.solve(a, a.dot(x), 3)[0], dtype=object).tolist() == (x * 3).tolist()
+    adjugate = np.array(linalg.inverse(a, determinant)[0], dtype=object)
+    assert a.dot(adjugate).tolist() == (identity * determinant).tolist()
+    with pytest.raises(SingularMatrixException):
+        linalg.inverse(np.concatenate((a[:-1], a[:1] * 2 - a[1:2])))
+    assert linalg.rank(np.concatenate((a[:-1], a[:1] * 2 - a[1:2]))) == size - 1
+
+
+def test_transpose_is_a_view_copied_on_write():
+    m = MatrixVariable('m', [[1, 2, 3], [4, 5, 6]])
+    t = m.transpose()
+    assert t.rows == [[1, 4], [2, 5], [3, 6]]
+    assert np.shares_memory(t.values, m.values)
+    t.set_value(0, 1, 9)
+    assert m.rows == [[1, 2, 3], [4, 5, 6]]
+    s = MatrixVariable.zeros(100, 80)
+    s.set_value(3, 7, 5)
+    s.set_value(50, 2, -1)
+    transposed = s.transpose()
+    assert transposed.is_sparse
+    assert (transposed.ydim, transposed.xdim) == (80, 100)
+    assert transposed.values.tolist() == s.values.T.tolist()
+
+
+def test_power_by_squaring():
+    slices = np.array([[[1, 1], [1, 0]], [[2, 0], [1, 3]]])
+    stack = Matrix3dVariable('s', slices)
+    assert stack.power(13).values.tolist() == [np.linalg.matrix_power(matrix, 13).tolist() for matrix in slices]
+    assert stack.power(0).values.tolist() == [[[1, 0], [0, 1]]] * 2
+    f = MatrixVariable('f', [[1, 1], [1, 0]])
+    assert f.power(1).rows == f.rows and f.power(1) is not f
+
+
+@pytest.mark.parametrize('mode', ['zero', 'edge', 'reflect', 'wrap'])
+@pytest.mark.parametrize('radius', [0, 2, 9])
+def test_box_filter_matches_convolution(mode, radius):
+    values = np.array([[[(z * 7 + y * 13 + x * x * 5) % 31 - 15 for x in range(17)] for y in range(11)]
+                       for z in range(2)])
+    kernel = np.ones((2 * radius + 1, 2 * radius + 1), dtype=np.int64)
+    expected = filters.convolve(values, kernel, mode)[0] // kernel.size
+    assert filters.box_filter(values, radius, mode)[0].tolist() == expected.tolist()
+    assert filters.box_filter(arrays.exact(values) << 70, radius, mode)[0].tolist() == \
+        (filters.convolve(arrays.exact(values) << 70, kernel, mode)[0] // kernel.size).tolist()
+
+
+@pytest.mark.parametrize('mode', ['zero', 'edge', 'reflect', 'wrap'])
+@pytest.mark.parametrize('radius', [0, 1, 5, 9])
+@pytest.mark.parametrize('offset, scale', [(0, 8), (-500, 1), (0, 1 << 40), (1 << 70, 1)])
+def test_median_filter_matches_sorted_windows(mode, radius, offset, scale):
+    # pixel levels, a narrow range away from zero, few distinct wide values and exact values
+    values = np.array([[[(z * 7 + y * 13 + x * x * 5) % 31 * scale + offset for x in range(17)] for y in range(11)]
+                       for z in range(2)], dtype=object)
+    values = arrays.narrow(values)[0]
+    side = 2 * radius + 1
+    padded = np.pad(values, [(0, 0), (radius, radius), (radius, radius)], mode=filters.MODES[mode])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, (side, side), axis=(-2, -1))
+    expected = np.sort(windows.reshape(values.shape + (-1,)), axis=-1)[..., side * side // 2]
+    assert filters.median_filter(values, radius, mode)[0].tolist() == expected.tolist()
+    assert filters.median_filter(values[0], radius, mode)[0].tolist() == expected[0].tolist()
+
+
+@pytest.mark.parametrize('height, width', [(1, 1), (2, 5), (3, 3), (4, 1), (15, 20), (30, 2)])
+def test_morphology_matches_window_extremes(height, width):
+    values = np.array([[[(z * 7 + y * 13 + x * x * 5) % 31 - 15 for x in range(17)] for y in range(11)]
+                       for z in range(2)])
+
+    def windows(values, extreme, top, left):
+        result = np.empty_like(values)
+        for y, x in np.ndindex(values.shape[-2:]):
+            window = values[..., max(0, y - top):y - top + height, max(0, x - left):x - left + width]
+            result[..., y, x] = extreme(window, axis=(-2, -1))
+        return result
+    eroded = windows(values, np.min, (height - 1) // 2, (width - 1) // 2)
+    dilated = windows(values, np.max, height // 2, width // 2)
+    assert morphology.apply('erode', values, height, width).tolist() == eroded.tolist()
+    assert morphology.apply('dilate', values, height, width).tolist() == dilated.tolist()
+    opened = morphology.apply('open', values, height, width)
+    assert opened.tolist() == windows(eroded, np.max, height // 2, width // 2).tolist()
+    assert morphology.apply('open', opened, height, width).tolist() == opened.tolist()
+    closed = morphology.apply('close', arrays.exact(values) << 70, height, width)
+    expected = windows(dilated, np.min, (height - 1) // 2, (width - 1) // 2)
+    assert closed.tolist() == (arrays.exact(expected) << 70).tolist()
+
+
+def test_matrix3d_dimensions_mismatch():
+    a = Matrix3dVariable.zeros(2, 2, 2)
+    with pytest.raises(MatrixDimensionsException):
+        a + MatrixVariable('b', [[1, 2]])
+
+
+def test_matrix_multiplication_blas_path():
+    a = MatrixVariable('a', [[1, 2], [3, 4], [5, 6]])
+    b = MatrixVariable('b', [[7, 8, 9], [10, 11, 12]])
+    product = a * b
+    assert product.values.dtype == np.int64
+    assert product.rows == [[27, 30, 33], [61, 68, 75], [95, 106, 117]]
+
+
+@pytest.mark.parametrize('limit', [2 ** 31, 2 ** 62, 2 ** 100])
+def test_matrix_multiplication_exact_paths(limit):
+    size = 24
+    a_rows = [[(i * 7 + j * 13) % 17 * limit // 17 - limit // 2 for j in range(size)] for i in range(size)]
+    b_rows = [[(i * 5 + j * 3) % 11 * limit // 11 - limit // 3 for j in range(size)] for i in range(size)]
+    expected = [[sum(a_rows[i][k] * b_rows[k][j] for k in range(size)) for j in range(size)] for i in range(size)]
+    assert (MatrixVariable('a', a_rows) * MatrixVariable('b', b_rows)).rows == expected
+
+
+def test_matrix_multiplication_small_big_integers():
+    a = MatrixVariable('a', [[2 ** 100, 1]])
+    b = MatrixVariable('b', [[2 ** 90], [-3]])
+    assert (a * b).rows == [[2 ** 190 - 3]]
+
+
+def test_matrix_promotes_and_narrows_back():
+    a = MatrixVariable('a', [[2 ** 62, -5]])
+    promoted = a + a
+    assert promoted.values.dtype == object
+    narrowed = promoted - a
+    assert narrowed.values.dtype == np.int64
+    assert narrowed.rows == [[2 ** 62, -5]]
+
+
+def test_matrix_magnitude_is_propagated():
+    a = MatrixVariable('a', [[3, -4]])
+    b = a * NumberVariable('', 5)
+    assert b.magnitude == 20
+    b.set_value(0, 0, -30)
+    assert b.magnitude == 30
+
+
+def test_matrix_loose_magnitude_is_rechecked_before_promotion():
+    a = MatrixVariable('a', np.array([[1, 2]]), 2 ** 63)
+    result = a + MatrixVariable('b', [[3, 4]])
+    assert result.values.dtype == np.int64
+    assert result.rows == [[4, 6]]
+
+
+def test_sparse_zeros_allocation():
+    matrix = MatrixVariable.zeros(100000, 100000)
+    assert matrix.is_sparse
+    assert matrix.has_zero()
+    assert matrix.get_value(99999, 99999) == 0
+
+
+def test_sparse_lookups_and_writes():
+    matrix = MatrixVariable.zeros(100, 100)
+    matrix.set_value(3, 4, 5)
+    matrix.set_value(99, 0, 2 ** 70)
+    assert matrix.get_value(3, 4) == 5
+    assert matrix.get_value(99, 0) == 2 ** 70
+    assert matrix.get_value(0, 0) == 0
+    assert matrix.is_sparse
+
+
+def test_sparse_matrix_becomes_dense_when_filled():
+    matrix = MatrixVariable.zeros(100, 100)
+    for i in range(100):
+        for j in range(20):
+            matrix.set_value(i, j, i + j + 1)
+    assert not matrix.is_sparse
+    assert matrix.get_value(99, 19) == 119
+
+
+def test_sparse_chosen_from_density():
+    rows = [[0] * 100 for _ in range(100)]
+    rows[10][20] = 7
+    assert MatrixVariable('m', rows).is_sparse
+    assert not MatrixVariable('m', [[1, 0], [0, 1]]).is_sparse
+
+
+def test_sparse_operations_match_dense():
+    a_rows = [[(i * j) % 7 if (i + j) % 13 == 0 else 0 for j in range(80)] for i in range(80)]
+    b_rows = [[(i + j) % 5 - 2 if (i * j) % 17 == 1 else 0 for j in range(80)] for i in range(80)]
+    a = MatrixVariable('a', a_rows)
+    b = MatrixVariable('b', b_rows)
+    dense_a = MatrixVariable('a', np.array(a_rows))
+    dense_b = MatrixVariable('b', np.array(b_rows))
+    assert a.is_sparse and b.is_sparse
+    assert (a + b) == dense_a + dense_b
+    assert (a - b) == dense_a - dense_b
+    assert a.special_multiply(b) == dense_a.special_multiply(dense_b)
+    assert a.special_multiply(dense_b) == dense_a.special_multiply(dense_b)
+    assert (a * b).rows == (dense_a * dense_b).rows
+    assert (dense_a * b).rows == (dense_a * dense_b).rows
+    assert (a * NumberVariable('', 3)).rows == (dense_a * NumberVariable('', 3)).rows
+    assert (a + NumberVariable('', 1)).rows == (dense_a + NumberVariable('', 1)).rows
+
+
+def test_in_place_updates_reuse_buffer():
+    matrix = MatrixVariable('m', [[1, 2], [3, 4]])
+    buffer = matrix.values
+    matrix.add_value(5)
+    matrix.multiply_by_value(3)
+    matrix.add_array(MatrixVariable('', [[1, 1], [1, 1]]))
+    matrix.special_multiply_by_array(MatrixVariable('', [[2, 0], [1, -1]]))
+    assert matrix.values is buffer
+    assert matrix.rows == [[38, 0], [25, -28]]
+
+
+def test_in_place_update_promotes_on_overflow():
+    matrix = MatrixVariable('m', [[1, -2]])
+    matrix.multiply_by_value(2 ** 62)
+    assert matrix.rows == [[2 ** 62, -2 ** 63]]
+    assert matrix.values.dtype == object
+
+
+def test_pool_recycles_buffers_of_same_shape():
+    pool = BufferPool(budget=1 << 20)
+    buffer = pool.acquire((4, 4))
+    pool.release(buffer)
+    pool.release(buffer)
+    assert pool.acquire((4, 4)) is buffer
+    assert pool.acquire((4, 4)) is not buffer
+    assert pool.acquire((2, 8)) is not buffer
+    assert pool.statistics()['hits'] == 1
+    assert pool.statistics()['misses'] == 3
+
+
+def test_pool_evicts_least_recently_used():
+    pool = BufferPool(budget=2 * 8 * 16)
+    first = pool.acquire((4, 4))
+    second = pool.acquire((2, 8))
+    third = pool.acquire((8, 2))
+    pool.release(first)
+    pool.release(second)
+    pool.release(third)
+    assert pool.size == 2 * 8 * 16
+    assert pool.statistics()['evictions'] == 1
+    assert pool.acquire((4, 4)) is not first
+    assert pool.acquire((8, 2)) is third
+
+
+def test_pool_ignores_views():
+    pool = BufferPool()
+    values = np.zeros((2, 4, 4), dtype=np.int64)
+    pool.release(values[0])
+    pool.release(values.astype(object))
+    assert pool.size == 0
+
+
+def test_tile_store_maps_large_values():
+    store = TileStore(threshold=8 * 16, tile_bytes=8 * 8)
+    assert not isinstance(store.allocate((3, 5)), np.memmap)
+    values = store.allocate((2, 4, 4))
+    assert isinstance(values, np.memmap)
+    assert store.mapped == 1
+    values[:] = np.arange(32).reshape(2, 4, 4)
+    out = store.allocate((2, 4, 4))
+    store.apply(np.multiply, values, np.arange(16).reshape(4, 4), out)
+    assert np.array_equal(out, np.arange(32).reshape(2, 4, 4) * np.arange(16).reshape(4, 4))
+    assert len(list(store.blocks((2, 4, 4), np.int64))) == 4
+
+
+def test_tile_store_neighbourhood_reads_halo():
+    store = TileStore(threshold=1, tile_bytes=3 * 8)
+    values = np.arange(10 * 3).reshape(10, 3) ** 2
+
+    def vertical_sum(block):
+        padded = np.pad(block, ((1, 1), (0, 0)), mode='edge')
+        return padded[:-2] + padded[1:-1] + padded[2:]
+
+    result = store.neighbourhood(vertical_sum, values, 1)
+    assert isinstance(result, np.memmap)
+    assert np.array_equal(result, vertical_sum(values))
+
+
+def test_matrix_region_shares_buffer_until_written():
+    matrix = MatrixVariable('m', [[1, 2, 3],
+                                  [4, 5, 6]])
+    region = matrix.get_region((slice(0, 2), slice(1, 3)))
+    assert np.shares_memory(region.storage, matrix.storage)
+    matrix.set_value(0, 1, 20)
+    assert not np.shares_memory(region.storage, matrix.storage)
+    assert region.rows == [[2, 3], [5, 6]]
+    region.set_value(0, 0, 7)
+    assert region.rows == [[7, 3], [5, 6]]
+    assert matrix.rows == [[1, 20, 3], [4, 5, 6]]
+
+
+def test_matrix_region_keeps_buffer_out_of_pool():
+    pool = buffers
+    pool.reset()
+    matrix = MatrixVariable('m', np.arange(6, dtype=np.int64).reshape(2, 3))
+    region = matrix.get_region((slice(0, 1), slice(0, 3)))
+    matrix.release()
+    assert pool.acquire((2, 3)) is not matrix.storage
+    assert region.rows == [[0, 1, 2]]
+
+
+def test_image_saturates_like_pixels():
+    rng = np.random.default_rng(7)
+    image = ImageVariable('img', rng.integers(0, 256, (4, 5, 3), dtype=np.uint8))
+    pixel = PixelVariable('', 10, 0, 255)
+    for number in [0, 3, -7, 130, 300, -2 ** 70]:
+        expected = [[image.get_pixel(y, x) + NumberVariable('', number) for x in range(5)] for y in range(4)]
+        result = image + NumberVariable('', number)
+        assert all(result.get_pixel(y, x) == expected[y][x] for y in range(4) for x in range(5))
+        if number > 0:
+            result = image % NumberVariable('', number)
+            assert all(result.get_pixel(y, x) == image.get_pixel(y, x) % NumberVariable('', number)
+                       for y in range(4) for x in range(5))
+    result = image * NumberVariable('', 3) - pixel
+    assert all(result.get_pixel(y, x) == image.get_pixel(y, x) * NumberVariable('', 3) - pixel
+               for y in range(4) for x in range(5))
+    assert result.values.dtype == np.uint8
+
+
+def test_image_channels():
+    image = ImageVariable.filled(2, 2, PixelVariable('', 1, 2, 3))
+    image.set_channel('g', MatrixVariable('', [[-1, 20], [300, 4]]))
+    assert image.get_channel('g').rows == [[0, 20], [255, 4]]
+    assert image.get_channel('b').rows == [[3, 3], [3, 3]]
+    assert image.get_pixel(1, 0) == PixelVariable('', 1, 255, 3)
+
+
+def test_image_division_by_zero():
+    image = ImageVariable.filled(1, 2, PixelVariable('', 1, 2, 3))
+    with pytest.raises(ZeroDivisionException):
+        image / ImageVariable.zeros(1, 2)
+    with pytest.raises(ZeroDivisionException):
+        image % NumberVariable('', 0)
+
+
+def test_division_finds_zero_divisors_while_dividing():
+    values = np.arange(6, dtype=np.int64).reshape(2, 3)
+    assert arrays.floor_divide(values, values + 1)[0].tolist() == [[0, 0, 0], [0, 0, 0]]
+    assert arrays.modulo(values, np.full((2, 3), 4))[0].tolist() == [[0, 1, 2], [3, 0, 1]]
+    with pytest.raises(ZeroDivisionException):
+        arrays.floor_divide(values, values)
+    with pytest.raises(ZeroDivisionException):
+        arrays.modulo(values.astype(object), values)
+    with pytest.raises(ZeroDivisionException):
+        NumberVariable('', 5) % NumberVariable('', 0)
+    with pytest.raises(ZeroDivisionException):
+        PixelVariable('', 5, 5, 5) % PixelVariable('', 1, 0, 1)
+
+
+def test_value_variables_are_slotted():
+    pixel = PixelVariable('p', -3, 128, 300)
+    number = NumberVariable('n', 5)
+    assert not hasattr(pixel, '__dict__') and not hasattr(number, '__dict__')
+    assert (pixel.r, pixel.g, pixel.b) == (PixelVariable.MIN_VALUE, 128, PixelVariable.MAX_VALUE)
+    with pytest.raises(AttributeError):
+        pixel.a = 1
+
+
+def test_value_variables_copies_are_independent():
+    pixel = PixelVariable('p', 1, 2, 3)
+    copied = deepcopy(pixel)
+    copied.set_r(400)
+    assert pixel.r == 1 and copied.r == 255 and copied.name == 'p'
+    number = NumberVariable('n', 5)
+    assert deepcopy(number) == number and deepcopy(number) is not number